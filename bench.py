@@ -1,22 +1,51 @@
 
-import argparse, time, csv, random
-from lib.sparse_matrix import SparseMatrix
+import argparse, time, csv, random, os, sys, threading, cProfile, pstats
+from array import array
+from lib.sparse_matrix import MatrizEsparsa
 from lib.tree_matrix import TreeMatrix
 from lib.dense_matrix import DenseMatrix
+from lib.lil_matrix import LilMatrix
+from lib.permute import permute, rcm, degree_order, bandwidth
 
 def gen_sparse(rows, cols, density, seed=42):
     random.seed(seed)
     k = int(rows*cols*density)
-    S = SparseMatrix(rows, cols)
     seen = set()
+    ri, ci, vs = array("i"), array("i"), array("d")
     while len(seen) < k:
         i = random.randrange(rows); j = random.randrange(cols)
         if (i,j) in seen: continue
         seen.add((i,j))
         v = random.uniform(-1,1)
         if v==0.0: v = 0.5
-        S.insert(i,j,v)
-    return S
+        ri.append(i); ci.append(j); vs.append(v)
+    return MatrizEsparsa.de_coo(rows, cols, ri, ci, vs)
+
+def gen_banded(n, width, density, seed=42, perm=None):
+    # |i-j| <= width, in-band cells filled with probability `density`; `perm` scrambles
+    # rows and columns alike, hiding the band the way an arbitrary input order does
+    random.seed(seed)
+    ri, ci, vs = array("i"), array("i"), array("d")
+    for i in range(n):
+        for j in range(max(0, i-width), min(n, i+width+1)):
+            if random.random() < density:
+                ri.append(i); ci.append(j); vs.append(random.uniform(-1,1) or 0.5)
+    S = MatrizEsparsa.de_coo(n, n, ri, ci, vs)
+    return permute(S, perm, perm) if perm is not None else S
+
+def coo_of(S):
+    ri, ci, vs = array("i"), array("i"), array("d")
+    for i, row in S.dado.items():
+        for j, v in row.items():
+            ri.append(i); ci.append(j); vs.append(v)
+    return ri, ci, vs
+
+def scaled(S, a):
+    # dict's scale only records a lazy factor; fold it in so scale:dict times the same
+    # O(nnz) pass that builds a new matrix on the other backends
+    R = S*a
+    R._materializa()
+    return R
 
 def timeit(fn, repeat=1):
     best = float("inf")
@@ -27,6 +56,66 @@ def timeit(fn, repeat=1):
         best = min(best, (t1-t0)*1000.0)
     return best
 
+def counters_of(fn):
+    # one extra, untimed run with the instrumentation layer attached
+    from lib.instrument import instrument
+    with instrument() as c:
+        fn()
+    return c.to_json(sort_keys=True)
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+def _drive(fn, min_seconds):
+    # call fn at least once and until min_seconds have passed, so short cases still get samples
+    t0 = time.perf_counter()
+    fn()
+    while time.perf_counter() - t0 < min_seconds:
+        fn()
+
+def sample_stacks(fn, interval_ms=1.0, min_seconds=0.5):
+    """Sampling profiler: a helper thread records the main thread's stack every
+    interval_ms while fn runs; returns {"a;b;c": count} (collapsed stacks, root first)."""
+    target = threading.get_ident()
+    stacks = {}
+    done = threading.Event()
+    def sampler():
+        while not done.wait(interval_ms/1000.0):
+            frame = sys._current_frames().get(target)
+            names = []
+            while frame is not None and frame.f_code is not _drive.__code__:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if frame is None or not names: continue  # not inside the case yet
+            key = ";".join(reversed(names))
+            stacks[key] = stacks.get(key, 0) + 1
+    th = threading.Thread(target=sampler, daemon=True)
+    th.start()
+    try:
+        _drive(fn, min_seconds)
+    finally:
+        done.set(); th.join()
+    return stacks
+
+def profile_case(case, fn, out_dir, top, interval_ms):
+    """cProfile one run of the case (-> .pstats, top-N by self time on stdout) and
+    sample its stacks (-> .folded, one 'frame;frame;frame count' line per stack)."""
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, case.replace(":", "_"))
+    prof = cProfile.Profile()
+    prof.runcall(fn)
+    prof.dump_stats(stem + ".pstats")
+    print(f"== {case}: top {top} by self time ({stem}.pstats)")
+    pstats.Stats(prof).sort_stats("tottime").print_stats(top)
+    stacks = sample_stacks(fn, interval_ms)
+    with open(stem + ".folded", "w") as f:
+        f.write("".join(f"{k} {v}\n" for k, v in sorted(stacks.items())))
+
+def rel_error(exact, approx, sub, nrm):
+    # ||exact - approx||_F / ||exact||_F; sub(X, Y) = X - Y and nrm(X) = ||X||_F per backend
+    ref = nrm(exact)
+    return nrm(sub(exact, approx)) / ref if ref else 0.0
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--n", type=int, default=1000)
@@ -34,34 +123,99 @@ def main():
     ap.add_argument("--seed", type=int, default=1)
     ap.add_argument("--repeat", type=int, default=3)
     ap.add_argument("--out", default="results.csv")
+    ap.add_argument("--counters", action="store_true", help="add a JSON column with instrumentation counters per case")
+    ap.add_argument("--profile", action="store_true", help="save per-case .pstats and collapsed stacks (.folded)")
+    ap.add_argument("--profile-dir", default="profiles")
+    ap.add_argument("--top", type=int, default=10, help="hot functions printed per case with --profile")
+    ap.add_argument("--sample-interval", type=float, default=1.0, help="stack sampling period in ms")
+    ap.add_argument("--band", type=int, default=None, help="banded inputs of this half-width, rows/cols scrambled (density is the in-band fill)")
+    ap.add_argument("--reorder", action="store_true", help="add matmul cases on RCM / degree-sorted operands")
+    ap.add_argument("--approx", action="store_true", help="add pruned matmul cases with speedup and error columns")
+    ap.add_argument("--atol", type=float, default=0.0, help="absolute drop tolerance for --approx")
+    ap.add_argument("--rtol", type=float, default=0.05, help="drop tolerance relative to each row's max for --approx")
+    ap.add_argument("--top-k", type=int, default=None, help="keep at most k entries per output row for --approx")
     args = ap.parse_args()
 
-    A = gen_sparse(args.n, args.n, args.density, args.seed)
-    B = gen_sparse(args.n, args.n, args.density, args.seed+1)
+    if args.band is None:
+        A = gen_sparse(args.n, args.n, args.density, args.seed)
+        B = gen_sparse(args.n, args.n, args.density, args.seed+1)
+    else:
+        scramble = list(range(args.n)); random.Random(args.seed).shuffle(scramble)
+        A = gen_banded(args.n, args.band, args.density, args.seed, scramble)
+        B = gen_banded(args.n, args.band, args.density, args.seed+1, scramble)
 
     # Materialize others
-    D_A = DenseMatrix(args.n, args.n);  [D_A.insert(i,j,v) for i,row in A.data.items() for j,v in row.items()]
-    D_B = DenseMatrix(args.n, args.n);  [D_B.insert(i,j,v) for i,row in B.data.items() for j,v in row.items()]
-    T_A = TreeMatrix(args.n, args.n);   [T_A.insert(i,j,v) for i,row in A.data.items() for j,v in row.items()]
-    T_B = TreeMatrix(args.n, args.n);   [T_B.insert(i,j,v) for i,row in B.data.items() for j,v in row.items()]
-
-    rows = []
-    # add
-    rows.append(("add:dict",   timeit(lambda: A + B, args.repeat)))
-    rows.append(("add:tree",   timeit(lambda: T_A.add(T_B), args.repeat)))
-    rows.append(("add:dense",  timeit(lambda: D_A.add(D_B), args.repeat)))
-    # scale
-    rows.append(("scale:dict",  timeit(lambda: A*2.0, args.repeat)))
-    rows.append(("scale:tree",  timeit(lambda: T_A.scale(2.0), args.repeat)))
-    rows.append(("scale:dense", timeit(lambda: D_A.scale(2.0), args.repeat)))
-    # matmul
-    rows.append(("matmul:dict",  timeit(lambda: A*B, args.repeat)))
-    rows.append(("matmul:tree",  timeit(lambda: T_A.matmul(T_B), args.repeat)))
-    rows.append(("matmul:dense", timeit(lambda: D_A.matmul(D_B), 1)))  # denso custa caro; 1 repetição
+    coo_A, coo_B = coo_of(A), coo_of(B)
+    D_A = DenseMatrix.from_coo(args.n, args.n, *coo_A)
+    D_B = DenseMatrix.from_coo(args.n, args.n, *coo_B)
+    T_A = TreeMatrix.from_coo(args.n, args.n, *coo_A)
+    T_B = TreeMatrix.from_coo(args.n, args.n, *coo_B)
+    L_A = LilMatrix.from_coo(args.n, args.n, *coo_A)
+    L_B = LilMatrix.from_coo(args.n, args.n, *coo_B)
+
+    cases = [
+        # add
+        ("add:dict",   lambda: A.soma(B), args.repeat),
+        ("add:tree",   lambda: T_A.add(T_B), args.repeat),
+        ("add:lil",    lambda: L_A.add(L_B), args.repeat),
+        ("add:dense",  lambda: D_A.add(D_B), args.repeat),
+        # scale
+        ("scale:dict",  lambda: scaled(A, 2.0), args.repeat),
+        ("scale:tree",  lambda: T_A.scale(2.0), args.repeat),
+        ("scale:lil",   lambda: L_A.scale(2.0), args.repeat),
+        ("scale:dense", lambda: D_A.scale(2.0), args.repeat),
+        # matmul
+        ("matmul:dict",  lambda: A*B, args.repeat),
+        ("matmul:tree",  lambda: T_A.matmul(T_B), args.repeat),
+        ("matmul:lil",   lambda: L_A.matmul(L_B), args.repeat),
+        ("matmul:dense", lambda: D_A.matmul(D_B), 1),  # denso custa caro; 1 repetição
+    ]
+    # approx case -> (exact case, approx product, exact product, X - Y, ||X||_F)
+    approx = {}
+    if args.approx:
+        tol = dict(atol=args.atol, rtol=args.rtol, top_k=args.top_k)
+        approx = {
+            "approx:dict": ("matmul:dict",
+                            lambda: A.mult_aproximada(B, tol["atol"], tol["rtol"], tol["top_k"]),
+                            lambda: A*B, lambda X,Y: X.soma(Y*-1.0), lambda X: X.norma()),
+            "approx:tree": ("matmul:tree", lambda: T_A.approx_matmul(T_B, **tol),
+                            lambda: T_A.matmul(T_B), lambda X,Y: X.add(Y.scale(-1.0)), lambda X: X.norm()),
+        }
+        cases += [(case, spec[1], args.repeat) for case, spec in approx.items()]
+    if args.reorder:
+        # one symmetric permutation for both operands: P A P^T @ P B P^T = P (A B) P^T,
+        # so the product is only relabelled and the timings compare like for like
+        orders = {"rcm": rcm(A), "deg": degree_order(A)}
+        for name, p in orders.items():
+            RA, RB = permute(A, p, p), permute(B, p, p)
+            RT_A, RT_B = permute(T_A, p, p), permute(T_B, p, p)
+            print(f"{name}: bandwidth of A {bandwidth(A)} -> {bandwidth(RA)}")
+            cases += [(f"matmul_{name}:dict", lambda RA=RA, RB=RB: RA*RB, args.repeat),
+                      (f"matmul_{name}:tree", lambda RT_A=RT_A, RT_B=RT_B: RT_A.matmul(RT_B), args.repeat),
+                      (f"permute_{name}:dict", lambda p=p: (permute(A, p, p), permute(B, p, p)), args.repeat)]
+
+    rows, ms = [], {}
+    for case, fn, repeat in cases:
+        ms[case] = timeit(fn, repeat)
+        row = [case, ms[case]]
+        if args.counters: row.append(counters_of(fn))
+        if args.profile: profile_case(case, fn, args.profile_dir, args.top, args.sample_interval)
+        if args.approx:
+            if case in approx:
+                exact_case, fast, exact, sub, nrm = approx[case]
+                row += [ms[exact_case] / ms[case], rel_error(exact(), fast(), sub, nrm)]
+                print(f"{case}: {row[-2]:.2f}x faster than {exact_case}, relative error {row[-1]:.3g}")
+            else:
+                row += ["", ""]
+        rows.append(row)
+        if args.reorder and case.startswith("matmul_"):
+            base = "matmul:" + case.split(":")[1]
+            print(f"{case}: {ms[base] / ms[case]:.2f}x vs {base}")
 
     with open(args.out, "w", newline="") as f:
         w = csv.writer(f)
-        w.writerow(["case","ms"])
+        w.writerow(["case","ms"] + (["counters"] if args.counters else [])
+                   + (["speedup","rel_error"] if args.approx else []))
         for r in rows:
             w.writerow(r)
     print(f"Saved {args.out}")
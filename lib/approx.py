@@ -0,0 +1,48 @@
+
+from __future__ import annotations
+from heapq import heappush, heappushpop
+from typing import Dict, List, Optional, Tuple
+
+# Approximate (pruned) sparse product. Rows are {col: val} dicts in logical orientation,
+# the same shape matmul_rows takes, so every backend can share the kernel.
+Row = Dict[int, float]
+
+def prune_row(acc: Row, atol: float=0.0, rtol: float=0.0, top_k: Optional[int]=None) -> Row:
+    """Entries of a finished accumulator row that survive the drop rule (in no set order).
+       An entry is kept when |v| > max(atol, rtol * max|row|); with top_k only the k
+       largest survivors by magnitude are kept, selected through a k-bounded min-heap,
+       so the output row never holds more than k entries. atol=rtol=0 drops only zeros.
+    """
+    thr = atol
+    if rtol > 0.0 and acc:
+        thr = max(thr, rtol * max(map(abs, acc.values())))
+    if top_k is None:
+        if thr == 0.0: return {j: v for j, v in acc.items() if v != 0.0}
+        return {j: v for j, v in acc.items() if v > thr or v < -thr}
+    if top_k <= 0: return {}
+    heap: List[Tuple[float,int]] = []
+    for j, v in acc.items():
+        a = abs(v)
+        if a <= thr: continue
+        if len(heap) < top_k: heappush(heap, (a, j))
+        elif a > heap[0][0]: heappushpop(heap, (a, j))
+    return {j: acc[j] for _, j in heap}
+
+def approx_matmul_rows(a_rows: Dict[int,Row], b_rows: Dict[int,Row], atol: float=0.0,
+                       rtol: float=0.0, top_k: Optional[int]=None) -> Dict[int,Row]:
+    """Gustavson product A @ B with every output row pruned by prune_row as soon as it is
+       accumulated: the dense accumulator lives for one row only, so peak memory is the
+       pruned result plus a single unpruned row.
+    """
+    if atol < 0.0 or rtol < 0.0: raise ValueError("tolerances must be nonnegative")
+    out: Dict[int,Row] = {}
+    for i, a_row in a_rows.items():
+        acc: Row = {}
+        for t, a in a_row.items():
+            b_row = b_rows.get(t)
+            if b_row:
+                for j, b in b_row.items():
+                    acc[j] = acc.get(j, 0.0) + a*b
+        row = prune_row(acc, atol, rtol, top_k)
+        if row: out[i] = row
+    return out
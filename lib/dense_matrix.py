@@ -1,5 +1,9 @@
 
-from typing import Iterable, Tuple, List
+from array import array
+from typing import Iterable, Optional, Tuple, List
+from .views import SubmatrixView, parse_key, is_point
+from .transpose import Compressed, counting_transpose
+from .reductions import reduce, norm
 
 class DenseMatrix:
     def __init__(self, rows:int, cols:int):
@@ -9,12 +13,13 @@ class DenseMatrix:
         self._t = False
         self.a = [[0.0 for _ in range(cols)] for __ in range(rows)]
 
+    # rows/cols are the logical dims (swapped by transpose); self.a keeps base orientation
     @property
-    def shape(self): return (self.cols, self.rows) if self._t else (self.rows, self.cols)
+    def shape(self): return (self.rows, self.cols)
 
     def _norm(self, i:int,j:int) -> Tuple[int,int]:
-        if self._t: i,j = j,i
         r,c = self.rows, self.cols
+        if self._t: i,j,r,c = j,i,c,r
         if not (0<=i<r and 0<=j<c): raise IndexError("oob")
         return i,j
 
@@ -26,10 +31,100 @@ class DenseMatrix:
         i,j = self._norm(i,j)
         self.a[i][j] = v
 
+    def insert_many(self, rows, cols, vals, dup:str="sum") -> None:
+        """Bulk COO insert; duplicates are summed (dup='sum') or the last one wins."""
+        if dup not in ("sum", "last"): raise ValueError("dup must be 'sum' or 'last'")
+        if not (len(rows) == len(cols) == len(vals)): raise ValueError("rows, cols and vals differ in length")
+        if len(rows) == 0: return
+        r,c = self.shape
+        if min(rows) < 0 or max(rows) >= r or min(cols) < 0 or max(cols) >= c:
+            raise IndexError("oob")
+        if self._t: rows, cols = cols, rows
+        a = self.a
+        if dup == "last":
+            for i,j,v in zip(rows, cols, vals): a[i][j] = v
+            return
+        batch = {}
+        for key, v in zip(zip(rows, cols), vals):
+            batch[key] = batch.get(key, 0.0) + v
+        for (i,j), v in batch.items(): a[i][j] = v
+
+    @classmethod
+    def from_coo(cls, rows:int, cols:int, r, c, v, dup:str="sum") -> "DenseMatrix":
+        D = cls(rows, cols)
+        D.insert_many(r, c, v, dup)
+        return D
+
+    @classmethod
+    def from_csr(cls, rows:int, cols:int, ptr, idx, vals) -> "DenseMatrix":
+        D = cls(rows, cols)
+        for i, row in enumerate(D.a):
+            for p in range(ptr[i], ptr[i+1]): row[idx[p]] = vals[p]
+        return D
+
+    def __getitem__(self, key):
+        r0,r1,c0,c1 = parse_key(key, self.shape)
+        if is_point(key):
+            return self.access(r0,c0)
+        return DenseView(self, r0,r1,c0,c1)
+
     def transpose(self):
         self._t = not self._t
         self.rows, self.cols = self.cols, self.rows
 
+    def _stored_rows(self) -> Iterable[Tuple[int, List[int], List[float]]]:
+        # nonzeros only, so counts and the implicit-zero rule of max/min match the sparse backends
+        for i, row in enumerate(self.a):
+            cols = [j for j, v in enumerate(row) if v != 0.0]
+            if cols: yield i, cols, [row[j] for j in cols]
+
+    # reductions: each stored nonzero is visited once, the transpose flag only picks the axis
+    def sum(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._t, "sum", axis)
+
+    def count_nonzero(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._t, "count", axis)
+
+    def max(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._t, "max", axis)
+
+    def min(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._t, "min", axis)
+
+    def norm(self, ord="fro") -> float:
+        return norm(self._stored_rows(), self.shape, self._t, ord)
+
+    # element-wise ops
+    def _zip_with(self, other:"DenseMatrix", fn) -> "DenseMatrix":
+        r,c = self.shape
+        if other.shape != (r,c): raise ValueError("shape mismatch on element-wise op")
+        R = DenseMatrix(r,c)
+        R.a = [[fn(self.access(i,j), other.access(i,j)) for j in range(c)] for i in range(r)]
+        return R
+
+    def hadamard(self, other:"DenseMatrix") -> "DenseMatrix": return self._zip_with(other, lambda a,b: a*b)
+    def where(self, mask:"DenseMatrix") -> "DenseMatrix": return self._zip_with(mask, lambda a,m: a if m != 0.0 else 0.0)
+    def maximum(self, other:"DenseMatrix") -> "DenseMatrix": return self._zip_with(other, max)
+    def minimum(self, other:"DenseMatrix") -> "DenseMatrix": return self._zip_with(other, min)
+
+    def to_csc(self, workers:int=1) -> Compressed:
+        """(colptr, rowidx, vals) of the logical matrix: one scan of the stored rows,
+           then the counting-sort regroup shared with the sparse backends."""
+        ptr, idx, vals = array("q", [0]), array("i"), array("d")
+        for row in self.a:
+            for j, v in enumerate(row):
+                if v != 0.0:
+                    idx.append(j); vals.append(v)
+            ptr.append(len(idx))
+        if self._t: return ptr, idx, vals
+        return counting_transpose(self.cols, ptr, idx, vals, workers)
+
+    def transposed_copy(self, workers:int=1) -> "DenseMatrix":
+        """Physical transpose: a new untransposed buffer holding self^T."""
+        R = DenseMatrix(self.cols, self.rows)
+        R.a = [row[:] for row in self.a] if self._t else [list(col) for col in zip(*self.a)]
+        return R
+
     def items(self) -> Iterable[Tuple[int,int,float]]:
         r,c = self.shape
         for i in range(r):
@@ -39,6 +134,9 @@ class DenseMatrix:
                     yield i,j,v
 
     def add(self, other:"DenseMatrix")->"DenseMatrix":
+        if not isinstance(other, DenseMatrix):
+            from .mixed import sparse_dense_add   # mixed imports this module
+            return sparse_dense_add(other, self)
         r,c = self.shape
         if other.shape != (r,c): raise ValueError("shape mismatch on add")
         R = DenseMatrix(r,c)
@@ -56,6 +154,9 @@ class DenseMatrix:
         return R
 
     def matmul(self, other:"DenseMatrix")->"DenseMatrix":
+        if not isinstance(other, DenseMatrix):
+            from .mixed import dense_sparse_matmul
+            return dense_sparse_matmul(self, other)
         nA,mA = self.shape
         nB,mB = other.shape
         if mA != nB: raise ValueError("shape mismatch on matmul")
@@ -68,3 +169,18 @@ class DenseMatrix:
                 for j in range(mB):
                     R.insert(i,j, R.access(i,j) + a*other.access(t,j))
         return R
+
+class DenseView(SubmatrixView):
+    def _base_get(self, i:int, j:int) -> float:
+        return self.base.access(i,j)
+
+    def _base_items(self) -> Iterable[Tuple[int,int,float]]:
+        D = self.base
+        for i in range(self.r0, self.r1):
+            for j in range(self.c0, self.c1):
+                v = D.access(i,j)
+                if v != 0.0:
+                    yield i,j,v
+
+    def _empty(self, r:int, c:int) -> DenseMatrix:
+        return DenseMatrix(r,c)
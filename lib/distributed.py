@@ -0,0 +1,255 @@
+
+from __future__ import annotations
+import multiprocessing as mp
+import queue, socket, socketserver, struct, sys, threading, time
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+from .sparse_matrix import MatrizEsparsa
+from .transpose import _chunks, counting_transpose
+from .permute import _csc, _from_csr, _shape
+
+# Row-partitioned matmul/add over TCP workers. The driver splits A into row blocks of
+# about equal nnz; a matmul task ships one block of A plus only the rows of B that block
+# references, an add task the same row block of A and B. Workers compute with
+# MatrizEsparsa and answer with the block of the result. Everything on the wire is
+# framed CSR: little-endian, int64 ptr, int32 indices, float64 values.
+CSR = Tuple[int, int, array, array, array]   # rows, cols, ptr, idx, vals
+
+_MAGIC = b"CSR1"
+_HEADER = struct.Struct("<4sIIQ")   # magic, rows, cols, nnz
+_FRAME = struct.Struct("<4sQ")      # opcode, payload bytes
+_MATMUL, _ADD, _DONE, _FAIL = b"MMUL", b"MADD", b"DONE", b"FAIL"
+
+def _wire(a: array) -> bytes:
+    if sys.byteorder == "big":
+        a = array(a.typecode, a); a.byteswap()
+    return a.tobytes()
+
+def _unwire(typecode: str, buf) -> array:
+    a = array(typecode); a.frombytes(buf)
+    if sys.byteorder == "big": a.byteswap()
+    return a
+
+def encode_csr(rows:int, cols:int, ptr, idx, vals) -> bytes:
+    """Header, then rows+1 pointers, nnz column indices and nnz values."""
+    nnz = ptr[rows] - ptr[0]
+    base = ptr[0]
+    p = array("q", (x - base for x in ptr)) if base else array("q", ptr)
+    return b"".join((_HEADER.pack(_MAGIC, rows, cols, nnz), _wire(p),
+                     _wire(array("i", idx[base:base+nnz])), _wire(array("d", vals[base:base+nnz]))))
+
+def decode_csr(buf, offset:int=0) -> Tuple[CSR, int]:
+    """(CSR, offset just past it), so blobs can be concatenated in one message."""
+    buf = memoryview(buf)
+    magic, rows, cols, nnz = _HEADER.unpack_from(buf, offset)
+    if magic != _MAGIC: raise ValueError("not a CSR blob")
+    o = offset + _HEADER.size
+    ptr = _unwire("q", buf[o:o + 8*(rows+1)]); o += 8*(rows+1)
+    idx = _unwire("i", buf[o:o + 4*nnz]); o += 4*nnz
+    vals = _unwire("d", buf[o:o + 8*nnz]); o += 8*nnz
+    return (rows, cols, ptr, idx, vals), o
+
+def _send(sock: socket.socket, op: bytes, payload: bytes) -> None:
+    sock.sendall(_FRAME.pack(op, len(payload)) + payload)
+
+def _recv_exact(sock: socket.socket, n:int) -> bytes:
+    buf = bytearray(n)
+    view, got = memoryview(buf), 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if k == 0: raise ConnectionError("connection closed mid-message")
+        got += k
+    return bytes(buf)
+
+def _recv(sock: socket.socket) -> Tuple[bytes, bytes]:
+    op, size = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    return op, _recv_exact(sock, size)
+
+def _sorted_csr(M: MatrizEsparsa) -> CSR:
+    # logical CSR with columns ascending in every row (two counting-sort passes)
+    n, m = M.corpo
+    return (n, m) + tuple(counting_transpose(n, *M.para_csc()))
+
+# --- worker
+def _compute(op: bytes, payload: bytes) -> bytes:
+    (a, o) = decode_csr(payload)
+    (b, _) = decode_csr(payload, o)
+    A, B = MatrizEsparsa.de_csr(*a), MatrizEsparsa.de_csr(*b)
+    if op == _MATMUL: R = A.mult_matriz(B)
+    elif op == _ADD: R = A.soma(B)
+    else: raise ValueError(f"unknown opcode {op!r}")
+    return encode_csr(*_sorted_csr(R))
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                op, payload = _recv(self.request)
+            except ConnectionError:
+                return
+            if self.server.delay: time.sleep(self.server.delay)
+            try:
+                _send(self.request, _DONE, _compute(op, payload))
+            except Exception as e:   # reported to the driver, which fails the task
+                _send(self.request, _FAIL, repr(e).encode())
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve(host:str="127.0.0.1", port:int=0, ready=None, delay:float=0.0) -> None:
+    """Run a worker until the process is stopped. The bound (host, port) is put on the
+       `ready` queue when given (port=0 picks a free port). `delay` adds latency to
+       every request, to exercise the driver's slow-worker handling."""
+    with _Server((host, port), _Handler) as srv:
+        srv.delay = delay
+        if ready is not None: ready.put(srv.server_address)
+        srv.serve_forever()
+
+class LocalCluster:
+    """N worker processes on localhost standing in for remote nodes.
+       with LocalCluster(4) as lc: Cluster(lc.addresses).matmul(A, B)"""
+    def __init__(self, n:int, delays: Optional[Sequence[float]]=None):
+        ctx = mp.get_context()
+        delays = list(delays or ())[:n]
+        delays += [0.0]*(n - len(delays))
+        ready = [ctx.Queue() for _ in range(n)]   # one per worker: addresses[k] is procs[k]
+        self.procs = [ctx.Process(target=serve, args=("127.0.0.1", 0, q, d), daemon=True)
+                      for q, d in zip(ready, delays)]
+        for p in self.procs: p.start()
+        self.addresses: List[Tuple[str,int]] = [tuple(q.get(timeout=30)) for q in ready]
+
+    def kill(self, k:int) -> None:
+        """Stop worker k (the one at addresses[k]), simulating a dead node."""
+        self.procs[k].terminate(); self.procs[k].join()
+
+    def close(self) -> None:
+        for p in self.procs:
+            if p.is_alive(): p.terminate()
+        for p in self.procs: p.join()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+# --- driver
+class Cluster:
+    """Driver over workers at `addresses` (host, port). Every call partitions A into
+       `parts` row blocks (default: 2 per worker) and hands them out to the workers; a
+       worker that errors, drops the connection or exceeds `timeout` seconds on a task
+       is dropped and its task is handed to another worker. Dropped workers stay out
+       for the rest of the call. Results come back in A's backend.
+    """
+    def __init__(self, addresses: Sequence[Tuple[str,int]], timeout:float=30.0, parts:Optional[int]=None):
+        if not addresses: raise ValueError("no workers")
+        self.addresses = [tuple(a) for a in addresses]
+        self.timeout = timeout
+        self.parts = parts
+        self.failures: List[Tuple[Tuple[str,int], str]] = []   # (worker, reason) of the last call
+
+    def matmul(self, A, B):
+        n, k = _shape(A)
+        k2, m = _shape(B)
+        if k != k2: raise ValueError("shape mismatch on matmul")
+        a_ptr, a_idx, a_val = self._csr(A, n)
+        b_ptr, b_idx, b_val = self._csr(B, k)
+        tasks = []
+        for r0, r1 in self._blocks(a_ptr):
+            s, e = a_ptr[r0], a_ptr[r1]
+            need = sorted(set(a_idx[s:e]))
+            idx, val = array("i"), array("d")
+            for t in need:   # only the rows of B this block reads
+                idx.extend(b_idx[b_ptr[t]:b_ptr[t+1]]); val.extend(b_val[b_ptr[t]:b_ptr[t+1]])
+            ptr = self._subset_ptr(need, b_ptr, k)
+            payload = encode_csr(r1-r0, k, a_ptr[r0:r1+1], a_idx, a_val) + encode_csr(k, m, ptr, idx, val)
+            tasks.append((r0, r1, _MATMUL, payload))
+        return self._gather(A, n, m, tasks)
+
+    def add(self, A, B):
+        if _shape(A) != _shape(B): raise ValueError("shape mismatch on add")
+        n, m = _shape(A)
+        a_ptr, a_idx, a_val = self._csr(A, n)
+        b_ptr, b_idx, b_val = self._csr(B, n)
+        # blocks balanced on the combined nnz of both operands
+        both = array("q", (x + y for x, y in zip(a_ptr, b_ptr)))
+        tasks = [(r0, r1, _ADD, encode_csr(r1-r0, m, a_ptr[r0:r1+1], a_idx, a_val)
+                               + encode_csr(r1-r0, m, b_ptr[r0:r1+1], b_idx, b_val))
+                 for r0, r1 in self._blocks(both)]
+        return self._gather(A, n, m, tasks)
+
+    @staticmethod
+    def _csr(M, n:int):
+        return counting_transpose(n, *_csc(M))
+
+    @staticmethod
+    def _subset_ptr(need: List[int], b_ptr, k:int) -> array:
+        # row pointers of B restricted to the rows in `need` (ascending); others are empty
+        ptr = array("q", bytes(8*(k+1)))
+        off, it = 0, iter(need)
+        nxt = next(it, None)
+        for t in range(k):
+            if t == nxt:
+                off += b_ptr[t+1] - b_ptr[t]
+                nxt = next(it, None)
+            ptr[t+1] = off
+        return ptr
+
+    def _blocks(self, ptr) -> List[Tuple[int,int]]:
+        n = len(ptr) - 1
+        if n == 0: return []
+        parts = self.parts or 2*len(self.addresses)
+        if ptr[-1] == 0: return [(0, n)]
+        return _chunks(ptr, min(parts, n))
+
+    def _gather(self, like, n:int, m:int, tasks) -> object:
+        results = self._run(tasks)
+        ptr, idx, val = array("q", [0]), array("i"), array("d")
+        for (r0, r1, _, _), (rows, _, p, i, v) in sorted(zip(tasks, results), key=lambda tr: tr[0][0]):
+            base = ptr[-1]
+            ptr.extend(base + x for x in p[1:])
+            idx.extend(i); val.extend(v)
+        # row blocks cover 0..n-1 contiguously; an empty matrix has no blocks
+        if len(ptr) < n + 1: ptr.extend([ptr[-1]] * (n + 1 - len(ptr)))
+        return _from_csr(like, n, m, ptr, idx, val)
+
+    def _run(self, tasks) -> List[CSR]:
+        self.failures = []
+        results: List[Optional[CSR]] = [None]*len(tasks)
+        todo: "queue.Queue[int]" = queue.Queue()
+        for t in range(len(tasks)): todo.put(t)
+        live = list(self.addresses)
+        lock = threading.Lock()
+
+        def drive(addr):
+            # one connection per worker, reused for all the tasks it takes
+            sock = None
+            try:
+                while True:
+                    try: t = todo.get_nowait()
+                    except queue.Empty: return
+                    try:
+                        if sock is None:
+                            sock = socket.create_connection(addr, timeout=self.timeout)
+                        sock.settimeout(self.timeout)
+                        _send(sock, tasks[t][2], tasks[t][3])
+                        op, payload = _recv(sock)
+                        if op != _DONE: raise RuntimeError(payload.decode(errors="replace"))
+                        results[t] = decode_csr(payload)[0]
+                    except (OSError, ConnectionError, RuntimeError, ValueError, struct.error) as e:
+                        todo.put(t)   # hand the partition to someone else
+                        with lock:
+                            live.remove(addr)
+                            self.failures.append((addr, repr(e)))
+                        return
+            finally:
+                if sock is not None: sock.close()
+
+        # rounds: a task put back after the other drivers have finished gets a new round
+        while not todo.empty():
+            with lock: workers = list(live)
+            if not workers:
+                raise RuntimeError(f"all workers failed: {self.failures}")
+            threads = [threading.Thread(target=drive, args=(a,), daemon=True) for a in workers]
+            for th in threads: th.start()
+            for th in threads: th.join()
+        return results   # type: ignore[return-value]
@@ -0,0 +1,86 @@
+
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from .transpose import counting_transpose
+
+# Row kernels for element-wise ops on index-sorted rows (tree/lil stored rows).
+# Element-wise ops commute with transpose, so callers run them in storage orientation.
+Row = Tuple[List[int], List[float]]
+
+def _gallop(xs: Sequence[int], x: int, lo: int) -> int:
+    # first position >= lo with xs[pos] >= x: exponential probe, then binary search
+    n = len(xs)
+    step = 1
+    while lo + step < n and xs[lo + step] < x:
+        step *= 2
+    return bisect_left(xs, x, lo + step//2, min(lo + step + 1, n))
+
+def intersect(ac: Sequence[int], av: Sequence[float], bc: Sequence[int], bv: Sequence[float],
+              fn: Callable[[float,float],float]) -> Row:
+    """fn(a, b) on the columns present in both rows; exact zeros are dropped.
+       Walks the shorter row and gallops through the longer one, so a pair costs
+       O(min * log(max/min)): a plain merge for similar sizes, probing for skewed ones."""
+    swap = len(ac) > len(bc)
+    if swap: ac, av, bc, bv = bc, bv, ac, av
+    cols: List[int] = []
+    vals: List[float] = []
+    q, n = 0, len(bc)
+    for p, c in enumerate(ac):
+        q = _gallop(bc, c, q)
+        if q == n: break
+        if bc[q] == c:
+            v = fn(bv[q], av[p]) if swap else fn(av[p], bv[q])
+            if v != 0.0:
+                cols.append(c); vals.append(v)
+            q += 1
+    return cols, vals
+
+def union(ac: Sequence[int], av: Sequence[float], bc: Sequence[int], bv: Sequence[float],
+          fn: Callable[[float,float],float]) -> Row:
+    """fn(a, b) over every column stored in either row (a missing side is 0.0); zeros dropped."""
+    cols: List[int] = []
+    vals: List[float] = []
+    p = q = 0
+    na, nb = len(ac), len(bc)
+    while p < na or q < nb:
+        if q == nb or (p < na and ac[p] < bc[q]):
+            c, v = ac[p], fn(av[p], 0.0); p += 1
+        elif p == na or bc[q] < ac[p]:
+            c, v = bc[q], fn(0.0, bv[q]); q += 1
+        else:
+            c, v = ac[p], fn(av[p], bv[q]); p += 1; q += 1
+        if v != 0.0:
+            cols.append(c); vals.append(v)
+    return cols, vals
+
+def hadamard_fn(a: float, b: float) -> float: return a*b
+def mask_fn(a: float, _: float) -> float: return a
+
+def stored_rows_like(A, B) -> Dict[int, Tuple[Sequence[int], Sequence[float]]]:
+    """Rows of B (tree or lil) in A's storage orientation, columns ascending. Equal
+       transpose flags need no work; otherwise one counting-sort regroup of B."""
+    if A._transposed == B._transposed:
+        return {r: (cs, vs) for r, cs, vs in B._stored_rows()}
+    base_cols = B.rows if B._transposed else B.cols
+    ptr, idx, vals = counting_transpose(base_cols, *B._base_csr())
+    return {r: (idx[ptr[r]:ptr[r+1]], vals[ptr[r]:ptr[r+1]])
+            for r in range(len(ptr)-1) if ptr[r+1] > ptr[r]}
+
+def combine(A, B, fn: Callable[[float,float],float], keep_union: bool) -> Dict[int, Row]:
+    """Stored row -> (cols, vals) of fn(A, B) element-wise, in A's storage orientation,
+       rows in ascending order. keep_union=False visits only rows and columns both have."""
+    if A.shape != B.shape: raise ValueError("shape mismatch on element-wise op")
+    mine = {r: (cs, vs) for r, cs, vs in A._stored_rows()}
+    theirs = stored_rows_like(A, B)
+    out: Dict[int, Row] = {}
+    empty: Tuple[Sequence[int], Sequence[float]] = ((), ())
+    rows = mine.keys() | theirs.keys() if keep_union else mine.keys() & theirs.keys()
+    kernel = union if keep_union else intersect
+    for r in sorted(rows):
+        ac, av = mine.get(r, empty)
+        bc, bv = theirs.get(r, empty)
+        cols, vals = kernel(ac, av, bc, bv, fn)
+        if cols: out[r] = (cols, vals)
+    return out
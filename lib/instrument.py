@@ -0,0 +1,197 @@
+
+from __future__ import annotations
+import json, time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import tree_matrix as _tm
+from .sparse_matrix import MatrizEsparsa
+from .tree_matrix import TreeMatrix
+from .dense_matrix import DenseMatrix
+from .lil_matrix import LilMatrix
+
+class Counters:
+    """Event counts and per-operation wall time collected inside `instrument()`."""
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.time_ms: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def bump(self, name:str, n:int=1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def timed(self, name:str, ms:float) -> None:
+        self.time_ms[name] = self.time_ms.get(name, 0.0) + ms
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def as_dict(self) -> dict:
+        return {"counts": dict(sorted(self.counts.items())),
+                "ops": {k: {"calls": self.calls[k], "ms": self.time_ms[k]} for k in sorted(self.time_ms)}}
+
+    def to_json(self, **kw) -> str:
+        return json.dumps(self.as_dict(), **kw)
+
+    def dump(self, path:str) -> None:
+        with open(path, "w") as f:
+            f.write(self.to_json(indent=2))
+
+_active: Optional[Counters] = None
+
+# --- wrappers (installed only while instrumenting, so the disabled path is the original code)
+def _count(name:str, fn:Callable) -> Callable:
+    @wraps(fn)
+    def w(*a, **kw):
+        _active.bump(name)
+        return fn(*a, **kw)
+    return w
+
+def _time(name:str, fn:Callable, work:Optional[Callable]=None, rows:bool=False) -> Callable:
+    @wraps(fn)
+    def w(*a, **kw):
+        c = _active
+        if work is not None: c.bump(f"{name}.partial_products", work(*a))
+        t0 = time.perf_counter()
+        out = fn(*a, **kw)
+        c.timed(name, (time.perf_counter()-t0)*1000.0)
+        if rows and isinstance(out, MatrizEsparsa): c.bump("dict.row_allocs", len(out.dado))
+        return out
+    return w
+
+def _dict_inserir(fn:Callable) -> Callable:
+    @wraps(fn)
+    def w(self, i, j, valor):
+        l, _ = self.get_coordenadas(i, j)
+        if valor != 0 and l not in self.dado: _active.bump("dict.row_allocs")
+        return fn(self, i, j, valor)
+    return w
+
+def _dict_materializa(fn:Callable) -> Callable:
+    # mult_escalar shares rows; they are only allocated when a write splits them off
+    @wraps(fn)
+    def w(self):
+        if self.fator != 1 or self.compartilhado: _active.bump("dict.row_allocs", len(self.dado))
+        return fn(self)
+    return w
+
+def _dict_inserir_muitos(fn:Callable) -> Callable:
+    # the batch path builds whole rows in dado; with observers it goes through _inserir
+    @wraps(fn)
+    def w(self, *a, **kw):
+        if self.observadores: return fn(self, *a, **kw)
+        antes = set(self.dado)
+        out = fn(self, *a, **kw)
+        _active.bump("dict.row_allocs", sum(1 for l in self.dado if l not in antes))
+        return out
+    return w
+
+def _dict_de_csr(cm: classmethod) -> classmethod:
+    fn = cm.__func__
+    @wraps(fn)
+    def w(cls, *a, **kw):
+        out = fn(cls, *a, **kw)
+        _active.bump("dict.row_allocs", len(out.dado))
+        return out
+    return classmethod(w)
+
+def _lil_row(fn:Callable) -> Callable:
+    # a row's pending writes are merged into new sorted arrays on first read
+    @wraps(fn)
+    def w(self, r):
+        pending = self._buf.get(r)
+        if pending:
+            _active.bump("lil.row_merges")
+            _active.bump("lil.merged_writes", len(pending))
+        return fn(self, r)
+    return w
+
+def _find(x, key):
+    # same walk as tree_matrix._find, counting nodes visited
+    c = _active
+    c.bump("tree.find")
+    d = 0
+    while x is not None:
+        d += 1
+        k = _tm._cmp(key, x.key)
+        if k == 0: break
+        x = x.lh if k < 0 else x.rh
+    c.bump("tree.find_depth", d)
+    return x
+
+def _items(M) -> Iterator[Tuple[int,int,float]]:
+    # logical nonzeros of any backend
+    if isinstance(M, MatrizEsparsa):
+        return ((i, j, v) for i, row in M._linhas_logicas().items() for j, v in row.items())
+    return iter(M.items())
+
+def _products(A, B, *_) -> int:
+    """Partial products of A @ B for any pair of backends. A dense operand is walked
+       whole: each nonzero of the sparse side meets a full row (B dense) or column
+       (A dense) of it, as in the dense and mixed kernels."""
+    if isinstance(B, DenseMatrix): return sum(1 for _ in _items(A)) * B.shape[1]
+    if isinstance(A, DenseMatrix): return sum(1 for _ in _items(B)) * A.shape[0]
+    if isinstance(A, MatrizEsparsa) and isinstance(B, MatrizEsparsa):
+        # mult_matriz reads the stored rows of both operands
+        return sum(len(B.dado.get(t, ())) for row in A.dado.values() for t in row)
+    b_len: Dict[int,int] = {}
+    for t, _, _ in _items(B): b_len[t] = b_len.get(t, 0) + 1
+    return sum(b_len.get(t, 0) for _, t, _ in _items(A))
+
+def _patches() -> List[Tuple[object, str, Callable]]:
+    return [
+        (MatrizEsparsa, "acessar",     lambda f: _count("dict.access", f)),
+        (MatrizEsparsa, "inserir",     lambda f: _count("dict.insert", f)),
+        (MatrizEsparsa, "_inserir",    _dict_inserir),
+        (MatrizEsparsa, "inserir_muitos", _dict_inserir_muitos),
+        (MatrizEsparsa, "de_csr",      _dict_de_csr),
+        (MatrizEsparsa, "soma",        lambda f: _time("dict.add", f, rows=True)),
+        (MatrizEsparsa, "_materializa",_dict_materializa),
+        (MatrizEsparsa, "mult_escalar",lambda f: _time("dict.scale", f)),
+        (MatrizEsparsa, "mult_matriz", lambda f: _time("dict.matmul", f, _products, rows=True)),
+        (TreeMatrix, "access",  lambda f: _count("tree.access", f)),
+        (TreeMatrix, "insert",  lambda f: _count("tree.insert", f)),
+        (TreeMatrix, "add",     lambda f: _time("tree.add", f)),
+        (TreeMatrix, "scale",   lambda f: _time("tree.scale", f)),
+        (TreeMatrix, "matmul",  lambda f: _time("tree.matmul", f, _products)),
+        (_tm, "_rotL",          lambda f: _count("tree.rotations", f)),
+        (_tm, "_rotR",          lambda f: _count("tree.rotations", f)),
+        (_tm, "_find",          lambda f: _find),
+        (LilMatrix, "access",   lambda f: _count("lil.access", f)),
+        (LilMatrix, "insert",   lambda f: _count("lil.insert", f)),
+        (LilMatrix, "_row",     _lil_row),
+        (LilMatrix, "add",      lambda f: _time("lil.add", f)),
+        (LilMatrix, "scale",    lambda f: _time("lil.scale", f)),
+        (LilMatrix, "matmul",   lambda f: _time("lil.matmul", f, _products)),
+        (DenseMatrix, "access", lambda f: _count("dense.access", f)),
+        (DenseMatrix, "insert", lambda f: _count("dense.insert", f)),
+        (DenseMatrix, "add",    lambda f: _time("dense.add", f)),
+        (DenseMatrix, "scale",  lambda f: _time("dense.scale", f)),
+        (DenseMatrix, "matmul", lambda f: _time("dense.matmul", f, _products)),
+    ]
+
+@contextmanager
+def instrument() -> Iterator[Counters]:
+    """Collect counters for everything the matrix classes do inside the block:
+
+        with instrument() as c:
+            A.mult_matriz(B)
+        c.dump("counters.json")
+
+       Wrappers are installed on entry and removed on exit; outside the block
+       the classes run their original, uninstrumented code.
+    """
+    global _active
+    if _active is not None: raise RuntimeError("instrument() is already active")
+    counters = Counters()
+    saved = []
+    for owner, name, make in _patches():
+        original = owner.__dict__[name] if isinstance(owner, type) else getattr(owner, name)
+        saved.append((owner, name, original))
+        setattr(owner, name, make(original))
+    _active = counters
+    try:
+        yield counters
+    finally:
+        _active = None
+        for owner, name, original in reversed(saved):
+            setattr(owner, name, original)
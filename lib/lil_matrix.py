@@ -0,0 +1,383 @@
+
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .views import SubmatrixView, parse_key, is_point
+from .transpose import Compressed, counting_transpose
+from .reductions import reduce, norm
+from .elementwise import combine, hadamard_fn, mask_fn
+from .approx import approx_matmul_rows
+from .dense_matrix import DenseMatrix
+from .mixed import sparse_dense_matmul, sparse_dense_add
+
+BUF_MAX = 32   # pending writes per row before the row is merged eagerly
+
+def _merge(cols: array, vals: array, pending: Dict[int,float]) -> Tuple[array,array]:
+    # merge a sorted row with its pending writes (last write wins, 0.0 deletes)
+    oc, ov = array("i"), array("d")
+    upd = sorted(pending.items())
+    p = q = 0
+    n, m = len(cols), len(upd)
+    while p < n or q < m:
+        if q == m or (p < n and cols[p] < upd[q][0]):
+            oc.append(cols[p]); ov.append(vals[p]); p += 1
+            continue
+        c, v = upd[q]; q += 1
+        if p < n and cols[p] == c: p += 1
+        if v != 0.0:
+            oc.append(c); ov.append(v)
+    return oc, ov
+
+class LilMatrix:
+    """Row-oriented sparse matrix: each nonempty row keeps its column indices and
+       values in parallel, sorted array('i') / array('d') buffers (~12 bytes per nonzero).
+       Inserts land in a small per-row dict of pending writes that is merged into the
+       sorted arrays lazily, the first time the row is scanned (or when it grows past
+       BUF_MAX). Transpose is logical (flag), as in the other backends.
+    """
+    def __init__(self, rows:int, cols:int):
+        if rows<=0 or cols<=0: raise ValueError("invalid shape")
+        self.rows = rows
+        self.cols = cols
+        self._ci: Dict[int, array] = {}
+        self._vs: Dict[int, array] = {}
+        self._buf: Dict[int, Dict[int,float]] = {}
+        self._transposed = False
+        self._observers: List[Callable] = []
+
+    # rows/cols are the logical dims (swapped by transpose); storage uses base orientation
+    @property
+    def shape(self): return (self.rows, self.cols)
+    @property
+    def nnz(self) -> int:
+        self._flush()
+        return sum(len(c) for c in self._ci.values())
+
+    def _norm(self, i:int, j:int) -> Tuple[int,int]:
+        r,c = self.rows, self.cols
+        if self._transposed: i,j,r,c = j,i,c,r
+        if not (0 <= i < r and 0 <= j < c):
+            raise IndexError("index out of bounds")
+        return i,j
+
+    def _row(self, r:int) -> Tuple[array,array]:
+        """Sorted (cols, vals) of base row r, merging its pending writes first."""
+        pending = self._buf.pop(r, None)
+        if pending:
+            cols, vals = _merge(self._ci.get(r, array("i")), self._vs.get(r, array("d")), pending)
+            if cols:
+                self._ci[r], self._vs[r] = cols, vals
+            else:
+                self._ci.pop(r, None); self._vs.pop(r, None)
+            return cols, vals
+        return self._ci.get(r, array("i")), self._vs.get(r, array("d"))
+
+    def _flush(self) -> None:
+        for r in list(self._buf): self._row(r)
+
+    def _base_rows(self) -> List[int]:
+        self._flush()
+        return sorted(self._ci)
+
+    def access(self, i:int, j:int) -> float:
+        r,c = self._norm(i,j)
+        pending = self._buf.get(r)
+        if pending is not None and c in pending: return pending[c]
+        cols = self._ci.get(r)
+        if cols is None: return 0.0
+        k = bisect_left(cols, c)
+        return self._vs[r][k] if k < len(cols) and cols[k] == c else 0.0
+
+    def insert(self, i:int, j:int, val:float) -> None:
+        old = self.access(i,j) if self._observers else None
+        r,c = self._norm(i,j)
+        pending = self._buf.get(r)
+        if pending is None: pending = self._buf[r] = {}
+        pending[c] = val
+        if len(pending) > BUF_MAX: self._row(r)
+        if self._observers and old != val: self._notify(i, j, old, val)
+
+    def insert_many(self, rows, cols, vals, dup: str="sum") -> None:
+        """Bulk COO insert: one grouping pass by row, then one merge per touched row.
+           Duplicates are summed (dup='sum') or the last one wins (dup='last'); the
+           combined value overwrites any stored one.
+        """
+        if dup not in ("sum", "last"): raise ValueError("dup must be 'sum' or 'last'")
+        if not (len(rows) == len(cols) == len(vals)): raise ValueError("rows, cols and vals differ in length")
+        if len(rows) == 0: return
+        r,c = self.shape
+        if min(rows) < 0 or max(rows) >= r or min(cols) < 0 or max(cols) >= c:
+            raise IndexError("index out of bounds")
+        if self._transposed: rows, cols = cols, rows
+        grouped: Dict[int, Dict[int,float]] = {}
+        for i,j,v in zip(rows, cols, vals):
+            row = grouped.get(i)
+            if row is None: row = grouped[i] = {}
+            row[j] = row.get(j, 0.0) + v if dup == "sum" else v
+        if self._observers:
+            for i, pending in grouped.items():
+                for j, v in pending.items():
+                    if self._transposed: self.insert(j, i, v)
+                    else: self.insert(i, j, v)
+            return
+        for i, pending in grouped.items():
+            cols_i, vals_i = _merge(*self._row(i), pending)
+            if cols_i:
+                self._ci[i], self._vs[i] = cols_i, vals_i
+            else:
+                self._ci.pop(i, None); self._vs.pop(i, None)
+
+    @classmethod
+    def from_coo(cls, rows:int, cols:int, r, c, v, dup: str="sum") -> "LilMatrix":
+        M = cls(rows, cols)
+        M.insert_many(r, c, v, dup)
+        return M
+
+    @classmethod
+    def from_csr(cls, rows:int, cols:int, ptr, idx, vals) -> "LilMatrix":
+        """O(k + n) build from CSR with nonzero values and columns ascending in every row."""
+        M = cls(rows, cols)
+        for i in range(rows):
+            a, b = ptr[i], ptr[i+1]
+            if b > a:
+                M._ci[i] = array("i", idx[a:b])
+                M._vs[i] = array("d", vals[a:b])
+        return M
+
+    def subscribe(self, callback: Callable) -> None:
+        """callback(matrix, i, j, old, new) after every insert (logical coords);
+           after transpose it is called with i, j, old, new = None."""
+        self._observers.append(callback)
+
+    def unsubscribe(self, callback: Callable) -> None:
+        self._observers.remove(callback)
+
+    def _notify(self, i, j, old, new) -> None:
+        for cb in list(self._observers):
+            cb(self, i, j, old, new)
+
+    def __getitem__(self, key):
+        """A[i,j] -> value; A[r0:r1, c0:c1] -> zero-copy LilView."""
+        r0,r1,c0,c1 = parse_key(key, self.shape)
+        if is_point(key):
+            return self.access(r0,c0)
+        return LilView(self, r0,r1,c0,c1)
+
+    def transpose(self) -> None:
+        self._transposed = not self._transposed
+        self.rows, self.cols = self.cols, self.rows
+        if self._observers: self._notify(None, None, None, None)
+
+    def _base_csr(self) -> Compressed:
+        # stored rows concatenated: (ptr, cols, vals), cols ascending within each row
+        n = self.cols if self._transposed else self.rows
+        self._flush()
+        ptr, idx, vals = array("q", bytes(8*(n+1))), array("i"), array("d")
+        for r in range(n):
+            cols = self._ci.get(r)
+            if cols is not None:
+                idx.extend(cols); vals.extend(self._vs[r])
+            ptr[r+1] = len(idx)
+        return ptr, idx, vals
+
+    def _stored_rows(self) -> Iterable[Tuple[int, array, array]]:
+        self._flush()
+        for r, cols in self._ci.items():
+            yield r, cols, self._vs[r]
+
+    # reductions: each stored nonzero is visited once, the transpose flag only picks the axis
+    def sum(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._transposed, "sum", axis)
+
+    def count_nonzero(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._transposed, "count", axis)
+
+    def max(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._transposed, "max", axis)
+
+    def min(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._transposed, "min", axis)
+
+    def norm(self, ord="fro") -> float:
+        return norm(self._stored_rows(), self.shape, self._transposed, ord)
+
+    def _from_stored_rows(self, rows: Dict[int, Tuple[List[int], List[float]]]) -> "LilMatrix":
+        R = LilMatrix(self.rows, self.cols)
+        R._transposed = self._transposed
+        for r, (cs, vs) in rows.items():
+            R._ci[r], R._vs[r] = array("i", cs), array("d", vs)
+        return R
+
+    # element-wise ops (they commute with transpose: computed on stored rows, result keeps the flag)
+    def hadamard(self, other: "LilMatrix") -> "LilMatrix":
+        """self * other element-wise; per row pair the shorter row gallops through the longer."""
+        return self._from_stored_rows(combine(self, other, hadamard_fn, False))
+
+    def where(self, mask) -> "LilMatrix":
+        """Entries of self where `mask` is nonzero."""
+        return self._from_stored_rows(combine(self, mask, mask_fn, False))
+
+    def maximum(self, other: "LilMatrix") -> "LilMatrix":
+        """max(self, other) element-wise, implicit zeros included (sorted-merge union)."""
+        return self._from_stored_rows(combine(self, other, max, True))
+
+    def minimum(self, other: "LilMatrix") -> "LilMatrix":
+        return self._from_stored_rows(combine(self, other, min, True))
+
+    def to_csc(self, workers:int=1) -> Compressed:
+        """(colptr, rowidx, vals) of the logical matrix in O(k + n) via a counting sort
+           over column indices (no sort at all when transposed: the rows already are)."""
+        ptr, idx, vals = self._base_csr()
+        if self._transposed: return ptr, idx, vals
+        return counting_transpose(self.cols, ptr, idx, vals, workers)
+
+    def transposed_copy(self, workers:int=1) -> "LilMatrix":
+        """Physical transpose in O(k + n): each CSC column becomes a stored row."""
+        ptr, idx, vals = self.to_csc(workers)
+        R = LilMatrix(self.cols, self.rows)
+        for j in range(self.cols):
+            if ptr[j+1] > ptr[j]:
+                R._ci[j] = idx[ptr[j]:ptr[j+1]]
+                R._vs[j] = vals[ptr[j]:ptr[j+1]]
+        return R
+
+    def items(self) -> Iterable[Tuple[int,int,float]]:
+        for r in self._base_rows():
+            cols, vals = self._ci[r], self._vs[r]
+            if self._transposed:
+                for c, v in zip(cols, vals): yield (c, r, v)
+            else:
+                for c, v in zip(cols, vals): yield (r, c, v)
+
+    def iter_row(self, i:int) -> Iterable[Tuple[int,float]]:
+        """Iterate (j,val) of logical row i in column order."""
+        if not self._transposed:
+            cols, vals = self._row(i)
+            yield from zip(cols, vals)
+            return
+        # logical row i is base column i: one binary search per stored row
+        for r in self._base_rows():
+            cols = self._ci[r]
+            k = bisect_left(cols, i)
+            if k < len(cols) and cols[k] == i: yield (r, self._vs[r][k])
+
+    def _untransposed(self) -> "LilMatrix":
+        # same logical matrix with physical rows = logical rows
+        if not self._transposed:
+            self._flush()
+            return self
+        return LilMatrix.from_coords(self.rows, self.cols, self.items())
+
+    # algebra
+    def add(self, other: "LilMatrix") -> "LilMatrix":
+        r,c = self.shape
+        if isinstance(other, DenseMatrix): return sparse_dense_add(self, other)
+        if other.shape != (r,c): raise ValueError("shape mismatch on add")
+        A, B = self._untransposed(), other._untransposed()
+        R = LilMatrix(r,c)
+        for i in set(A._ci) | set(B._ci):
+            ac, av = A._ci.get(i, ()), A._vs.get(i, ())
+            bc, bv = B._ci.get(i, ()), B._vs.get(i, ())
+            oc, ov = array("i"), array("d")
+            p = q = 0
+            while p < len(ac) or q < len(bc):
+                if q == len(bc) or (p < len(ac) and ac[p] < bc[q]):
+                    j, v = ac[p], av[p]; p += 1
+                elif p == len(ac) or bc[q] < ac[p]:
+                    j, v = bc[q], bv[q]; q += 1
+                else:
+                    j, v = ac[p], av[p] + bv[q]; p += 1; q += 1
+                if v != 0.0:
+                    oc.append(j); ov.append(v)
+            if oc: R._ci[i], R._vs[i] = oc, ov
+        return R
+
+    def scale(self, a: float) -> "LilMatrix":
+        r,c = self.shape
+        R = LilMatrix(r,c)
+        if a == 0.0: return R
+        A = self._untransposed()
+        for i, cols in A._ci.items():
+            vals = array("d", [a*v for v in A._vs[i]])
+            if 0.0 in vals:  # underflow
+                keep = [k for k, v in enumerate(vals) if v != 0.0]
+                cols = array("i", [cols[k] for k in keep]); vals = array("d", [vals[k] for k in keep])
+                if not cols: continue
+            R._ci[i], R._vs[i] = array("i", cols), vals
+        return R
+
+    def matmul(self, other: "LilMatrix") -> "LilMatrix":
+        if isinstance(other, DenseMatrix): return sparse_dense_matmul(self, other)
+        nA,mA = self.shape
+        nB,mB = other.shape
+        if mA != nB: raise ValueError("shape mismatch on matmul")
+        A, B = self._untransposed(), other._untransposed()
+        R = LilMatrix(nA, mB)
+        for i, a_cols in A._ci.items():
+            acc: Dict[int,float] = {}
+            for t, a in zip(a_cols, A._vs[i]):
+                b_cols = B._ci.get(t)
+                if b_cols is None: continue
+                for j, b in zip(b_cols, B._vs[t]):
+                    acc[j] = acc.get(j, 0.0) + a*b
+            js = sorted(j for j, v in acc.items() if v != 0.0)
+            if js:
+                R._ci[i] = array("i", js)
+                R._vs[i] = array("d", [acc[j] for j in js])
+        return R
+
+    def approx_matmul(self, other: "LilMatrix", atol: float=0.0, rtol: float=0.0,
+                      top_k: Optional[int]=None) -> "LilMatrix":
+        """Pruned self @ other: each output row keeps only |v| > max(atol, rtol * max|row|),
+           and at most its top_k largest magnitudes."""
+        nA,mA = self.shape
+        nB,mB = other.shape
+        if mA != nB: raise ValueError("shape mismatch on matmul")
+        A, B = self._untransposed(), other._untransposed()
+        a_rows = {i: dict(zip(cols, A._vs[i])) for i, cols in A._ci.items()}
+        b_rows = {t: dict(zip(cols, B._vs[t])) for t, cols in B._ci.items()}
+        R = LilMatrix(nA, mB)
+        for i, row in approx_matmul_rows(a_rows, b_rows, atol, rtol, top_k).items():
+            js = sorted(row)
+            R._ci[i] = array("i", js)
+            R._vs[i] = array("d", [row[j] for j in js])
+        return R
+
+    # convenience
+    @staticmethod
+    def from_coords(rows:int, cols:int, triplets: Iterable[Tuple[int,int,float]]) -> "LilMatrix":
+        M = LilMatrix(rows, cols)
+        grouped: Dict[int, Dict[int,float]] = {}
+        for i,j,v in triplets:
+            M._norm(i,j)
+            grouped.setdefault(i, {})[j] = v
+        for i, row in grouped.items():
+            js = sorted(j for j, v in row.items() if v != 0.0)
+            if js:
+                M._ci[i] = array("i", js)
+                M._vs[i] = array("d", [row[j] for j in js])
+        return M
+
+class LilView(SubmatrixView):
+    """Window over a LilMatrix: each stored row in the block is cut with two binary searches."""
+    def _base_get(self, i:int, j:int) -> float:
+        return self.base.access(i,j)
+
+    def _base_items(self) -> Iterable[Tuple[int,int,float]]:
+        L = self.base
+        r0,r1,c0,c1 = self.r0, self.r1, self.c0, self.c1
+        if L._transposed: r0,r1,c0,c1 = c0,c1,r0,r1
+        L._flush()
+        rows = range(r0, r1) if r1 - r0 < len(L._ci) else sorted(r for r in L._ci if r0 <= r < r1)
+        for r in rows:
+            cols = L._ci.get(r)
+            if cols is None: continue
+            vals = L._vs[r]
+            for k in range(bisect_left(cols, c0), bisect_left(cols, c1)):
+                if L._transposed: yield (cols[k], r, vals[k])
+                else: yield (r, cols[k], vals[k])
+
+    def _empty(self, r:int, c:int) -> LilMatrix:
+        return LilMatrix(r,c)
@@ -0,0 +1,122 @@
+
+from __future__ import annotations
+from typing import Dict, Iterable, Tuple
+from .sparse_matrix import MatrizEsparsa
+
+Row = Dict[int, float]
+
+def _entries(M) -> Iterable[Tuple[int,int,float]]:
+    # logical (i,j,v) nonzeros of a dict-backed or tree-backed matrix
+    if isinstance(M, MatrizEsparsa):
+        for i, row in M._linhas_logicas().items():
+            for j, v in row.items():
+                yield i, j, v
+    else:
+        yield from M.items()
+
+def _shape(M) -> Tuple[int,int]:
+    return M.corpo if isinstance(M, MatrizEsparsa) else M.shape
+
+def _subscribe(M, cb) -> None:
+    if isinstance(M, MatrizEsparsa): M.inscrever(cb)
+    else: M.subscribe(cb)
+
+def _unsubscribe(M, cb) -> None:
+    if isinstance(M, MatrizEsparsa): M.desinscrever(cb)
+    else: M.unsubscribe(cb)
+
+class MaintainedProduct:
+    """Keeps C = A*B up to date while A and B receive point updates.
+       A change of A(i,t) by d updates only row i of C with d*B[t,:]; a change
+       of B(t,j) by d updates column j of C with A[:,t]*d. Entries that become
+       exactly 0.0 are removed from C, as in mult_matriz.
+       A and B may be MatrizEsparsa or TreeMatrix (possibly the same object);
+       C is a MatrizEsparsa. Column t of A and row t of B are mirrored here so
+       that neither lookup depends on the backend's layout or transpose flag.
+    """
+    def __init__(self, A, B):
+        self.A, self.B = A, B
+        self.result = MatrizEsparsa(1, 1)
+        self._a_cols: Dict[int, Row] = {}
+        self._b_rows: Dict[int, Row] = {}
+        self.recompute()
+        _subscribe(A, self._on_change)
+        if B is not A: _subscribe(B, self._on_change)
+
+    def close(self) -> None:
+        """Stop following A and B; `result` keeps its last value."""
+        _unsubscribe(self.A, self._on_change)
+        if self.B is not self.A: _unsubscribe(self.B, self._on_change)
+
+    def recompute(self) -> MatrizEsparsa:
+        """Rebuild the mirrors and C from scratch (also clears accumulated rounding)."""
+        nA, mA = _shape(self.A)
+        nB, mB = _shape(self.B)
+        if mA != nB: raise ValueError("shape mismatch on matmul")
+        self._a_cols = {}
+        for i, t, v in _entries(self.A):
+            self._a_cols.setdefault(t, {})[i] = v
+        self._b_rows = {}
+        for t, j, v in _entries(self.B):
+            self._b_rows.setdefault(t, {})[j] = v
+        a_rows: Dict[int, Row] = {}
+        for t, col in self._a_cols.items():
+            for i, v in col.items():
+                a_rows.setdefault(i, {})[t] = v
+        self.result = _rows_matrix(a_rows, nA, mA).mult_matriz(_rows_matrix(self._b_rows, nB, mB))
+        return self.result
+
+    def _on_change(self, M, i, j, old, new) -> None:
+        if i is None:
+            # transpose: the whole product changes
+            self.recompute()
+            return
+        d = new - old
+        if M is self.A:
+            self._update_row(i, self._b_rows.get(j), d)
+            _set(self._a_cols, j, i, new)
+        if M is self.B:
+            self._update_col(j, self._a_cols.get(i), d)
+            _set(self._b_rows, i, j, new)
+
+    def _update_row(self, i:int, b_row, d:float) -> None:
+        # C[i,:] += d * B[t,:]
+        if not b_row: return
+        self.result._materializa()  # C may have been scaled or shared since the last update
+        dado = self.result.dado
+        c_row = dado.get(i)
+        if c_row is None: c_row = dado[i] = {}
+        for j, b in b_row.items():
+            nv = c_row.get(j, 0.0) + d*b
+            if nv == 0.0: c_row.pop(j, None)
+            else: c_row[j] = nv
+        if not c_row: del dado[i]
+
+    def _update_col(self, j:int, a_col, d:float) -> None:
+        # C[:,j] += A[:,t] * d
+        if not a_col: return
+        self.result._materializa()
+        dado = self.result.dado
+        for i, a in a_col.items():
+            c_row = dado.get(i)
+            if c_row is None: c_row = dado[i] = {}
+            nv = c_row.get(j, 0.0) + a*d
+            if nv == 0.0:
+                c_row.pop(j, None)
+                if not c_row: del dado[i]
+            else:
+                c_row[j] = nv
+
+def _set(index: Dict[int, Row], k:int, m:int, v:float) -> None:
+    if v == 0.0:
+        row = index.get(k)
+        if row is not None:
+            row.pop(m, None)
+            if not row: del index[k]
+    else:
+        index.setdefault(k, {})[m] = v
+
+def _rows_matrix(rows: Dict[int, Row], n:int, m:int) -> MatrizEsparsa:
+    M = MatrizEsparsa(n, m)
+    M.dado = rows
+    return M
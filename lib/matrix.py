@@ -0,0 +1,269 @@
+
+from __future__ import annotations
+import csv, math, random, statistics, time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .sparse_matrix import MatrizEsparsa
+from .tree_matrix import TreeMatrix
+from .dense_matrix import DenseMatrix
+from .lil_matrix import LilMatrix
+
+Triplet = Tuple[int,int,float]
+SUMMARY = Path(__file__).resolve().parent.parent / "results" / "summary.csv"
+
+# --- backend adapters: one uniform surface over the physical representations
+def _dict_logical(M: MatrizEsparsa) -> MatrizEsparsa:
+    # soma/mult_escalar work on the stored orientation; hand them an untransposed matrix
+    if not M.e_transposta: return M
+    N = MatrizEsparsa(*M.corpo)
+    N.dado = M._linhas_logicas()
+    return N
+
+def _coo(triplets: Iterable[Triplet]) -> Tuple[array,array,array]:
+    rs, cs, vs = array("i"), array("i"), array("d")
+    for i,j,v in triplets:
+        rs.append(i); cs.append(j); vs.append(v)
+    return rs, cs, vs
+
+def _dict_build(r:int, c:int, triplets: Iterable[Triplet]) -> MatrizEsparsa:
+    return MatrizEsparsa.de_coo(r, c, *_coo(triplets), dup='last')
+
+def _dict_items(M: MatrizEsparsa) -> Iterable[Triplet]:
+    for i, row in M._linhas_logicas().items():
+        for j, v in row.items():
+            yield i, j, v
+
+def _tree_build(r:int, c:int, triplets: Iterable[Triplet]) -> TreeMatrix:
+    return TreeMatrix.from_coo(r, c, *_coo(triplets), dup="last")
+
+def _dense_build(r:int, c:int, triplets: Iterable[Triplet]) -> DenseMatrix:
+    return DenseMatrix.from_coo(r, c, *_coo(triplets), dup="last")
+
+@dataclass(frozen=True)
+class Backend:
+    name: str
+    cls: type
+    build: Callable    # (rows, cols, triplets) -> matrix
+    items: Callable    # matrix -> logical (i,j,v) nonzeros
+    shape: Callable
+    access: Callable
+    insert: Callable
+    add: Callable
+    scale: Callable
+    matmul: Callable
+
+BACKENDS: Dict[str, Backend] = {
+    "dict": Backend("dict", MatrizEsparsa, _dict_build, _dict_items, lambda M: M.corpo,
+                    lambda M,i,j: M.acessar(i,j), lambda M,i,j,v: M.inserir(i,j,v),
+                    lambda A,B: _dict_logical(A).soma(_dict_logical(B)),
+                    lambda A,a: _dict_logical(A).mult_escalar(a),
+                    lambda A,B: _dict_logical(A).mult_matriz(_dict_logical(B))),
+    "tree": Backend("tree", TreeMatrix, _tree_build, lambda M: M.items(), lambda M: M.shape,
+                    lambda M,i,j: M.access(i,j), lambda M,i,j,v: M.insert(i,j,v),
+                    lambda A,B: A.add(B), lambda A,a: A.scale(a), lambda A,B: A.matmul(B)),
+    "lil": Backend("lil", LilMatrix, LilMatrix.from_coords, lambda M: M.items(), lambda M: M.shape,
+                   lambda M,i,j: M.access(i,j), lambda M,i,j,v: M.insert(i,j,v),
+                   lambda A,B: A.add(B), lambda A,a: A.scale(a), lambda A,B: A.matmul(B)),
+    "dense": Backend("dense", DenseMatrix, _dense_build, lambda M: M.items(), lambda M: M.shape,
+                     lambda M,i,j: M.access(i,j), lambda M,i,j,v: M.insert(i,j,v),
+                     lambda A,B: A.add(B), lambda A,a: A.scale(a), lambda A,B: A.matmul(B)),
+}
+
+def backend_of(M) -> Backend:
+    for b in BACKENDS.values():
+        if isinstance(M, b.cls): return b
+    raise TypeError(f"unsupported matrix type {type(M).__name__}")
+
+# --- cost model
+_OPS = ("convert", "add", "scale", "matmul")
+
+def _work(op:str, backend:str, n:float, d:float) -> float:
+    # asymptotic work of each kernel: dense touches every cell, sparse only nonzeros
+    if backend == "dense": return n**3 if op == "matmul" else n**2
+    return n**3 * d*d if op == "matmul" else n**2 * d
+
+class Policy:
+    """Predicts ms for (op, backend, n, density) from benchmark samples
+       {(op, backend): [(n, density, ms), ...]}: nearest sample in (log n, log density),
+       scaled by the ratio of the kernel's asymptotic work. Converting an operand into a
+       backend is charged by its own "convert" samples (timed builds from triplets); without
+       them, like an `add` on that backend (one eager pass building a new matrix; dict's
+       `scale` is a lazy O(1) factor update and would make conversions to dict look free).
+    """
+    def __init__(self, samples: Dict[Tuple[str,str], List[Tuple[int,float,float]]]):
+        self.samples = samples
+
+    @classmethod
+    def from_summary(cls, path=SUMMARY, fill_missing:bool=True) -> "Policy":
+        """Samples from a bench summary. Backends it has no rows for (older summaries
+           predate lil) are calibrated here, together with dict, and their timings rescaled
+           by dict's summary/calibration ratio so both sources are on one machine's scale.
+           Summaries carry no "convert" rows, so those are calibrated the same way.
+           With fill_missing=False such backends keep an infinite cost and are never chosen."""
+        samples: Dict[Tuple[str,str], List[Tuple[int,float,float]]] = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                op, impl = row["case"].split(":", 1)
+                if impl in BACKENDS:
+                    samples.setdefault((op, impl), []).append((int(row["n"]), float(row["density"]), float(row["ms"])))
+        policy = cls(samples)
+        missing = [b for b in BACKENDS if not any(impl == b for _, impl in samples)]
+        no_convert = [b for b in BACKENDS if b not in missing and ("convert", b) not in samples]
+        if fill_missing and (missing or no_convert):
+            ops = _OPS if missing else ("convert", "add")
+            extra = cls.calibrate(backends=dict.fromkeys(missing + no_convert + ["dict"]), ops=ops).samples
+            ratios = [policy.predict(op, "dict", n, d) / ms
+                      for (op, impl), pts in extra.items() if impl == "dict" for n, d, ms in pts if ms > 0]
+            ratios = [r for r in ratios if math.isfinite(r)]
+            k = statistics.median(ratios) if ratios else 1.0
+            for (op, impl), pts in extra.items():
+                if impl in missing or op == "convert": samples[(op, impl)] = [(n, d, ms*k) for n, d, ms in pts]
+        return policy
+
+    @classmethod
+    def calibrate(cls, sizes=(40, 80), densities=(0.02, 0.1, 0.4), seed:int=1,
+                  backends: Optional[Iterable[str]]=None, ops: Iterable[str]=_OPS) -> "Policy":
+        """Quick startup micro-benchmark of convert/add/scale/matmul (or `ops`) on every
+           backend (or on `backends`). "convert" times building the backend from triplets."""
+        rng = random.Random(seed)
+        samples: Dict[Tuple[str,str], List[Tuple[int,float,float]]] = {}
+        chosen = [BACKENDS[name] for name in backends] if backends is not None else list(BACKENDS.values())
+        for n in sizes:
+            for d in densities:
+                ta = [(i,j,rng.uniform(-1,1)) for i in range(n) for j in range(n) if rng.random() < d]
+                tb = [(i,j,rng.uniform(-1,1)) for i in range(n) for j in range(n) if rng.random() < d]
+                for b in chosen:
+                    A, B = b.build(n,n,ta), b.build(n,n,tb)
+                    for op, fn in (("convert", lambda: b.build(n,n,ta)), ("add", lambda: b.add(A,B)),
+                                   ("scale", lambda: b.scale(A,2.0)), ("matmul", lambda: b.matmul(A,B))):
+                        if op not in ops: continue
+                        t0 = time.perf_counter(); fn()
+                        samples.setdefault((op, b.name), []).append((n, d, (time.perf_counter()-t0)*1000.0))
+        return cls(samples)
+
+    @classmethod
+    def default(cls) -> "Policy":
+        return cls.from_summary() if SUMMARY.exists() else cls.calibrate()
+
+    def predict(self, op:str, backend:str, n:float, d:float) -> float:
+        pts = self.samples.get((op, backend))
+        if not pts: return math.inf
+        d = max(d, 1e-9)
+        def dist(p):
+            return (math.log(p[0]) - math.log(n))**2 + (math.log(max(p[1],1e-9)) - math.log(d))**2
+        pn, pd, ms = min(pts, key=dist)
+        return ms * _work(op, backend, n, d) / max(_work(op, backend, pn, pd), 1e-12)
+
+    def convert_cost(self, backend:str, n:float, d:float) -> float:
+        ms = self.predict("convert", backend, n, d)
+        return ms if math.isfinite(ms) else self.predict("add", backend, n, d)
+
+    def choose(self, op:str, operands: List["Matrix"]) -> str:
+        r, c = operands[0].shape
+        n, d = math.sqrt(r*c), operands[0].density
+        best, best_cost = None, math.inf
+        for name in BACKENDS:
+            cost = self.predict(op, name, n, d)
+            for M in operands:
+                if name not in M._reps:
+                    cost += self.convert_cost(name, n, M.density)
+            if cost < best_cost: best, best_cost = name, cost
+        return best or "dict"
+
+_default_policy: Optional[Policy] = None
+
+def default_policy() -> Policy:
+    global _default_policy
+    if _default_policy is None: _default_policy = Policy.default()
+    return _default_policy
+
+class Matrix:
+    """Backend-agnostic matrix. Holds one or more physical representations
+       (dict/tree/lil/dense), converts lazily, and runs each operation on whichever
+       backend the policy predicts is cheapest including conversion cost.
+       Writes go to the primary representation and drop the other copies.
+    """
+    def __init__(self, rows:int, cols:int, policy: Optional[Policy]=None, backend:str="dict"):
+        self._shape = (rows, cols)
+        self.policy = policy
+        self._reps: Dict[str, object] = {backend: BACKENDS[backend].build(rows, cols, ())}
+        self._primary = backend
+        self._nnz: Optional[int] = 0
+
+    @classmethod
+    def wrap(cls, M, policy: Optional[Policy]=None) -> "Matrix":
+        b = backend_of(M)
+        r, c = b.shape(M)
+        out = cls.__new__(cls)
+        out._shape, out.policy = (r, c), policy
+        out._reps, out._primary, out._nnz = {b.name: M}, b.name, None
+        return out
+
+    @property
+    def shape(self): return self._shape
+    @property
+    def backends(self) -> List[str]: return list(self._reps)
+    @property
+    def nnz(self) -> int:
+        if self._nnz is None:
+            b = BACKENDS[self._primary]
+            self._nnz = sum(1 for _ in b.items(self._reps[self._primary]))
+        return self._nnz
+    @property
+    def density(self) -> float:
+        r, c = self._shape
+        return self.nnz / float(r*c) if r*c else 0.0
+
+    def _policy(self) -> Policy:
+        return self.policy if self.policy is not None else default_policy()
+
+    def as_backend(self, name:str):
+        """Physical representation in backend `name`, converted (and kept) on first use."""
+        M = self._reps.get(name)
+        if M is None:
+            src = BACKENDS[self._primary]
+            M = BACKENDS[name].build(*self._shape, src.items(self._reps[self._primary]))
+            self._reps[name] = M
+        return M
+
+    def access(self, i:int, j:int) -> float:
+        return BACKENDS[self._primary].access(self._reps[self._primary], i, j)
+
+    def insert(self, i:int, j:int, v:float) -> None:
+        self._reps = {self._primary: self._reps[self._primary]}
+        BACKENDS[self._primary].insert(self._reps[self._primary], i, j, v)
+        self._nnz = None
+
+    def transpose(self) -> None:
+        for M in self._reps.values(): M.transpose()
+        self._shape = (self._shape[1], self._shape[0])
+
+    def items(self) -> Iterable[Triplet]:
+        return BACKENDS[self._primary].items(self._reps[self._primary])
+
+    def _result(self, M) -> "Matrix":
+        return Matrix.wrap(M, self.policy)
+
+    def add(self, other:"Matrix") -> "Matrix":
+        if other.shape != self.shape: raise ValueError("shape mismatch on add")
+        name = self._policy().choose("add", [self, other])
+        return self._result(BACKENDS[name].add(self.as_backend(name), other.as_backend(name)))
+
+    def scale(self, a:float) -> "Matrix":
+        name = self._policy().choose("scale", [self])
+        return self._result(BACKENDS[name].scale(self.as_backend(name), a))
+
+    def matmul(self, other:"Matrix") -> "Matrix":
+        if self.shape[1] != other.shape[0]: raise ValueError("shape mismatch on matmul")
+        name = self._policy().choose("matmul", [self, other])
+        return self._result(BACKENDS[name].matmul(self.as_backend(name), other.as_backend(name)))
+
+    def __add__(self, other): return self.add(other)
+    def __matmul__(self, other): return self.matmul(other)
+    def __mul__(self, other):
+        if isinstance(other, (int, float)): return self.scale(other)
+        return self.matmul(other)
+    def __rmul__(self, other): return self.scale(other)
@@ -0,0 +1,69 @@
+
+from __future__ import annotations
+from typing import Iterable, List, Sequence, Tuple
+
+from .dense_matrix import DenseMatrix
+
+# Mixed sparse/dense kernels. Only the sparse operand's nonzeros are visited and the
+# result is written straight into a DenseMatrix row buffer; neither side is converted.
+# Any sparse backend works: its stored rows come with the lazy scale already applied.
+StoredRows = Iterable[Tuple[int, Sequence[int], Sequence[float]]]
+
+def _stored(S) -> Tuple[StoredRows, bool, Tuple[int,int]]:
+    # (stored rows, transpose flag, logical shape) of a dict, tree or lil matrix
+    if hasattr(S, "_linhas_armazenadas"):
+        return S._linhas_armazenadas(), S.e_transposta, S.corpo
+    return S._stored_rows(), S._transposed, S.shape
+
+def _logical_rows(D: DenseMatrix) -> List[List[float]]:
+    # D's logical rows: the buffer itself, or its columns when D is transposed
+    return [list(col) for col in zip(*D.a)] if D._t else D.a
+
+def _logical_cols(D: DenseMatrix) -> List[List[float]]:
+    return D.a if D._t else [list(col) for col in zip(*D.a)]
+
+def _axpy_rows(out: List[List[float]], rows: StoredRows, src: List[List[float]], swap: bool) -> None:
+    # out[i] += s * src[t] for every nonzero s at (i, t); swap reads stored (t, i) instead
+    for r, cs, vs in rows:
+        for c, s in zip(cs, vs):
+            i, t = (c, r) if swap else (r, c)
+            oi, st = out[i], src[t]
+            for j, x in enumerate(st):
+                if x != 0.0: oi[j] += s*x
+
+def sparse_dense_matmul(S, D: DenseMatrix) -> DenseMatrix:
+    """S @ D as a dense matrix: each nonzero S[i,t] adds a scaled row t of D into row i,
+       so the work is nnz(S) * cols(D)."""
+    rows, transposed, (n, m) = _stored(S)
+    if m != D.rows: raise ValueError("shape mismatch on matmul")
+    R = DenseMatrix(n, D.cols)
+    _axpy_rows(R.a, rows, _logical_rows(D), transposed)
+    return R
+
+def dense_sparse_matmul(D: DenseMatrix, S) -> DenseMatrix:
+    """D @ S as a dense matrix, computed as (S^T @ D^T)^T: each nonzero S[t,j] adds a
+       scaled column t of D into column j of the result. The result buffer holds those
+       columns as rows and is returned flagged transposed, so nothing is copied back."""
+    rows, transposed, (m, p) = _stored(S)
+    if D.cols != m: raise ValueError("shape mismatch on matmul")
+    R = DenseMatrix(p, D.rows)
+    _axpy_rows(R.a, rows, _logical_cols(D), not transposed)
+    R.transpose()
+    return R
+
+def sparse_dense_add(S, D: DenseMatrix) -> DenseMatrix:
+    """S + D as a dense matrix: a copy of D's buffer (same orientation) plus one
+       update per nonzero of S."""
+    rows, transposed, shape = _stored(S)
+    if shape != D.shape: raise ValueError("shape mismatch on add")
+    R = DenseMatrix(len(D.a), len(D.a[0]))
+    R.a = [row[:] for row in D.a]
+    if D._t: R.transpose()
+    a, swap = R.a, transposed != D._t
+    for r, cs, vs in rows:
+        if swap:
+            for c, v in zip(cs, vs): a[c][r] += v
+        else:
+            ar = a[r]
+            for c, v in zip(cs, vs): ar[c] += v
+    return R
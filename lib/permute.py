@@ -0,0 +1,118 @@
+
+from __future__ import annotations
+from array import array
+from collections import deque
+from typing import Callable, List, Optional, Sequence
+
+from .sparse_matrix import MatrizEsparsa
+from .transpose import Compressed, counting_transpose
+
+# Row/column permutations for every backend. A permutation `p` lists old indices in
+# their new order: row k of the permuted matrix is old row p[k]. Everything goes through
+# the logical CSC (to_csc / para_csc) and the backends' from_csr, so applying one is
+# O(n + k) for the sparse backends.
+Perm = Sequence[int]
+
+def _shape(M):
+    return M.corpo if isinstance(M, MatrizEsparsa) else M.shape
+
+def _csc(M) -> Compressed:
+    return M.para_csc() if isinstance(M, MatrizEsparsa) else M.to_csc()
+
+def _from_csr(M, rows:int, cols:int, ptr, idx, vals):
+    if isinstance(M, MatrizEsparsa): return MatrizEsparsa.de_csr(rows, cols, ptr, idx, vals)
+    return type(M).from_csr(rows, cols, ptr, idx, vals)
+
+def _check(p: Perm, n:int) -> None:
+    if len(p) != n: raise ValueError("permutation length does not match the dimension")
+    seen = bytearray(n)
+    for k in p:
+        if not (0 <= k < n) or seen[k]: raise ValueError("not a permutation")
+        seen[k] = 1
+
+def inverse(p: Perm) -> array:
+    """q with q[p[k]] = k: maps an old index to its new position."""
+    q = array("i", bytes(4*len(p)))
+    for k, old in enumerate(p): q[old] = k
+    return q
+
+def permute(M, row_perm: Optional[Perm]=None, col_perm: Optional[Perm]=None):
+    """New matrix of M's backend with entry (k, l) = M[row_perm[k], col_perm[l]]
+       (None keeps that axis). One pass over the columns of M in col_perm order with
+       rows relabelled, then a counting-sort regroup into sorted CSR: O(n + m + k)."""
+    n, m = _shape(M)
+    if row_perm is not None: _check(row_perm, n)
+    if col_perm is not None: _check(col_perm, m)
+    cptr, ridx, vals = _csc(M)
+    relabel = inverse(row_perm) if row_perm is not None else None
+    ptr, idx, out = array("q", [0]), array("i"), array("d")
+    for j in (col_perm if col_perm is not None else range(m)):
+        a, b = cptr[j], cptr[j+1]
+        idx.extend(ridx[a:b] if relabel is None else (relabel[i] for i in ridx[a:b]))
+        out.extend(vals[a:b])
+        ptr.append(len(idx))
+    return _from_csr(M, n, m, *counting_transpose(n, ptr, idx, out))
+
+def bandwidth(M) -> int:
+    """max |i - j| over the nonzeros (0 for diagonal or empty matrices)."""
+    ptr, idx, _ = _csc(M)
+    w = 0
+    for j in range(len(ptr)-1):
+        a, b = ptr[j], ptr[j+1]
+        if b > a: w = max(w, j - idx[a], idx[b-1] - j)
+    return w
+
+def degree_order(M, axis:int=1, descending:bool=True) -> List[int]:
+    """Rows (axis=1) or columns (axis=0) sorted by nonzero count, ties by index. Heaviest
+       first by default, so contiguous chunks of the order are balanced greedily."""
+    if axis not in (0, 1): raise ValueError("axis must be 0 or 1")
+    ptr, idx, _ = _csc(M)
+    n, m = _shape(M)
+    if axis == 0:
+        deg = [ptr[j+1] - ptr[j] for j in range(m)]
+    else:
+        deg = [0]*n
+        for i in idx: deg[i] += 1
+    return sorted(range(len(deg)), key=(lambda i: (-deg[i], i)) if descending else (lambda i: (deg[i], i)))
+
+def rcm(M) -> List[int]:
+    """Reverse Cuthill-McKee order of a square matrix, on the symmetric pattern of M + M^T.
+       Each connected component is searched breadth-first from its lowest-degree vertex,
+       visiting neighbours by increasing degree; reversing the result keeps the nonzeros
+       close to the diagonal. Apply it to rows and columns: permute(M, p, p)."""
+    n, m = _shape(M)
+    if n != m: raise ValueError("rcm needs a square matrix")
+    ptr, idx, _ = _csc(M)
+    adj: List[set] = [set() for _ in range(n)]
+    for j in range(n):
+        for p in range(ptr[j], ptr[j+1]):
+            i = idx[p]
+            if i != j:
+                adj[i].add(j); adj[j].add(i)
+    deg = [len(a) for a in adj]
+    order: List[int] = []
+    seen = bytearray(n)
+    for s in sorted(range(n), key=deg.__getitem__):
+        if seen[s]: continue
+        seen[s] = 1
+        queue = deque([s])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            for w in sorted(adj[v], key=deg.__getitem__):
+                if not seen[w]:
+                    seen[w] = 1
+                    queue.append(w)
+    order.reverse()
+    return order
+
+def reordered(op: Callable, A, B=None, p: Optional[Perm]=None, q: Optional[Perm]=None,
+              r: Optional[Perm]=None):
+    """op evaluated on reordered operands, with the result put back in the original order.
+       Binary (product-shaped, e.g. matmul): op(P A Q^T, Q B R^T) = P op(A, B) R^T, so the
+       result is un-permuted with p and r. Unary (B is None, shape-preserving): op(P A Q^T)
+       is un-permuted with p and q. None leaves that axis alone."""
+    inv = lambda x: inverse(x) if x is not None else None
+    if B is None:
+        return permute(op(permute(A, p, q)), inv(p), inv(q))
+    return permute(op(permute(A, p, q), permute(B, q, r)), inv(p), inv(r))
@@ -0,0 +1,101 @@
+
+from __future__ import annotations
+import math
+from array import array
+from typing import Iterable, Optional, Sequence, Tuple, Union
+
+# (stored row, its column indices, its values): what each backend hands in, in storage
+# orientation and with any lazy scale already applied. Every nonzero is visited once.
+StoredRows = Iterable[Tuple[int, Sequence[int], Sequence[float]]]
+OPS = ("sum", "abssum", "sqsum", "count", "max", "min")
+
+def reduce(rows: StoredRows, shape: Tuple[int,int], transposed: bool, op: str,
+           axis: Optional[int]=None) -> Union[float, int, array]:
+    """Reduce the logical matrix of logical `shape` whose stored rows are `rows`.
+       axis=None -> scalar; axis=0 -> one value per column; axis=1 -> one value per row
+       (numpy convention). Per-axis results are array('d'), or array('q') for "count".
+       max/min include the implicit zeros of any row/column that is not full.
+       The transpose flag only decides whether a logical axis is the stored row or the
+       stored column; nothing is transposed.
+    """
+    if op not in OPS: raise ValueError(f"unknown reduction {op!r}")
+    if axis not in (None, 0, 1): raise ValueError("axis must be None, 0 or 1")
+    r, c = shape
+    if axis is None: return _total(rows, r*c, op)
+    n = r if axis == 1 else c          # length of the result
+    width = c if axis == 1 else r      # cells per reduced line
+    if (axis == 1) != transposed:
+        return _per_stored_row(rows, n, width, op)
+    return _per_stored_col(rows, n, width, op)
+
+def norm(rows: StoredRows, shape: Tuple[int,int], transposed: bool, ord="fro") -> float:
+    """'fro' (Frobenius), 1 (max column abs-sum) or inf (max row abs-sum)."""
+    if ord == "fro":
+        return math.sqrt(_total(rows, 0, "sqsum"))
+    if ord == 1 or ord == math.inf:
+        sums = reduce(rows, shape, transposed, "abssum", 0 if ord == 1 else 1)
+        return max(sums, default=0.0)
+    raise ValueError("ord must be 'fro', 1 or math.inf")
+
+def _total(rows: StoredRows, cells: int, op: str):
+    if op == "count": return sum(len(vs) for _, _, vs in rows)
+    if op in ("max", "min"):
+        pick = max if op == "max" else min
+        best, seen = None, 0
+        for _, _, vs in rows:
+            if not vs: continue
+            m = pick(vs)
+            best = m if best is None else pick(best, m)
+            seen += len(vs)
+        if best is None: return 0.0
+        return pick(best, 0.0) if seen < cells else best
+    f = _elementwise(op)
+    return sum(sum(map(f, vs)) if f else sum(vs) for _, _, vs in rows)
+
+def _elementwise(op: str):
+    if op == "abssum": return abs
+    if op == "sqsum": return lambda v: v*v
+    return None
+
+def _per_stored_row(rows: StoredRows, n: int, width: int, op: str) -> array:
+    if op == "count":
+        out = array("q", bytes(8*n))
+        for i, _, vs in rows: out[i] = len(vs)
+        return out
+    out = array("d", bytes(8*n))
+    if op in ("max", "min"):
+        pick = max if op == "max" else min
+        for i, _, vs in rows:
+            if not vs: continue
+            m = pick(vs)
+            out[i] = pick(m, 0.0) if len(vs) < width else m
+        return out
+    f = _elementwise(op)
+    for i, _, vs in rows:
+        out[i] = sum(map(f, vs)) if f else sum(vs)
+    return out
+
+def _per_stored_col(rows: StoredRows, n: int, width: int, op: str) -> array:
+    if op == "count":
+        out = array("q", bytes(8*n))
+        for _, cs, _ in rows:
+            for j in cs: out[j] += 1
+        return out
+    if op in ("max", "min"):
+        pick = max if op == "max" else min
+        out = array("d", [-math.inf if op == "max" else math.inf])*n
+        seen = array("q", bytes(8*n))
+        for _, cs, vs in rows:
+            for j, v in zip(cs, vs):
+                out[j] = pick(out[j], v); seen[j] += 1
+        for j in range(n):
+            if seen[j] < width: out[j] = pick(out[j], 0.0)
+        return out
+    f = _elementwise(op)
+    out = array("d", bytes(8*n))
+    for _, cs, vs in rows:
+        if f:
+            for j, v in zip(cs, vs): out[j] += f(v)
+        else:
+            for j, v in zip(cs, vs): out[j] += v
+    return out
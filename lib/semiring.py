@@ -0,0 +1,130 @@
+
+from __future__ import annotations
+import math, operator
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+Row = Dict[int, float]
+
+@dataclass(frozen=True)
+class Semiring:
+    """(add, mul) pair used by the generic matmul/SpMV kernels.
+       `zero` is the additive identity: entries equal to it are implicit (not stored),
+       and a product's missing entries read as it (access/acessar).
+       `absorbing`, when set, is a value with add(absorbing, x) == absorbing, so an
+       accumulator that reaches it can stop early.
+    """
+    name: str
+    add: Callable[[float,float], float]
+    mul: Callable[[float,float], float]
+    zero: float = 0.0
+    absorbing: Optional[float] = None
+
+PLUS_TIMES = Semiring("plus_times", operator.add, operator.mul, 0.0)
+BOOLEAN    = Semiring("boolean", lambda a,b: 1.0 if (a or b) else 0.0,
+                                 lambda a,b: 1.0 if (a and b) else 0.0, 0.0, 1.0)
+MIN_PLUS   = Semiring("min_plus", min, operator.add, math.inf, -math.inf)
+TROPICAL   = MIN_PLUS
+# max-times assumes nonnegative values (e.g. probabilities): 0 is then the max identity
+MAX_TIMES  = Semiring("max_times", max, operator.mul, 0.0, math.inf)
+
+def matmul_rows(a_rows: Dict[int,Row], b_rows: Dict[int,Row], sr: Semiring, ncols:int) -> Dict[int,Row]:
+    """Row-by-row (Gustavson) product over `sr`. Rows are {col: val} dicts in logical
+       orientation; missing entries are sr.zero. Returns rows without implicit entries.
+    """
+    out: Dict[int,Row] = {}
+    if sr is BOOLEAN:
+        # set union of the rows of B selected by row i of A; stop once the row is full
+        for i, a_row in a_rows.items():
+            acc = set()
+            for t in a_row:
+                b_row = b_rows.get(t)
+                if b_row:
+                    acc.update(b_row)
+                    if len(acc) == ncols: break
+            if acc: out[i] = dict.fromkeys(acc, 1.0)
+        return out
+    if sr is PLUS_TIMES:
+        for i, a_row in a_rows.items():
+            acc: Row = {}
+            for t, a in a_row.items():
+                b_row = b_rows.get(t)
+                if b_row:
+                    for j, b in b_row.items():
+                        acc[j] = acc.get(j, 0.0) + a*b
+            acc = {j: v for j, v in acc.items() if v != 0.0}
+            if acc: out[i] = acc
+        return out
+    if sr is MIN_PLUS:
+        for i, a_row in a_rows.items():
+            acc = {}
+            for t, a in a_row.items():
+                b_row = b_rows.get(t)
+                if b_row:
+                    for j, b in b_row.items():
+                        s = a + b
+                        cur = acc.get(j)
+                        if cur is None or s < cur: acc[j] = s
+            acc = {j: v for j, v in acc.items() if v != math.inf}
+            if acc: out[i] = acc
+        return out
+    if sr is MAX_TIMES:
+        for i, a_row in a_rows.items():
+            acc = {}
+            for t, a in a_row.items():
+                b_row = b_rows.get(t)
+                if b_row:
+                    for j, b in b_row.items():
+                        p = a * b
+                        cur = acc.get(j)
+                        if cur is None or p > cur: acc[j] = p
+            acc = {j: v for j, v in acc.items() if v != 0.0}
+            if acc: out[i] = acc
+        return out
+    # generic path
+    add, mul, zero, absorbing = sr.add, sr.mul, sr.zero, sr.absorbing
+    for i, a_row in a_rows.items():
+        acc = {}
+        done = set()
+        for t, a in a_row.items():
+            b_row = b_rows.get(t)
+            if not b_row: continue
+            for j, b in b_row.items():
+                if j in done: continue
+                p = mul(a, b)
+                v = add(acc[j], p) if j in acc else p
+                acc[j] = v
+                if absorbing is not None and v == absorbing: done.add(j)
+            if len(done) == ncols: break
+        acc = {j: v for j, v in acc.items() if v != zero}
+        if acc: out[i] = acc
+    return out
+
+def matvec_rows(a_rows: Dict[int,Row], x: List[float], sr: Semiring, nrows:int) -> List[float]:
+    """y = A x over `sr` for a dense vector x; rows of y with no contribution are sr.zero."""
+    y = [sr.zero]*nrows
+    if sr is BOOLEAN:
+        for i, a_row in a_rows.items():
+            if any(x[t] for t in a_row): y[i] = 1.0
+        return y
+    if sr is PLUS_TIMES:
+        for i, a_row in a_rows.items():
+            y[i] = sum(a*x[t] for t, a in a_row.items())
+        return y
+    if sr is MIN_PLUS:
+        for i, a_row in a_rows.items():
+            y[i] = min((a + x[t] for t, a in a_row.items()), default=math.inf)
+        return y
+    if sr is MAX_TIMES:
+        for i, a_row in a_rows.items():
+            y[i] = max((a * x[t] for t, a in a_row.items()), default=0.0)
+        return y
+    add, mul, zero, absorbing = sr.add, sr.mul, sr.zero, sr.absorbing
+    for i, a_row in a_rows.items():
+        acc = zero
+        for t, a in a_row.items():
+            if x[t] == zero: continue
+            acc = add(acc, mul(a, x[t]))
+            if absorbing is not None and acc == absorbing: break
+        y[i] = acc
+    return y
@@ -1,24 +1,57 @@
+import pickle
+from array import array
+from itertools import chain
+from .semiring import PLUS_TIMES, matmul_rows, matvec_rows
+from .views import SubmatrixView, parse_key, is_point
+from .transpose import counting_transpose
+from .reductions import reduce, norm
+from .approx import approx_matmul_rows
+from .dense_matrix import DenseMatrix
+from .mixed import sparse_dense_matmul, sparse_dense_add
+
 class MatrizEsparsa:
+    # valor das posições ausentes; só o resultado de um produto sobre semianel o muda
+    # (inf no min-plus), e aí um 0.0 guardado é diferente de "sem caminho"
+    nulo = 0.0
+
     def __init__(self, linhas: int, colunas: int):
         self.colunas = colunas
         self.linhas = linhas
         self.corpo = (linhas, colunas)
         self.dado: dict[int, dict[int, float]] = {}  # linha -> {coluna -> valor}
         self.e_transposta = False
+        self.observadores = []  # callbacks f(matriz, i, j, antigo, novo) chamados a cada mutação
+        self.fator = 1  # escala preguiçosa: o valor lógico é dado[l][c] * fator
+        self.compartilhado = False  # dado é dividido com outra matriz (copy-on-write)
 
     @classmethod
     def carrega_do_arquivo(cls, caminho):
         with open(caminho, 'r') as f:
             linhas = f.readlines()
 
-        linhas = len(linhas)
-        colunas = len(linhas[0].strip().split())
-        matriz = cls(linhas, colunas) 
-
+        l, c, v = array('i'), array('i'), array('d')
         for i, linha in enumerate(linhas):
             for j, valor in enumerate(linha.strip().split()):
-                matriz.inserir(i, j, float(valor))
+                valor = float(valor)
+                if valor != 0:
+                    l.append(i); c.append(j); v.append(valor)
+
+        return cls.de_coo(len(linhas), len(linhas[0].strip().split()), l, c, v)
+
+    @classmethod
+    def de_coo(cls, linhas, colunas, l, c, v, dup='sum'):
+        # Constrói a matriz a partir de triplas COO (sequências ou arrays) de uma vez
+        matriz = cls(linhas, colunas)
+        matriz.inserir_muitos(l, c, v, dup)
+        return matriz
 
+    @classmethod
+    def de_csr(cls, linhas, colunas, ptr, idx, valores):
+        # Constrói a partir de CSR (ptr, colunas, valores) em O(k + n); valores não nulos
+        matriz = cls(linhas, colunas)
+        for l in range(linhas):
+            if ptr[l + 1] > ptr[l]:
+                matriz.dado[l] = dict(zip(idx[ptr[l]:ptr[l + 1]], valores[ptr[l]:ptr[l + 1]]))
         return matriz
 
     @classmethod
@@ -49,14 +82,103 @@ class MatrizEsparsa:
         else:
             for linha, colunas_dict in self.dado.items():
                 for col, valor in colunas_dict.items():
-                    print(f"({linha}, {col}): {valor}")
+                    print(f"({linha}, {col}): {valor * self.fator}")
 
     # OPERAÇÕES DA MATRIZ
     def acessar(self, i, j):
         l, c = self.get_coordenadas(i, j)
-        return self.dado.get(l, {}).get(c, 0.0)
+        return self.dado.get(l, {}).get(c, self.nulo) * self.fator
 
     def inserir(self, i, j, valor):
+        if self.observadores:
+            antigo = self.acessar(i, j)
+            self._inserir(i, j, valor)
+            if antigo != valor:
+                self._notifica(i, j, antigo, valor)
+        else:
+            self._inserir(i, j, valor)
+
+    def inserir_muitos(self, linhas, colunas, valores, dup='sum'):
+        # Inserção em lote (COO) com uma única passada de agrupamento por linha.
+        # Duplicatas do lote são somadas (dup='sum') ou a última vence (dup='last');
+        # o valor final sobrescreve o que já existia, como em inserir.
+        if dup not in ('sum', 'last'):
+            raise ValueError("dup tem que ser 'sum' ou 'last'.")
+        if not (len(linhas) == len(colunas) == len(valores)):
+            raise ValueError("linhas, colunas e valores tem que ter o mesmo tamanho.")
+        if len(linhas) == 0:
+            return
+        if min(linhas) < 0 or max(linhas) >= self.corpo[0] or min(colunas) < 0 or max(colunas) >= self.corpo[1]:
+            raise IndexError("Índice fora da matriz.")
+
+        if self.observadores: # cada mudança tem que ser notificada
+            lote = {}
+            for i, j, valor in zip(linhas, colunas, valores):
+                lote[(i, j)] = lote.get((i, j), 0) + valor if dup == 'sum' else valor
+            for (i, j), valor in lote.items():
+                self.inserir(i, j, valor)
+            return
+
+        self._materializa()
+        if self.e_transposta:
+            linhas, colunas = colunas, linhas
+        lote = {}
+        if dup == 'last':
+            for l, c, valor in zip(linhas, colunas, valores):
+                linha = lote.get(l)
+                if linha is None:
+                    linha = lote[l] = {}
+                linha[c] = valor
+        else:
+            for l, c, valor in zip(linhas, colunas, valores):
+                linha = lote.get(l)
+                if linha is None:
+                    linha = lote[l] = {}
+                linha[c] = linha.get(c, 0) + valor
+
+        for l, novos in lote.items(): # Junta o lote às linhas existentes
+            linha = self.dado.get(l)
+            if linha is None:
+                novos = {c: valor for c, valor in novos.items() if valor != 0}
+                if novos:
+                    self.dado[l] = novos
+                continue
+            for c, valor in novos.items():
+                if valor != 0:
+                    linha[c] = valor
+                else:
+                    linha.pop(c, None)
+            if not linha:
+                del self.dado[l]
+
+    def inscrever(self, callback):
+        # callback(matriz, i, j, antigo, novo) após cada inserir (coordenadas lógicas);
+        # após transpose é chamado com i, j, antigo, novo = None.
+        self.observadores.append(callback)
+
+    def desinscrever(self, callback):
+        self.observadores.remove(callback)
+
+    def _notifica(self, i, j, antigo, novo):
+        for callback in list(self.observadores):
+            callback(self, i, j, antigo, novo)
+
+    def _materializa(self):
+        # Antes de escrever: aplica o fator preguiçoso e deixa de dividir o dado (copy-on-write)
+        if self.fator == 1 and not self.compartilhado:
+            return
+        fator, dado = self.fator, {}
+        for linha, colunas_dict in self.dado.items():
+            if fator == 1:
+                nova = dict(colunas_dict)
+            else:
+                nova = {col: valor * fator for col, valor in colunas_dict.items() if valor * fator != 0}
+            if nova:
+                dado[linha] = nova
+        self.dado, self.fator, self.compartilhado = dado, 1, False
+
+    def _inserir(self, i, j, valor):
+        self._materializa()
         l, c = self.get_coordenadas(i, j)
         if valor == 0:
             if l in self.dado and c in self.dado[l]:
@@ -68,9 +190,75 @@ class MatrizEsparsa:
                 self.dado[l] = {}
             self.dado[l][c] = valor
 
+    def __getitem__(self, chave):
+        # A[i, j] -> valor; A[l0:l1, c0:c1] -> VistaEsparsa (janela sem cópia)
+        l0, l1, c0, c1 = parse_key(chave, self.corpo)
+        if is_point(chave):
+            return self.acessar(l0, c0)
+        return VistaEsparsa(self, l0, l1, c0, c1)
+
     def transpose(self):
         self.e_transposta = not self.e_transposta
         self.corpo = (self.corpo[1], self.corpo[0])
+        if self.observadores:
+            self._notifica(None, None, None, None)
+
+    def _linhas_armazenadas(self):
+        # (linha, colunas, valores) na orientação de armazenamento, com o fator aplicado
+        for l, linha in self.dado.items():
+            if self.fator == 1:
+                yield l, linha.keys(), list(linha.values())
+            else:
+                yield l, linha.keys(), [valor * self.fator for valor in linha.values()]
+
+    # Reduções: cada não nulo é visitado uma vez; a transposta só escolhe o eixo.
+    # eixo=None -> escalar, eixo=0 -> por coluna, eixo=1 -> por linha (como no numpy)
+    def somatorio(self, eixo=None):
+        return reduce(self._linhas_armazenadas(), self.corpo, self.e_transposta, "sum", eixo)
+
+    def nao_nulos(self, eixo=None):
+        return reduce(self._linhas_armazenadas(), self.corpo, self.e_transposta, "count", eixo)
+
+    def maximo(self, eixo=None):
+        return reduce(self._linhas_armazenadas(), self.corpo, self.e_transposta, "max", eixo)
+
+    def minimo(self, eixo=None):
+        return reduce(self._linhas_armazenadas(), self.corpo, self.e_transposta, "min", eixo)
+
+    def norma(self, ordem='fro'):
+        # 'fro' (Frobenius), 1 (maior soma absoluta de coluna) ou math.inf (de linha)
+        return norm(self._linhas_armazenadas(), self.corpo, self.e_transposta, ordem)
+
+    def _csr_base(self):
+        # linhas armazenadas em ordem: (ptr, colunas, valores), O(n + k), fator aplicado
+        ptr, idx, valores = array('q', bytes(8 * (self.linhas + 1))), array('i'), array('d')
+        for l in range(self.linhas):
+            linha = self.dado.get(l)
+            if linha:
+                idx.extend(linha.keys())
+                if self.fator == 1:
+                    valores.extend(linha.values())
+                else:
+                    valores.extend(valor * self.fator for valor in linha.values())
+            ptr[l + 1] = len(idx)
+        return ptr, idx, valores
+
+    def para_csc(self, trabalhadores=1):
+        # (ptr das colunas, linhas, valores) da matriz lógica em O(k + n) com counting sort
+        # nos índices de coluna; linhas em ordem crescente dentro de cada coluna.
+        csc = counting_transpose(self.colunas, *self._csr_base(), trabalhadores)
+        if self.e_transposta: # colunas lógicas são as linhas armazenadas: segunda passada
+            return counting_transpose(self.linhas, *csc, trabalhadores)
+        return csc
+
+    def copia_transposta(self, trabalhadores=1):
+        # Transposta física em O(k + n): nova matriz, sem flag, com cada coluna virando linha
+        ptr, idx, valores = self.para_csc(trabalhadores)
+        resultado = MatrizEsparsa(self.corpo[1], self.corpo[0])
+        for j in range(self.corpo[1]):
+            if ptr[j + 1] > ptr[j]:
+                resultado.dado[j] = dict(zip(idx[ptr[j]:ptr[j + 1]], valores[ptr[j]:ptr[j + 1]]))
+        return resultado
 
     def get_coordenadas(self, linha, coluna):
         if self.e_transposta:
@@ -78,6 +266,8 @@ class MatrizEsparsa:
         return linha, coluna
 
     def soma(self, other): # TODO: Testa os zeros depois de somar.
+        if isinstance(other, DenseMatrix): # resultado denso, só os não nulos de self são visitados
+            return sparse_dense_add(self, other)
         if not isinstance(other, MatrizEsparsa):
             raise ValueError("Só é possível somar matrizes do mesmo tipo.")
 
@@ -87,13 +277,16 @@ class MatrizEsparsa:
         resultado = MatrizEsparsa(self.linhas, self.colunas)
         
         for linha, colunas_dict in self.dado.items(): # Copia todos os elementos da primeira matriz
-            resultado.dado[linha] = colunas_dict.copy()
+            if self.fator == 1:
+                resultado.dado[linha] = colunas_dict.copy()
+            else: # a escala preguiçosa é aplicada durante a cópia
+                resultado.dado[linha] = {col: valor * self.fator for col, valor in colunas_dict.items()}
         
         for linha, colunas_dict in other.dado.items(): # Soma os elementos das matrizes
             if linha not in resultado.dado:
                 resultado.dado[linha] = {}
             for col, valor in colunas_dict.items():
-                novo_valor = resultado.dado[linha].get(col, 0) + valor
+                novo_valor = resultado.dado[linha].get(col, 0) + valor * other.fator
                 if novo_valor == 0:
                     if col in resultado.dado[linha]:
                         del resultado.dado[linha][col]
@@ -106,23 +299,180 @@ class MatrizEsparsa:
         
     def __radd__(self, other):
         return self.soma(other)
-        
-    def mult_escalar(self, escalar):
-        resultado = MatrizEsparsa(self.linhas, self.colunas)
 
-        for linha, colunas_dict in self.dado.items():
-            resultado.dado[linha] = {}
+    def axpy(self, alfa, X):
+        # self += alfa * X no próprio objeto: só as linhas tocadas por X são alteradas,
+        # nada é copiado, e zeros exatos são removidos.
+        if not isinstance(X, MatrizEsparsa):
+            raise ValueError("Só é possível somar matrizes do mesmo tipo.")
+        if self.corpo != X.corpo:
+            raise ValueError("As matrizes tem que ter a mesma dimenção para seram somadas.")
+        if X is self:
+            return self.__imul__(1 + alfa)
+        if alfa == 0:
+            return self
+        self._materializa()
+        alfa = alfa * X.fator
+
+        linhas = self._linhas_como(X)
+
+        if self.observadores: # cada mudança passa por inserir para ser notificada
+            for l, colunas_dict in linhas.items():
+                for c, valor in colunas_dict.items():
+                    i, j = self.get_coordenadas(l, c)
+                    self.inserir(i, j, self.acessar(i, j) + alfa * valor)
+            return self
+
+        for l, colunas_dict in linhas.items():
+            linha = self.dado.get(l)
+            if linha is None:
+                nova = {c: alfa * valor for c, valor in colunas_dict.items() if alfa * valor != 0}
+                if nova:
+                    self.dado[l] = nova
+                continue
+            for c, valor in colunas_dict.items():
+                novo_valor = linha.get(c, 0) + alfa * valor
+                if novo_valor != 0:
+                    linha[c] = novo_valor
+                else:
+                    linha.pop(c, None)
+            if not linha:
+                del self.dado[l]
+        return self
+
+    def _linhas_como(self, X):
+        # linhas armazenadas de X (sem o fator) na mesma orientação de armazenamento de self
+        if X.e_transposta == self.e_transposta:
+            return X.dado
+        linhas = {}
+        for linha, colunas_dict in X.dado.items():
             for col, valor in colunas_dict.items():
-                novo_valor = valor * escalar
+                linhas.setdefault(col, {})[linha] = valor
+        return linhas
+
+    # Operações elemento a elemento. Elas comutam com a transposta, então trabalham
+    # direto nas linhas armazenadas e o resultado herda a orientação de self.
+    def _elemento_a_elemento(self, other):
+        if not isinstance(other, MatrizEsparsa):
+            raise ValueError("Só é possível operar matrizes do mesmo tipo.")
+        if self.corpo != other.corpo:
+            raise ValueError("As matrizes tem que ter a mesma dimenção.")
+        resultado = MatrizEsparsa(self.linhas, self.colunas)
+        resultado.e_transposta, resultado.corpo = self.e_transposta, self.corpo
+        return resultado, self._linhas_como(other)
+
+    def hadamard(self, other):
+        # Produto elemento a elemento: só posições presentes nas duas matrizes.
+        # Em cada par de linhas percorre a menor e consulta a maior (O(min) por linha).
+        resultado, linhas = self._elemento_a_elemento(other)
+        for l in self.dado.keys() & linhas.keys():
+            a, b = self.dado[l], linhas[l]
+            if len(a) <= len(b):
+                nova = {c: valor * b[c] for c, valor in a.items() if c in b}
+            else:
+                nova = {c: a[c] * valor for c, valor in b.items() if c in a}
+            nova = {c: valor for c, valor in nova.items() if valor != 0}
+            if nova:
+                resultado.dado[l] = nova
+        resultado.fator = self.fator * other.fator
+        return resultado
+
+    def onde(self, mascara):
+        # Mantém as entradas de self onde a máscara é não nula (mesmo custo do hadamard)
+        resultado, linhas = self._elemento_a_elemento(mascara)
+        for l in self.dado.keys() & linhas.keys():
+            a, m = self.dado[l], linhas[l]
+            if len(a) <= len(m):
+                nova = {c: valor for c, valor in a.items() if c in m}
+            else:
+                nova = {c: a[c] for c in m if c in a}
+            if nova:
+                resultado.dado[l] = nova
+        resultado.fator = self.fator
+        return resultado
+
+    def _uniao(self, other, funcao):
+        # funcao(a, b) em toda posição guardada em qualquer uma das duas (ausente vale 0)
+        resultado, linhas = self._elemento_a_elemento(other)
+        fa, fb = self.fator, other.fator
+        for l in self.dado.keys() | linhas.keys():
+            a, b = self.dado.get(l, {}), linhas.get(l, {})
+            nova = {}
+            for c in a.keys() | b.keys():
+                valor = funcao(a.get(c, 0) * fa, b.get(c, 0) * fb)
+                if valor != 0:
+                    nova[c] = valor
+            if nova:
+                resultado.dado[l] = nova
+        return resultado
+
+    def maximo_entre(self, other):
+        # max(self, other) elemento a elemento, zeros implícitos incluídos
+        return self._uniao(other, max)
+
+    def minimo_entre(self, other):
+        return self._uniao(other, min)
+
+    def __iadd__(self, other):
+        return self.axpy(1, other)
+
+    def __isub__(self, other):
+        return self.axpy(-1, other)
+
+    def __imul__(self, other):
+        # escala no próprio objeto; produto de matrizes continua em __mul__
+        if not isinstance(other, (int, float)):
+            return NotImplemented
+        if not self.observadores: # O(1): só o fator muda
+            if other == 0:
+                self.dado, self.fator, self.compartilhado = {}, 1, False
+            else:
+                self.fator *= other
+            return self
+        self._materializa()
+        mudancas = []
+        for l in list(self.dado):
+            linha = self.dado[l]
+            for c, valor in list(linha.items()):
+                novo_valor = valor * other
                 if novo_valor != 0:
-                    resultado.dado[linha][col] = novo_valor
-            
-            if not resultado.dado[linha]:
-                del resultado.dado[linha]
+                    linha[c] = novo_valor
+                else:
+                    del linha[c]
+                if novo_valor != valor:
+                    mudancas.append((*self.get_coordenadas(l, c), valor, novo_valor))
+            if not linha:
+                del self.dado[l]
+        for i, j, antigo, novo in mudancas:
+            self._notifica(i, j, antigo, novo)
+        return self
+        
+    def mult_escalar(self, escalar):
+        # O(1): o resultado divide o dado com self e só guarda o fator;
+        # quem escrever primeiro faz a cópia (copy-on-write)
+        resultado = MatrizEsparsa(self.linhas, self.colunas)
+        resultado.e_transposta, resultado.corpo = self.e_transposta, self.corpo
+        if escalar == 0:
+            return resultado
 
+        resultado.dado = self.dado
+        resultado.fator = self.fator * escalar
+        resultado.compartilhado = self.compartilhado = True
         return resultado
 
-    def mult_matriz(self, other):
+    def mult_matriz(self, other, semianel=None):
+        if semianel is None and isinstance(other, DenseMatrix): # esparsa x densa -> densa
+            return sparse_dense_matmul(self, other)
+        if semianel is not None: # Produto sobre um semianel (booleano, min-plus, max-times, ...)
+            if self.corpo[1] != other.corpo[0]:
+                raise ValueError("Dimensões diferentes")
+            # o resultado lê semianel.zero nas posições ausentes; operações feitas a partir
+            # dele (soma, escala, inserir, ...) voltam a ser as do plus-times
+            resultado = MatrizEsparsa(self.corpo[0], other.corpo[1])
+            resultado.dado = matmul_rows(self._linhas_logicas(), other._linhas_logicas(), semianel, other.corpo[1])
+            resultado.nulo = semianel.zero
+            return resultado
+
         if self.colunas != other.linhas:
             raise ValueError("Dimensões diferentes")
         
@@ -140,20 +490,198 @@ class MatrizEsparsa:
             if resultado_linha:
                 resultado.dado[a_linha] = resultado_linha
         
+        resultado.fator = self.fator * other.fator # escalas entram uma vez no resultado
+        return resultado
+
+    def mult_aproximada(self, other, tol_abs=0.0, tol_rel=0.0, top_k=None):
+        # Produto aproximado: cada linha do resultado, logo depois de acumulada, perde as
+        # entradas com |v| <= max(tol_abs, tol_rel * max|linha|); com top_k fica só com
+        # as k maiores em módulo (heap limitado a k). Tolerâncias valem sobre os valores
+        # reais, então as linhas já saem de _linhas_logicas com o fator aplicado.
+        if self.corpo[1] != other.corpo[0]:
+            raise ValueError("Dimensões diferentes")
+        resultado = MatrizEsparsa(self.corpo[0], other.corpo[1])
+        resultado.dado = approx_matmul_rows(self._linhas_logicas(), other._linhas_logicas(),
+                                            tol_abs, tol_rel, top_k)
+        return resultado
+
+    def mult_vetor(self, x, semianel=PLUS_TIMES):
+        # y = self * x para um vetor denso x (lista); posições sem contribuição valem semianel.zero
+        if len(x) != self.corpo[1]:
+            raise ValueError("Dimensões diferentes")
+        return matvec_rows(self._linhas_logicas(), x, semianel, self.corpo[0])
+
+    def mult_mascarada(self, other, mascara, complemento=False):
+        # Calcula (self * other) apenas nas posições não nulas de `mascara`
+        # (ou, com complemento=True, apenas nas posições nulas da máscara).
+        if self.corpo[1] != other.corpo[0]:
+            raise ValueError("Dimensões diferentes")
+        if mascara.corpo != (self.corpo[0], other.corpo[1]):
+            raise ValueError("A máscara tem que ter a dimensão do produto.")
+
+        resultado = MatrizEsparsa(self.corpo[0], other.corpo[1])
+        a_dado = self._linhas_logicas()
+        b_dado = other._linhas_logicas()
+        m_dado = mascara._linhas_logicas()
+
+        if complemento:
+            for a_linha, a_colunas in a_dado.items():
+                proibidas = m_dado.get(a_linha, {})
+                resultado_linha = {}
+                for a_col, a_val in a_colunas.items():
+                    if a_col in b_dado:
+                        for b_col, b_val in b_dado[a_col].items():
+                            if b_col not in proibidas:
+                                resultado_linha[b_col] = resultado_linha.get(b_col, 0) + a_val * b_val
+                resultado_linha = {col: val for col, val in resultado_linha.items() if val != 0}
+                if resultado_linha:
+                    resultado.dado[a_linha] = resultado_linha
+            return resultado
+
+        for m_linha, m_colunas in m_dado.items():
+            a_colunas = a_dado.get(m_linha)
+            if not a_colunas:
+                continue
+            resultado_linha = {}
+            # Escolhe por linha o caminho mais barato: produto interno por entrada
+            # da máscara (len(mascara) * len(linha de A) sondagens) ou acumulação
+            # das linhas de B filtrada pela máscara (soma dos tamanhos dessas linhas).
+            custo_interno = len(m_colunas) * len(a_colunas)
+            custo_linhas = sum(len(b_dado[t]) for t in a_colunas if t in b_dado)
+            if custo_interno <= custo_linhas:
+                for col in m_colunas:
+                    valor = 0
+                    for a_col, a_val in a_colunas.items():
+                        b_linha = b_dado.get(a_col)
+                        if b_linha is not None and col in b_linha:
+                            valor += a_val * b_linha[col]
+                    if valor != 0:
+                        resultado_linha[col] = valor
+            else:
+                for a_col, a_val in a_colunas.items():
+                    if a_col in b_dado:
+                        for b_col, b_val in b_dado[a_col].items():
+                            if b_col in m_colunas:
+                                resultado_linha[b_col] = resultado_linha.get(b_col, 0) + a_val * b_val
+                resultado_linha = {col: val for col, val in resultado_linha.items() if val != 0}
+            if resultado_linha:
+                resultado.dado[m_linha] = resultado_linha
+
         return resultado
 
+    def _linhas_logicas(self):
+        # linha -> {coluna -> valor} na orientação lógica (respeita a transposta e o fator)
+        fator = self.fator
+        if not self.e_transposta:
+            if fator == 1:
+                return self.dado
+            return {linha: {col: valor * fator for col, valor in colunas_dict.items()}
+                    for linha, colunas_dict in self.dado.items()}
+        linhas = {}
+        for linha, colunas_dict in self.dado.items():
+            for col, valor in colunas_dict.items():
+                linhas.setdefault(col, {})[linha] = valor * fator
+        return linhas
+
     def __mul__(self, other):
         if isinstance(other, (int, float)):
             return self.mult_escalar(other)
-        elif isinstance(other, MatrizEsparsa):
+        elif isinstance(other, (MatrizEsparsa, DenseMatrix)):
             return self.mult_matriz(other)
         else:
             raise NotImplementedError("Multiplication only supports escalar valors or another MatrizEsparsa.")
         
+    def __reduce_ex__(self, protocol):
+        # Quatro vetores planos (linhas não vazias, tamanho de cada uma, colunas, valores
+        # brutos, sem o fator). No protocolo 5 vão como PickleBuffer, fora da banda se o
+        # chamador der buffer_callback. Observadores não são serializados.
+        vetores = (array('i'), array('q'), array('i'), array('d'))
+        for vetor, itens in zip(vetores, (list(self.dado.keys()),
+                                          list(map(len, self.dado.values())),
+                                          list(chain.from_iterable(self.dado.values())),
+                                          list(chain.from_iterable(map(dict.values, self.dado.values()))))):
+            vetor.fromlist(itens)  # fromlist é bem mais rápido que array(tipo, iterável)
+        if protocol >= 5:
+            vetores = tuple(pickle.PickleBuffer(v) for v in vetores)
+        return (_reconstroi, (self.linhas, self.colunas, self.e_transposta, self.fator) + vetores)
+
     def __rmul__(self, other):
         if isinstance(other, (int, float)):
             return self.__mul__(other)
         elif isinstance(other, MatrizEsparsa):
             return other.__mul__(self)
         else:
-            raise NotImplementedError("Multiplication only supports escalar valors or another MatrizEsparsa.")
\ No newline at end of file
+            raise NotImplementedError("Multiplication only supports escalar valors or another MatrizEsparsa.")
+
+
+def _reconstroi(linhas, colunas, e_transposta, fator, ids, tamanhos, idx, valores):
+    # Inverso de __reduce_ex__: os vetores chegam como bytes, bytearray ou buffers (nativos)
+    ids, tamanhos, idx, valores = (memoryview(v).cast('B').cast(t).tolist() for v, t in
+                                   ((ids, 'i'), (tamanhos, 'q'), (idx, 'i'), (valores, 'd')))
+    matriz = MatrizEsparsa(linhas, colunas)
+    fim = 0
+    for l, n in zip(ids, tamanhos):
+        inicio, fim = fim, fim + n
+        matriz.dado[l] = dict(zip(idx[inicio:fim], valores[inicio:fim]))
+    matriz.e_transposta, matriz.fator = e_transposta, fator
+    if e_transposta:
+        matriz.corpo = (colunas, linhas)
+    return matriz
+
+class VistaEsparsa(SubmatrixView):
+    # Janela [l0:l1, c0:c1] sobre uma MatrizEsparsa. Leituras traduzem os índices
+    # para a matriz base; a primeira escrita copia a janela (copy-on-write).
+    @property
+    def corpo(self):
+        return self.shape
+
+    def acessar(self, i, j):
+        return self.access(i, j)
+
+    def inserir(self, i, j, valor):
+        self.insert(i, j, valor)
+
+    def _base_get(self, i, j):
+        return self.base.acessar(i, j)
+
+    def _base_items(self):
+        base = self.base
+        l0, l1, c0, c1 = self.r0, self.r1, self.c0, self.c1
+        if base.e_transposta: # linhas lógicas são colunas da base
+            l0, l1, c0, c1 = c0, c1, l0, l1
+        # percorre o lado menor: a faixa de índices ou as chaves existentes
+        if l1 - l0 < len(base.dado):
+            linhas = range(l0, l1)
+        else:
+            linhas = [linha for linha in base.dado if l0 <= linha < l1]
+        for linha in linhas:
+            colunas_dict = base.dado.get(linha)
+            if not colunas_dict:
+                continue
+            if c1 - c0 < len(colunas_dict):
+                pares = [(col, colunas_dict[col]) for col in range(c0, c1) if col in colunas_dict]
+            else:
+                pares = [(col, valor) for col, valor in colunas_dict.items() if c0 <= col < c1]
+            for col, valor in pares:
+                valor = valor * base.fator
+                if base.e_transposta:
+                    yield col, linha, valor
+                else:
+                    yield linha, col, valor
+
+    def _empty(self, linhas, colunas):
+        return MatrizEsparsa(linhas, colunas)
+
+    def _get_own(self, i, j):
+        return self._own.acessar(i, j)
+
+    def _set_own(self, i, j, valor):
+        self._own.inserir(i, j, valor)
+
+    def _own_items(self):
+        for linha, colunas_dict in self._own._linhas_logicas().items():
+            for col, valor in colunas_dict.items():
+                yield linha, col, valor
+
+    def _put(self, matriz, i, j, valor):
+        matriz.dado.setdefault(i, {})[j] = valor
@@ -0,0 +1,951 @@
+import math
+import random
+
+import pytest
+
+from lib.sparse_matrix import MatrizEsparsa
+from lib.tree_matrix import TreeMatrix
+from lib.dense_matrix import DenseMatrix
+from lib.instrument import instrument
+
+
+def triplets(rows, cols, density, seed):
+    rng = random.Random(seed)
+    return [(i, j, rng.uniform(-1, 1)) for i in range(rows) for j in range(cols) if rng.random() < density]
+
+
+def dense_of(M):
+    """Logical contents of any backend as a list of rows, read through the public accessors."""
+    if isinstance(M, MatrizEsparsa):
+        r, c = M.corpo
+        return [[M.acessar(i, j) for j in range(c)] for i in range(r)]
+    r, c = M.shape
+    return [[M.access(i, j) for j in range(c)] for i in range(r)]
+
+
+def reference(rows, cols, trip):
+    return DenseMatrix.from_coo(rows, cols, *zip(*trip), dup="last") if trip else DenseMatrix(rows, cols)
+
+
+def assert_close(X, Y, tol=1e-9):
+    assert len(X) == len(Y) and all(len(a) == len(b) for a, b in zip(X, Y))
+    for a, b in zip(X, Y):
+        for x, y in zip(a, b):
+            assert abs(x - y) <= tol
+
+
+def build_dict(rows, cols, trip):
+    return MatrizEsparsa.de_coo(rows, cols, *zip(*trip), dup="last")
+
+
+# --- mixed sparse x dense kernels under the instrumentation layer
+
+def test_mixed_ops_under_instrument():
+    ta, td = triplets(6, 5, 0.4, 1), triplets(5, 6, 0.6, 2)
+    A, T = build_dict(6, 5, ta), TreeMatrix.from_coo(6, 5, *zip(*ta), dup="last")
+    D = reference(5, 6, td)
+    D2 = reference(6, 5, triplets(6, 5, 0.6, 3))
+    Dsq = reference(4, 6, triplets(4, 6, 0.6, 4))
+    ref_mm = reference(6, 5, ta).matmul(D)
+    ref_add = reference(6, 5, ta).add(D2)
+    with instrument() as c:
+        outs = {
+            "A@D": A.mult_matriz(D), "A+D": A.soma(D2), "T@D": T.matmul(D), "T+D": T.add(D2),
+            "D@A": Dsq.matmul(A), "D@T": Dsq.matmul(T), "D+A": D2.add(A),
+        }
+    assert_close(dense_of(outs["A@D"]), dense_of(ref_mm))
+    assert_close(dense_of(outs["T@D"]), dense_of(ref_mm))
+    assert_close(dense_of(outs["A+D"]), dense_of(ref_add))
+    assert_close(dense_of(outs["T+D"]), dense_of(ref_add))
+    assert_close(dense_of(outs["D+A"]), dense_of(ref_add))
+    ref_da = Dsq.matmul(reference(6, 5, ta))
+    assert_close(dense_of(outs["D@A"]), dense_of(ref_da))
+    assert_close(dense_of(outs["D@T"]), dense_of(ref_da))
+    assert all(isinstance(M, DenseMatrix) for M in outs.values())
+    assert c.counts["dict.matmul.partial_products"] == len(ta) * 6
+    assert c.counts["dense.matmul.partial_products"] == 2 * len(ta) * 4
+
+
+def test_dict_row_allocs_counted_at_copy_on_write():
+    A = build_dict(6, 5, triplets(6, 5, 0.5, 5))
+    i, row = next(iter(A.dado.items()))
+    j = next(iter(row))
+    with instrument() as c:
+        B = A.mult_escalar(2.0)
+        assert c.counts.get("dict.row_allocs", 0) == 0   # O(1) scale shares every row
+        B.inserir(i, j, 7.0)                               # first write copies the rows
+    assert c.counts["dict.row_allocs"] == len(A.dado)
+    assert B.acessar(i, j) == 7.0 and A.acessar(i, j) == row[j]
+
+
+def test_dict_row_allocs_counted_in_batch_builds():
+    ta = triplets(8, 6, 0.4, 23)
+    rows = {i for i, _, _ in ta}
+    with instrument() as c:
+        A = MatrizEsparsa.de_coo(8, 6, *zip(*ta))
+        assert c.counts["dict.row_allocs"] == len(rows)
+        A.inserir_muitos([0, 7, 7], [0, 1, 2], [1.0, 2.0, 3.0])
+        assert c.counts["dict.row_allocs"] == len(rows | {0, 7})
+        MatrizEsparsa.de_csr(3, 4, [0, 2, 2, 3], [0, 3, 1], [1.0, 2.0, 3.0])
+    assert c.counts["dict.row_allocs"] == len(rows | {0, 7}) + 2
+
+
+def test_lil_under_instrument():
+    from lib.lil_matrix import LilMatrix
+    ta, tb = triplets(6, 5, 0.4, 24), triplets(5, 6, 0.4, 25)
+    A, B = LilMatrix.from_coords(6, 5, ta), LilMatrix.from_coords(5, 6, tb)
+    A.nnz
+    with instrument() as c:
+        P = A.matmul(B)
+        A.scale(2.0); A.add(A)
+        for j in range(5): A.insert(0, j, 1.0)
+        assert A.access(0, 4) == 1.0
+        A.nnz
+    assert_close(dense_of(P), dense_of(reference(6, 5, ta).matmul(reference(5, 6, tb))))
+    b_len = {}
+    for t, _, _ in tb: b_len[t] = b_len.get(t, 0) + 1
+    assert c.counts["lil.matmul.partial_products"] == sum(b_len.get(t, 0) for _, t, _ in ta)
+    assert {"lil.matmul", "lil.scale", "lil.add"} <= set(c.calls)
+    assert c.counts["lil.insert"] == 5 and c.counts["lil.access"] >= 1
+    assert c.counts["lil.row_merges"] == 1 and c.counts["lil.merged_writes"] == 5
+
+
+# --- pickling: flat buffers for every protocol, observers left behind
+
+@pytest.mark.parametrize("protocol", [2, 4, 5])
+@pytest.mark.parametrize("kind", ["dict", "tree"])
+def test_pickle_round_trip(kind, protocol):
+    import pickle
+    trip = triplets(7, 5, 0.5, 6)
+    if kind == "dict":
+        M = build_dict(7, 5, trip)
+        M.transpose()
+        M = M * 3.0
+        M.inscrever(lambda *a: None)          # a lambda cannot be pickled
+    else:
+        M = TreeMatrix.from_coo(7, 5, *zip(*trip), dup="last")
+        M.transpose()
+        M = M.scale(3.0)
+        M.subscribe(lambda *a: None)
+    ref = reference(7, 5, trip)
+    ref.transpose()
+    ref = ref.scale(3.0)
+    bufs = []
+    data = pickle.dumps(M, protocol=protocol, buffer_callback=bufs.append if protocol >= 5 else None)
+    R = pickle.loads(data, buffers=bufs)
+    assert_close(dense_of(R), dense_of(ref))
+    assert (R.observadores if kind == "dict" else R._observers) == []
+    if protocol >= 5:
+        assert len(bufs) in (3, 4) and len(data) < 200   # arrays travelled out of band
+    # the copy is independent of the original
+    if kind == "dict":
+        R.inserir(0, 0, 9.0); assert M.acessar(0, 0) == ref.access(0, 0)
+    else:
+        R.insert(0, 0, 9.0); assert M.access(0, 0) == ref.access(0, 0)
+
+
+def test_pickle_large_tree_has_no_recursion_limit():
+    import pickle, sys
+    n = sys.getrecursionlimit() * 20
+    T = TreeMatrix.from_coo(n, 2, list(range(n)), [i % 2 for i in range(n)], [1.0] * n)
+    R = pickle.loads(pickle.dumps(T, protocol=4))
+    assert R.nnz == n and R.access(n - 1, 1) == 1.0 and R.access(n - 1, 0) == 0.0
+
+
+# --- masked product on the tree backend
+
+@pytest.mark.parametrize("complement", [False, True])
+@pytest.mark.parametrize("ta_flag,tb_flag", [(0, 0), (0, 1), (1, 0), (1, 1)])
+def test_tree_masked_matmul_matches_dense(ta_flag, tb_flag, complement, monkeypatch):
+    def tree(r, c, seed, flag, density=0.4):
+        trip = triplets(c, r, density, seed) if flag else triplets(r, c, density, seed)
+        T = TreeMatrix.from_coo(c, r, *zip(*trip), dup="last") if flag else TreeMatrix.from_coo(r, c, *zip(*trip), dup="last")
+        if flag: T.transpose()
+        return T.scale(2.0)
+    A, B, M = tree(6, 7, 10, ta_flag), tree(7, 5, 11, tb_flag), tree(6, 5, 12, 0, 0.5)
+    full = reference(6, 5, [(i, j, v) for i, j, v in TreeMatrix.matmul(A, B).items()])
+    def no_csc(*_):
+        raise AssertionError("the masked product must not build all of B's columns")
+    monkeypatch.setattr(TreeMatrix, "to_csc", no_csc)
+    R = A.masked_matmul(B, M, complement)
+    F, P = dense_of(full), dense_of(M)
+    want = [[F[i][j] if (P[i][j] != 0.0) != complement else 0.0 for j in range(5)] for i in range(6)]
+    assert_close(dense_of(R), want)
+
+
+# --- disk-backed tiles: owned temporary directories are cleaned up
+
+def test_tiled_owned_directories_are_removed(tmp_path):
+    import gc, os
+    from lib.tiled_matrix import TiledMatrix
+    trip = triplets(9, 9, 0.3, 20)
+    A = TiledMatrix.from_items(9, 9, trip, tile=4)
+    B = TiledMatrix.from_items(9, 9, trip, tile=4, directory=str(tmp_path / "b"))
+    ref = reference(9, 9, trip)
+    with A.add(B) as S, A.matmul(B) as P:
+        assert_close(dense_of(S), dense_of(ref.add(ref)))
+        assert_close(dense_of(P), dense_of(ref.matmul(ref)))
+        owned = [S.directory, P.directory]
+    assert not any(os.path.exists(d) for d in owned)
+    scaled = A.scale(2.0).directory
+    gc.collect()
+    assert not os.path.exists(scaled)            # dropped without close()
+    a_dir = A.directory
+    A.close(); B.close()
+    assert not os.path.exists(a_dir)
+    assert os.path.exists(B.directory)          # the caller's directory is kept
+    assert TiledMatrix.open(B.directory).access(*trip[0][:2]) == trip[0][2]
+
+
+
+def test_tiled_matmul_spills_accumulator_over_budget():
+    from lib.tiled_matrix import TiledMatrix
+    trip = triplets(30, 30, 0.4, 21)
+    ref = reference(30, 30, trip)
+    with TiledMatrix.from_items(30, 30, trip, tile=8) as A, \
+         TiledMatrix.from_items(30, 30, trip, tile=8, budget=1) as tight:
+        with A.matmul(A) as P, tight.matmul(tight) as Q:
+            assert_close(dense_of(P), dense_of(ref.matmul(ref)))
+            assert_close(dense_of(Q), dense_of(P))
+            assert sorted((i, j) for i, j, _ in Q.items()) == sorted((i, j) for i, j, _ in P.items())
+
+
+def test_tile_files_are_little_endian(tmp_path):
+    import struct
+    from lib.tiled_matrix import write_tile, read_tile
+    path = str(tmp_path / "t.bin")
+    tile = {0: {1: 2.5}, 3: {0: -1.0, 2: 4.0}}
+    assert write_tile(path, tile) == 3
+    raw = open(path, "rb").read()
+    magic, nnz = struct.unpack_from("<4sI", raw)
+    body = struct.unpack_from("<3i3i3d", raw, 8)
+    assert nnz == 3 and body == (0, 3, 3, 1, 0, 2, 2.5, -1.0, 4.0)
+    assert read_tile(path) == tile
+
+# --- backend policy: a summary without lil rows still lets lil be chosen
+
+def test_policy_fills_backends_missing_from_summary(tmp_path):
+    import csv, math
+    from lib.matrix import Policy, BACKENDS
+    path = tmp_path / "summary.csv"
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["n", "density", "case", "ms"])
+        for n in (100, 200):
+            for d in ("0.01", "0.10"):
+                for case in ("add:dict", "scale:dict", "matmul:dict", "add:tree", "scale:tree", "matmul:tree"):
+                    w.writerow([n, d, case, 1.0])
+    assert math.isinf(Policy.from_summary(path, fill_missing=False).predict("scale", "lil", 100, 0.01))
+    P = Policy.from_summary(path)
+    for op in ("add", "scale", "matmul"):
+        for b in BACKENDS:
+            assert math.isfinite(P.predict(op, b, 150, 0.05))
+    assert P.samples[("add", "dict")] == [(100, 0.01, 1.0), (100, 0.1, 1.0), (200, 0.01, 1.0), (200, 0.1, 1.0)]
+    assert all(P.samples.get(("convert", b)) for b in BACKENDS)
+
+
+def test_policy_charges_conversion_by_build_not_lazy_scale():
+    from lib.matrix import Policy, Matrix
+    pts = lambda ms: [(100, 0.05, ms)]
+    samples = {("add", "dict"): pts(0.8), ("add", "tree"): pts(1.0),
+               ("scale", "dict"): pts(0.0), ("scale", "tree"): pts(1.0),
+               ("convert", "dict"): pts(5.0), ("convert", "tree"): pts(5.0)}
+    M = Matrix.wrap(backend("tree", 12, 12, triplets(12, 12, 0.3, 22)))
+    assert Policy(samples).choose("add", [M, M]) == "tree"
+    # without convert samples a conversion costs an eager add on the target backend
+    del samples[("convert", "dict")], samples[("convert", "tree")]
+    assert Policy(samples).convert_cost("dict", 100, 0.05) == 0.8
+    assert Policy(samples).choose("add", [M, M]) == "tree"
+
+
+# --- distributed matmul/add through local worker processes
+
+@pytest.fixture(scope="module")
+def cluster():
+    from lib.distributed import LocalCluster
+    with LocalCluster(3) as lc:
+        yield lc
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree", "lil"])
+def test_distributed_matches_dense(cluster, kind):
+    from lib.distributed import Cluster
+    from lib.lil_matrix import LilMatrix
+    build = {"dict": build_dict,
+             "tree": lambda r, c, t: TreeMatrix.from_coo(r, c, *zip(*t), dup="last"),
+             "lil": lambda r, c, t: LilMatrix.from_coo(r, c, *zip(*t), dup="last")}[kind]
+    ta, tb, tc = triplets(13, 9, 0.3, 30), triplets(9, 7, 0.3, 31), triplets(13, 9, 0.3, 32)
+    A, B, C = build(13, 9, ta), build(9, 7, tb), build(13, 9, tc)
+    drv = Cluster(cluster.addresses, timeout=10, parts=5)
+    P, S = drv.matmul(A, B), drv.add(A, C)
+    assert type(P) is type(A) and type(S) is type(A) and drv.failures == []
+    assert_close(dense_of(P), dense_of(reference(13, 9, ta).matmul(reference(9, 7, tb))))
+    assert_close(dense_of(S), dense_of(reference(13, 9, ta).add(reference(13, 9, tc))))
+    # transposed operands go through their logical CSR
+    A.transpose()
+    At = reference(13, 9, ta)
+    At.transpose()
+    assert_close(dense_of(drv.matmul(A, build(13, 5, triplets(13, 5, 0.4, 33)))),
+                 dense_of(At.matmul(reference(13, 5, triplets(13, 5, 0.4, 33)))))
+
+
+def test_distributed_survives_dead_and_slow_workers():
+    from lib.distributed import Cluster, LocalCluster
+    ta, tb = triplets(20, 10, 0.3, 34), triplets(10, 8, 0.3, 35)
+    A, B = build_dict(20, 10, ta), build_dict(10, 8, tb)
+    want = dense_of(reference(20, 10, ta).matmul(reference(10, 8, tb)))
+    with LocalCluster(3, delays=[0.0, 0.0, 5.0]) as lc:
+        lc.kill(1)
+        drv = Cluster(lc.addresses, timeout=1.0, parts=20)   # one row each: every driver gets a task
+        assert_close(dense_of(drv.matmul(A, B)), want)
+        assert {addr for addr, _ in drv.failures} == {lc.addresses[1], lc.addresses[2]}
+        lc.kill(0)
+        with pytest.raises(RuntimeError):
+            drv.add(A, A)
+
+
+def test_csr_wire_round_trip_from_offset():
+    from array import array
+    from lib.distributed import decode_csr, encode_csr
+    ptr, idx, vals = array("q", [3, 3, 5, 6]), array("i", [9, 9, 9, 0, 2, 1]), array("d", [0, 0, 0, 1.5, -2.0, 4.0])
+    blob = encode_csr(3, 4, ptr, idx, vals) + encode_csr(0, 2, array("q", [0]), array("i"), array("d"))
+    (r, c, p, i, v), off = decode_csr(blob)
+    assert (r, c, list(p), list(i), list(v)) == (3, 4, [0, 0, 2, 3], [0, 2, 1], [1.5, -2.0, 4.0])
+    (r2, c2, p2, _, _), end = decode_csr(blob, off)
+    assert (r2, c2, list(p2), end) == (0, 2, [0], len(blob))
+
+
+# --- lil backend: pending writes, flush and the transpose flag
+
+def test_lil_inserts_flush_and_transpose_match_dense():
+    from lib.lil_matrix import BUF_MAX, LilMatrix
+    rng = random.Random(40)
+    L, D = LilMatrix(8, 6 * BUF_MAX), DenseMatrix(8, 6 * BUF_MAX)
+    for step in range(2000):
+        if step == 1000:
+            L.transpose(); D.transpose()
+        r, c = L.shape
+        i, j = rng.randrange(r), rng.randrange(c)
+        v = 0.0 if rng.random() < 0.2 else rng.uniform(-1, 1)   # zeros delete
+        L.insert(i, j, v); D.insert(i, j, v)
+        if step % 97 == 0:
+            assert L.access(i, j) == v                            # read through the pending buffer
+    assert_close(dense_of(L), dense_of(D))
+    L._flush()
+    assert not L._buf
+    for r in L._ci:
+        cols = list(L._ci[r])
+        assert cols == sorted(set(cols)) and all(L._vs[r]) and len(cols) == len(L._vs[r])
+    assert L.nnz == sum(1 for row in dense_of(D) for x in row if x != 0.0)
+    rows = dense_of(D)
+    for i in range(L.shape[0]):
+        assert list(L.iter_row(i)) == [(j, x) for j, x in enumerate(rows[i]) if x != 0.0]
+
+
+@pytest.mark.parametrize("ta,tb", [(0, 0), (0, 1), (1, 0), (1, 1)])
+def test_lil_algebra_matches_dense(ta, tb):
+    from lib.lil_matrix import LilMatrix
+    from lib.transpose import counting_transpose
+    def pair(r, c, seed, flag):
+        trip = triplets(c, r, 0.35, seed) if flag else triplets(r, c, 0.35, seed)
+        shape = (c, r) if flag else (r, c)
+        L, D = LilMatrix.from_coo(*shape, *zip(*trip), dup="last"), reference(*shape, trip)
+        if flag: L.transpose(); D.transpose()
+        L.insert(0, 0, 0.5); D.insert(0, 0, 0.5)                # left pending in the buffer
+        return L, D
+    (A, DA), (B, DB), (C, DC) = pair(7, 6, 41, ta), pair(6, 5, 42, tb), pair(7, 6, 43, tb)
+    assert_close(dense_of(A.matmul(B)), dense_of(DA.matmul(DB)))
+    assert_close(dense_of(A.add(C)), dense_of(DA.add(DC)))
+    assert_close(dense_of(A.scale(-3.0)), dense_of(DA.scale(-3.0)))
+    assert_close(dense_of(LilMatrix.from_csr(7, 6, *counting_transpose(7, *A.to_csc()))), dense_of(DA))
+
+
+def test_lil_insert_many_duplicates():
+    from lib.lil_matrix import LilMatrix
+    L = LilMatrix(3, 4)
+    L.insert(1, 1, 9.0)
+    L.insert_many([1, 1, 2, 2], [1, 1, 3, 3], [1.0, 2.0, 4.0, -4.0])
+    assert (L.access(1, 1), L.access(2, 3), L.nnz) == (3.0, 0.0, 1)
+    L.transpose()
+    L.insert_many([3, 3], [0, 0], [1.0, 5.0], dup="last")
+    assert L.access(3, 0) == 5.0 and L._ci[0][0] == 3
+    with pytest.raises(IndexError):
+        L.insert_many([4], [0], [1.0])
+
+
+# --- persistent tree: snapshots and path-copying writes
+
+def _nodes(x, out):
+    if x is not None:
+        out.add(id(x)); _nodes(x.lh, out); _nodes(x.rh, out)
+    return out
+
+
+def _check_avl(x):
+    # returns (height, size); asserts the AVL and order-statistics fields
+    if x is None: return 0, 0
+    hl, sl = _check_avl(x.lh)
+    hr, sr = _check_avl(x.rh)
+    assert abs(hl - hr) <= 1 and x.h == 1 + max(hl, hr) and x.size == 1 + sl + sr
+    return x.h, x.size
+
+
+def test_tree_snapshots_keep_their_contents():
+    rng = random.Random(50)
+    T = TreeMatrix.from_coo(12, 10, *zip(*triplets(12, 10, 0.3, 51)), dup="last")
+    versions = [(T, dense_of(T))]
+    for step in range(600):
+        if step % 50 == 0:                                   # new version; both sides keep writing
+            S = T.snapshot()
+            versions.append((S, dense_of(S)))
+            T = S if rng.random() < 0.5 else T
+        M, ref = rng.choice(versions)
+        i, j = rng.randrange(12), rng.randrange(10)
+        v = 0.0 if rng.random() < 0.3 else rng.uniform(-1, 1)
+        before, h = _nodes(M._root, set()), (M._root.h if M._root else 0)
+        M.insert(i, j, v)
+        ref[i][j] = v
+        if M._shared:   # search path plus the children rotations rewire; the rest is shared
+            assert len(_nodes(M._root, set()) - before) <= 3 * (h + 1)
+    for M, ref in versions:
+        assert_close(dense_of(M), ref)
+        _check_avl(M._root)
+        assert M.nnz == sum(1 for row in ref for x in row if x != 0.0) == _check_avl(M._root)[1]
+
+
+def test_tree_snapshot_with_axpy_scale_and_transpose():
+    ta, tx = triplets(6, 8, 0.4, 52), triplets(6, 8, 0.4, 53)
+    T = TreeMatrix.from_coo(6, 8, *zip(*ta), dup="last")
+    X = TreeMatrix.from_coo(6, 8, *zip(*tx), dup="last")
+    R, RX = reference(6, 8, ta), reference(6, 8, tx)
+    S = T.snapshot()
+    T.axpy(2.0, X)                                           # updates in place must not reach S
+    assert_close(dense_of(T), dense_of(R.add(RX.scale(2.0))))
+    assert_close(dense_of(S), dense_of(R))
+    S.transpose()
+    U = S.scale(3.0).snapshot()
+    U.insert(7, 5, 1.25)
+    Rt = reference(6, 8, ta)
+    Rt.transpose()
+    want = dense_of(Rt.scale(3.0))
+    want[7][5] = 1.25
+    assert_close(dense_of(U), want)
+    assert_close(dense_of(S), dense_of(Rt))
+
+
+# --- semiring products: min-plus against a dense reference
+
+def _minplus_ref(n, k, m, ea, eb):
+    # ea/eb: {(i, j): w} of the logical operands; missing entries are +inf
+    out = [[math.inf] * m for _ in range(n)]
+    for (i, t), a in ea.items():
+        for j in range(m):
+            b = eb.get((t, j))
+            if b is not None and a + b < out[i][j]:
+                out[i][j] = a + b
+    return out
+
+
+def _semiring_operand(kind, r, c, trip, flag):
+    # logical r x c operand; with flag it is stored as c x r and transposed
+    stored = [(j, i, v) for i, j, v in trip] if flag else trip
+    shape = (c, r) if flag else (r, c)
+    M = build_dict(*shape, stored) if kind == "dict" else TreeMatrix.from_coo(*shape, *zip(*stored), dup="last")
+    if flag: M.transpose()
+    return M
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree"])
+@pytest.mark.parametrize("ta,tb", [(0, 0), (0, 1), (1, 0), (1, 1)])
+def test_min_plus_matches_dense_reference(kind, ta, tb):
+    from lib.semiring import MIN_PLUS
+    ea = {(i, j): v for i, j, v in triplets(6, 7, 0.35, 60)}
+    eb = {(i, j): v for i, j, v in triplets(7, 5, 0.35, 61)}
+    ea[(0, 1)], eb[(1, 2)] = 0.75, -0.75                       # a path of length exactly 0.0
+    A = _semiring_operand(kind, 6, 7, [(i, j, v) for (i, j), v in ea.items()], ta)
+    B = _semiring_operand(kind, 7, 5, [(i, j, v) for (i, j), v in eb.items()], tb)
+    R = A.mult_matriz(B, MIN_PLUS) if kind == "dict" else A.matmul(B, MIN_PLUS)
+    want = _minplus_ref(6, 7, 5, ea, eb)
+    got = dense_of(R)
+    assert all(math.isinf(g) if math.isinf(w) else abs(g - w) <= 1e-12
+               for gr, wr in zip(got, want) for g, w in zip(gr, wr))
+    assert got[0][2] <= 0.0 and not math.isinf(got[0][2])
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree"])
+def test_semiring_matvec_and_boolean(kind):
+    from lib.semiring import BOOLEAN, MIN_PLUS
+    trip = triplets(6, 6, 0.3, 62)
+    A = _semiring_operand(kind, 6, 6, trip, 1)
+    ea = {(i, j): v for i, j, v in trip}
+    x = [0.5 * k for k in range(6)]
+    y = A.mult_vetor(x, MIN_PLUS) if kind == "dict" else A.matvec(x, MIN_PLUS)
+    assert y == [min((v + x[j] for (i2, j), v in ea.items() if i2 == i), default=math.inf) for i in range(6)]
+    P = A.mult_matriz(A, BOOLEAN) if kind == "dict" else A.matmul(A, BOOLEAN)
+    pattern = [[1.0 if any((i, t) in ea and (t, j) in ea for t in range(6)) else 0.0 for j in range(6)]
+               for i in range(6)]
+    assert dense_of(P) == pattern
+
+
+# --- maintained product: incremental updates agree with a full recompute
+
+def _dense_from(M):
+    rows = dense_of(M)
+    trip = [(i, j, v) for i, row in enumerate(rows) for j, v in enumerate(row) if v != 0.0]
+    return reference(len(rows), len(rows[0]), trip)
+
+
+def _maintained_updates(kind):
+    # (name, update(A, B)) pairs, written against either backend's API
+    d = kind == "dict"
+    ins = (lambda M, i, j, v: M.inserir(i, j, v)) if d else (lambda M, i, j, v: M.insert(i, j, v))
+    many = (lambda M, *a: M.inserir_muitos(*a)) if d else (lambda M, *a: M.insert_many(*a))
+    return [
+        ("insert A", lambda A, B: ins(A, 1, 2, 0.5)),
+        ("insert B", lambda A, B: ins(B, 2, 3, -1.5)),
+        ("delete A", lambda A, B: ins(A, *next((i, j) for i, row in enumerate(dense_of(A))
+                                               for j, v in enumerate(row) if v != 0.0), 0.0)),
+        ("insert_many A", lambda A, B: many(A, [0, 3, 3], [4, 1, 1], [1.0, 2.0, -0.5])),
+        ("insert_many B", lambda A, B: many(B, [5, 0], [5, 2], [3.0, 0.25], "last")),
+        ("axpy A", lambda A, B: A.axpy(-0.5, B)),
+        ("scale A", lambda A, B: A.__imul__(3.0)),
+        ("scale B", lambda A, B: B.__imul__(-2.0)),
+        ("transpose A", lambda A, B: A.transpose()),
+        ("transpose B", lambda A, B: B.transpose()),
+    ]
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree"])
+@pytest.mark.parametrize("same", [False, True])
+def test_maintained_product_tracks_every_update(kind, same):
+    from lib.maintained_product import MaintainedProduct
+    build = build_dict if kind == "dict" else (lambda r, c, t: TreeMatrix.from_coo(r, c, *zip(*t), dup="last"))
+    A = build(6, 6, triplets(6, 6, 0.35, 70))
+    B = A if same else build(6, 6, triplets(6, 6, 0.35, 71))
+    mp = MaintainedProduct(A, B)
+    for name, update in _maintained_updates(kind):
+        update(A, B)
+        want = dense_of(_dense_from(A).matmul(_dense_from(B)))
+        got = dense_of(mp.result)
+        assert all(abs(x - y) <= 1e-9 for gr, wr in zip(got, want) for x, y in zip(gr, wr)), name
+    mp.close()
+    before = dense_of(mp.result)
+    _maintained_updates(kind)[0][1](A, B)
+    assert dense_of(mp.result) == before            # no longer following A and B
+
+
+# --- transposes and compressed layouts, serial and through the shared-memory pool
+
+@pytest.fixture
+def parallel_transpose(monkeypatch):
+    # force the process-pool path at test sizes and record every segment it creates
+    from multiprocessing import shared_memory
+    import lib.transpose as tr
+    created = []
+
+    class Recorded(shared_memory.SharedMemory):
+        def __init__(self, name=None, create=False, size=0):
+            super().__init__(name, create, size)
+            if create: created.append(self.name)
+
+    monkeypatch.setattr(tr, "PARALLEL_MIN", 1)
+    monkeypatch.setattr(tr.shared_memory, "SharedMemory", Recorded)
+    return created
+
+
+def _unlinked(names):
+    from multiprocessing import shared_memory
+    for name in names:
+        try:
+            shared_memory.SharedMemory(name).close()
+        except FileNotFoundError:
+            continue
+        return False
+    return True
+
+
+def test_counting_transpose_parallel_matches_serial(parallel_transpose):
+    from array import array
+    from lib.transpose import counting_transpose
+    rng = random.Random(80)
+    ptr, idx, vals = array("q", [0]), array("i"), array("d")
+    for r in range(40):
+        cols = rng.sample(range(30), rng.randrange(0, 12))      # unsorted within each row
+        idx.extend(cols); vals.extend(rng.uniform(-1, 1) for _ in cols); ptr.append(len(idx))
+    serial = counting_transpose(30, ptr, idx, vals)
+    assert counting_transpose(30, ptr, idx, vals, workers=3) == serial
+    assert len(parallel_transpose) == 2 and _unlinked(parallel_transpose)
+    back = counting_transpose(40, *serial)                      # CSC -> CSR, rows sorted
+    for r in range(40):
+        a, b = ptr[r], ptr[r + 1]
+        assert list(back[1][back[0][r]:back[0][r + 1]]) == sorted(idx[a:b])
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree"])
+@pytest.mark.parametrize("flag", [False, True])
+def test_csc_and_transposed_copy_match_dense(parallel_transpose, kind, flag):
+    trip = triplets(9, 7, 0.4, 81)
+    M = build_dict(9, 7, trip) if kind == "dict" else TreeMatrix.from_coo(9, 7, *zip(*trip), dup="last")
+    R = reference(9, 7, trip)
+    M = M * 2.0 if kind == "dict" else M.scale(2.0)               # csc applies the lazy scale
+    R = R.scale(2.0)
+    if flag: M.transpose(); R.transpose()
+    csc = M.para_csc if kind == "dict" else M.to_csc
+    copy = M.copia_transposta if kind == "dict" else M.transposed_copy
+    ptr, idx, vals = csc()
+    assert csc(3) == (ptr, idx, vals)
+    rows = dense_of(R)
+    cols = len(rows[0])
+    for j in range(cols):
+        assert list(idx[ptr[j]:ptr[j + 1]]) == [i for i in range(len(rows)) if rows[i][j] != 0.0]
+        assert list(vals[ptr[j]:ptr[j + 1]]) == [rows[i][j] for i in range(len(rows)) if rows[i][j] != 0.0]
+    T = copy(3)
+    R.transpose()
+    assert dense_of(T) == dense_of(R) == dense_of(copy())
+    assert (T.e_transposta if kind == "dict" else T._transposed) is False
+    # a transposed tree's CSC is its stored rows: no regroup, so no pool
+    assert bool(parallel_transpose) != (kind == "tree" and flag) and _unlinked(parallel_transpose)
+
+
+# --- one logical matrix on each of the four backends
+
+KINDS = ["dict", "tree", "lil", "dense"]
+
+
+def backend(kind, r, c, trip, flag=False):
+    """Logical r x c matrix with entries `trip`; with flag it is stored as c x r and
+       transposed, so the transpose-flag paths are exercised too."""
+    from lib.lil_matrix import LilMatrix
+    stored = [(j, i, v) for i, j, v in trip] if flag else list(trip)
+    shape = (c, r) if flag else (r, c)
+    if kind == "dict":
+        M = build_dict(*shape, stored) if stored else MatrizEsparsa(*shape)
+    else:
+        cls = {"tree": TreeMatrix, "lil": LilMatrix, "dense": DenseMatrix}[kind]
+        M = cls.from_coo(*shape, *zip(*stored), dup="last") if stored else cls(*shape)
+    if flag: M.transpose()
+    return M
+
+
+def lists(r, c, trip):
+    rows = [[0.0] * c for _ in range(r)]
+    for i, j, v in trip: rows[i][j] = v
+    return rows
+
+
+# --- reductions
+
+def _reduce(M, op, axis=None):
+    if isinstance(M, MatrizEsparsa):
+        op = {"sum": "somatorio", "count_nonzero": "nao_nulos", "max": "maximo", "min": "minimo"}[op]
+    return getattr(M, op)(axis)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("flag", [False, True])
+def test_reductions_match_reference(kind, flag):
+    trip = triplets(7, 5, 0.4, 90)
+    trip.append((3, 4, 2.5))
+    full = [(i, j, -1.0 - i - j) for i in range(7) for j in (1,)]   # column 1 full: no implicit zero
+    trip = [t for t in trip if t[1] != 1] + full
+    M, L = backend(kind, 7, 5, trip, flag), lists(7, 5, trip)
+    cols = [list(col) for col in zip(*L)]
+    want = {
+        "sum": (sum(map(sum, L)), [sum(c) for c in cols], [sum(r) for r in L]),
+        "count_nonzero": (sum(v != 0.0 for r in L for v in r),
+                          [sum(v != 0.0 for v in c) for c in cols], [sum(v != 0.0 for v in r) for r in L]),
+        "max": (max(map(max, L)), [max(c) for c in cols], [max(r) for r in L]),
+        "min": (min(map(min, L)), [min(c) for c in cols], [min(r) for r in L]),
+    }
+    for op, (total, per_col, per_row) in want.items():
+        assert abs(_reduce(M, op) - total) <= 1e-12
+        assert_close([list(_reduce(M, op, 0))], [per_col], 1e-12)
+        assert_close([list(_reduce(M, op, 1))], [per_row], 1e-12)
+    nrm = M.norma if kind == "dict" else M.norm
+    assert abs(nrm() - math.sqrt(sum(v * v for r in L for v in r))) <= 1e-12
+    assert abs(nrm(1) - max(sum(map(abs, c)) for c in cols)) <= 1e-12
+    assert abs(nrm(math.inf) - max(sum(map(abs, r)) for r in L)) <= 1e-12
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_reductions_of_empty_and_scaled(kind):
+    E = backend(kind, 3, 4, [])
+    assert _reduce(E, "sum") == 0.0 and _reduce(E, "max") == 0.0 and _reduce(E, "count_nonzero") == 0
+    assert list(_reduce(E, "min", 0)) == [0.0] * 4
+    trip = [(0, 0, 1.0), (2, 3, -2.0)]
+    M = backend(kind, 3, 4, trip)
+    M = M * -3.0 if kind == "dict" else M.scale(-3.0)             # lazy scale applied
+    assert _reduce(M, "max") == 6.0 and _reduce(M, "min") == -3.0
+    with pytest.raises(ValueError):
+        _reduce(M, "sum", 2)
+
+
+# --- element-wise ops
+
+def _elementwise(M, op, X):
+    if isinstance(M, MatrizEsparsa):
+        op = {"hadamard": "hadamard", "where": "onde", "maximum": "maximo_entre", "minimum": "minimo_entre"}[op]
+    return getattr(M, op)(X)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("fa,fb", [(0, 0), (0, 1), (1, 0), (1, 1)])
+def test_elementwise_match_reference(kind, fa, fb):
+    ta, tb = triplets(6, 40, 0.08, 91), triplets(6, 40, 0.6, 92)   # skewed rows: gallop path
+    tb += [(0, j, 0.5) for j in range(40)]                          # one full row
+    ta = [t for t in ta if t[0] != 5] + [(5, j, -0.25) for j in range(0, 40, 3)]
+    A, B = backend(kind, 6, 40, ta, fa), backend(kind, 6, 40, tb, fb)
+    LA, LB = lists(6, 40, ta), lists(6, 40, tb)
+    want = {
+        "hadamard": lambda a, b: a * b,
+        "where": lambda a, b: a if b != 0.0 else 0.0,
+        "maximum": max,
+        "minimum": min,
+    }
+    for op, fn in want.items():
+        R = _elementwise(A, op, B)
+        assert type(R) is type(A)
+        assert dense_of(R) == [[fn(a, b) for a, b in zip(ra, rb)] for ra, rb in zip(LA, LB)], op
+    with pytest.raises(ValueError):
+        _elementwise(A, "hadamard", backend(kind, 40, 6, [], fb))
+
+
+def test_intersect_and_union_kernels():
+    from lib.elementwise import intersect, union
+    ac, av = [1, 5, 9], [1.0, 2.0, 3.0]
+    bc = sorted(set(range(0, 100, 2)) | {9, 101})                   # long row: gallop path
+    bv = [-3.0 if c == 9 else 1.0 for c in bc]
+    assert intersect(ac, av, bc, bv, lambda a, b: a * b) == ([9], [-9.0])
+    assert intersect(bc, bv, ac, av, lambda a, b: a - b) == ([9], [-6.0])   # argument order kept
+    assert intersect(ac, av, bc, bv, lambda a, b: a + b) == ([], [])        # exact zeros dropped
+    cols, vals = union([1, 3], [2.0, -1.0], [0, 3, 4], [5.0, 1.0, -2.0], max)
+    assert (list(cols), list(vals)) == ([0, 1, 3], [5.0, 2.0, 1.0])        # max(0, -2) == 0 dropped
+
+
+# --- permutations and reordering
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("flag", [False, True])
+def test_permute_matches_reference(kind, flag):
+    from lib.permute import inverse, permute
+    trip = triplets(6, 8, 0.4, 100)
+    M, L = backend(kind, 6, 8, trip, flag), lists(6, 8, trip)
+    p, q = random.Random(1).sample(range(6), 6), random.Random(2).sample(range(8), 8)
+    P = permute(M, p, q)
+    assert type(P) is type(M)
+    assert dense_of(P) == [[L[p[k]][q[l]] for l in range(8)] for k in range(6)]
+    assert dense_of(permute(M, p)) == [L[p[k]] for k in range(6)]
+    assert dense_of(permute(M, None, q)) == [[row[q[l]] for l in range(8)] for row in L]
+    assert dense_of(permute(P, inverse(p), inverse(q))) == L
+    for bad in ([0] * 6, list(range(5)), [1, 2, 3, 4, 5, 6]):
+        with pytest.raises(ValueError):
+            permute(M, bad)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_rcm_degree_order_and_bandwidth(kind):
+    from lib.permute import bandwidth, degree_order, permute, rcm
+    n = 30
+    band = [(i, j, 1.0 + i) for i in range(n) for j in range(max(0, i - 2), min(n, i + 3))]
+    scramble = random.Random(3).sample(range(n), n)
+    M = permute(backend(kind, n, n, band), scramble, scramble)   # banded structure hidden
+    assert bandwidth(backend(kind, n, n, band)) == 2 and bandwidth(M) > 2
+    p = rcm(M)
+    assert sorted(p) == list(range(n))
+    assert bandwidth(permute(M, p, p)) <= 4                       # RCM recovers a narrow band
+    L = dense_of(M)
+    rows = degree_order(M)
+    deg = [sum(v != 0.0 for v in r) for r in L]
+    assert [deg[i] for i in rows] == sorted(deg, reverse=True) and sorted(rows) == list(range(n))
+    cols = degree_order(M, axis=0, descending=False)
+    cdeg = [sum(r[j] != 0.0 for r in L) for j in range(n)]
+    assert [cdeg[j] for j in cols] == sorted(cdeg)
+    with pytest.raises(ValueError):
+        rcm(backend(kind, 3, 4, []))
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree", "lil"])
+def test_reordered_undoes_the_permutation(kind):
+    from lib.permute import rcm, reordered
+    ta, tb = triplets(9, 9, 0.3, 101), triplets(9, 5, 0.3, 102)
+    A, B = backend(kind, 9, 9, ta), backend(kind, 9, 5, tb)
+    mm = (lambda X, Y: X.mult_matriz(Y)) if kind == "dict" else (lambda X, Y: X.matmul(Y))
+    p, r = rcm(A), random.Random(4).sample(range(5), 5)
+    want = dense_of(reference(9, 9, ta).matmul(reference(9, 5, tb)))
+    assert_close(dense_of(reordered(mm, A, B, p, p, r)), want)
+    scale = (lambda X: X * 2.0) if kind == "dict" else (lambda X: X.scale(2.0))
+    assert_close(dense_of(reordered(scale, A, None, p, p[::-1])), dense_of(reference(9, 9, ta).scale(2.0)))
+
+
+# --- submatrix views
+
+def _window(L, r0, r1, c0, c1):
+    return [row[c0:c1] for row in L[r0:r1]]
+
+
+def _write(M, i, j, v):
+    return M.inserir(i, j, v) if hasattr(M, "inserir") else M.insert(i, j, v)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("flag", [False, True])
+def test_views_nested_slicing_and_copy_on_write(kind, flag):
+    trip = triplets(8, 9, 0.4, 110)
+    M, L = backend(kind, 8, 9, trip, flag), lists(8, 9, trip)
+    V = M[1:7, 2:9]
+    W = V[1:4, -4:]                                              # nested, negative bounds
+    assert dense_of(V) == _window(L, 1, 7, 2, 9)
+    assert dense_of(W) == _window(L, 2, 5, 5, 9)
+    assert W[2, 3] == L[4][8] and M[4, 8] == L[4][8]
+    assert sorted(W.items()) == sorted((i, j, v) for i, row in enumerate(_window(L, 2, 5, 5, 9))
+                                       for j, v in enumerate(row) if v != 0.0)
+    assert W.nnz == sum(v != 0.0 for row in _window(L, 2, 5, 5, 9) for v in row)
+    # zero copy: a write to the base shows through views that have not been written
+    _write(M, 3, 6, 4.5); L[3][6] = 4.5
+    assert V[2, 4] == 4.5 and W[1, 1] == 4.5
+    # copy-on-write: the first write detaches the view, the base and other views stay
+    _write(W, 0, 0, -7.0)
+    assert W[0, 0] == -7.0 and M[2, 5] == L[2][5] and V[1, 3] == L[2][5]
+    _write(V, 0, 0, 9.0)
+    assert V[0, 0] == 9.0 and M[1, 2] == L[1][2] and W[0, 0] == -7.0
+    X = V[0:2, 0:3]                                              # slicing a detached view
+    assert X[0, 0] == 9.0 and dense_of(X)[1] == L[2][2:5]
+    C = V.copy()
+    assert type(C) is type(M) and dense_of(C) == dense_of(V)
+    with pytest.raises(ValueError):
+        M[0:8:2, :]
+    with pytest.raises(IndexError):
+        V[6, 0]
+    assert dense_of(M) == L
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree"])
+def test_views_read_through_a_lazy_scale(kind):
+    trip = triplets(6, 6, 0.5, 111)
+    M = backend(kind, 6, 6, trip, True)
+    S = M * -2.0 if kind == "dict" else M.scale(-2.0)
+    want = [[-2.0 * v for v in row] for row in lists(6, 6, trip)]
+    assert dense_of(S[1:5, 0:4][1:3, 1:4]) == _window(want, 2, 4, 1, 4)
+
+
+# --- order statistics on the tree
+
+def test_tree_rank_select_and_range_counts():
+    from bisect import bisect_left, bisect_right
+    rng = random.Random(120)
+    T = TreeMatrix.from_coo(15, 12, *zip(*triplets(15, 12, 0.3, 121)), dup="last")
+    S = T.snapshot()                                             # path-copied writes keep sizes too
+    for step in range(400):
+        i, j = rng.randrange(15), rng.randrange(12)
+        T.insert(i, j, 0.0 if rng.random() < 0.4 else rng.uniform(-1, 1))
+        if step % 40 == 0:
+            T.insert_many([i, (i + 1) % 15], [j, j], [1.0, 2.0])
+        if step % 50 == 0:
+            keys = sorted((a, b) for a, b, _ in T.items())
+            vals = dict(((a, b), v) for a, b, v in T.items())
+            assert [T.rank(k) for k in keys] == list(range(len(keys)))
+            for probe in [(rng.randrange(16), rng.randrange(13)) for _ in range(20)]:
+                assert T.rank(probe) == bisect_left(keys, probe)
+            for k in (0, len(keys) // 2, -1):
+                assert T.select(k) == (keys[k], vals[keys[k]])
+            for _ in range(20):
+                lo = (rng.randrange(15), rng.randrange(12))
+                hi = (rng.randrange(15), rng.randrange(12))
+                want = bisect_right(keys, hi) - bisect_left(keys, lo) if lo <= hi else 0
+                assert T.nnz_in_range(lo, hi) == want
+            for r in range(15):
+                assert T.nnz_in_range((r, 0), (r, 11)) == sum(1 for a, _ in keys if a == r)
+    with pytest.raises(IndexError):
+        T.select(T.nnz)
+    U = T.scale(3.0)                                             # select applies the lazy scale
+    key, v = T.select(0)
+    assert U.select(0) == (key, 3.0 * v)
+    assert sum(1 for _ in S.items()) == S.nnz == S.nnz_in_range((0, 0), (14, 11))
+
+
+# --- pruned products: kept entries are exact, dropped ones are under the row threshold
+
+def _approx(M, B, atol, rtol, top_k):
+    if isinstance(M, MatrizEsparsa): return M.mult_aproximada(B, atol, rtol, top_k)
+    return M.approx_matmul(B, atol, rtol, top_k)
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree", "lil"])
+@pytest.mark.parametrize("atol,rtol,top_k", [(0.0, 0.0, None), (0.05, 0.0, None), (0.0, 0.3, None),
+                                             (0.02, 0.1, 3), (0.0, 0.0, 1)])
+def test_approx_matmul_error_bound(kind, atol, rtol, top_k):
+    ta, tb = triplets(10, 8, 0.4, 130), triplets(8, 9, 0.4, 131)
+    A, B = backend(kind, 10, 8, ta, True), backend(kind, 8, 9, tb)
+    exact = dense_of(reference(10, 8, ta).matmul(reference(8, 9, tb)))
+    got = dense_of(_approx(A, B, atol, rtol, top_k))
+    err2 = 0.0
+    for e_row, g_row in zip(exact, got):
+        thr = max(atol, rtol * max(map(abs, e_row)))
+        kept = [j for j, g in enumerate(g_row) if g != 0.0]
+        assert all(abs(g_row[j] - e_row[j]) <= 1e-12 for j in kept)      # kept entries are exact
+        assert all(abs(e_row[j]) > thr for j in kept)
+        if top_k is not None: assert len(kept) <= top_k
+        floor = min((abs(e_row[j]) for j in kept), default=math.inf) if top_k is not None else math.inf
+        for j, (e, g) in enumerate(zip(e_row, g_row)):
+            if g == 0.0 and e != 0.0:
+                assert abs(e) <= thr or abs(e) <= floor                    # dropped: under the rule
+                err2 += e * e
+        if top_k is None:                                                # nothing above thr is lost
+            assert len(kept) == sum(abs(e) > thr for e in e_row)
+    # the Frobenius error is exactly the mass of the dropped entries
+    diff = math.sqrt(sum((e - g) ** 2 for er, gr in zip(exact, got) for e, g in zip(er, gr)))
+    assert abs(diff - math.sqrt(err2)) <= 1e-9
+    if (atol, rtol, top_k) == (0.0, 0.0, None):
+        assert_close(got, exact, 1e-12)
+    with pytest.raises(ValueError):
+        _approx(A, B, -1.0, 0.0, None)
+
+
+# --- bulk COO ingestion
+
+def _insert_many(M, *args):
+    return M.inserir_muitos(*args) if isinstance(M, MatrizEsparsa) else M.insert_many(*args)
+
+
+def _apply_batch(L, rows, cols, vals, dup):
+    batch = {}
+    for i, j, v in zip(rows, cols, vals):
+        batch[(i, j)] = batch.get((i, j), 0.0) + v if dup == "sum" else v
+    for (i, j), v in batch.items(): L[i][j] = v
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("flag", [False, True])
+@pytest.mark.parametrize("size", [3, 400])          # tree: per-key inserts vs merge-and-rebuild
+def test_insert_many_matches_reference(kind, flag, size):
+    from array import array
+    rng = random.Random(140 + size)
+    trip = triplets(12, 10, 0.5, 141)
+    M, L = backend(kind, 12, 10, trip, flag), lists(12, 10, trip)
+    for dup in ("sum", "last"):
+        rows = array("i", (rng.randrange(12) for _ in range(size)))
+        cols = array("i", (rng.randrange(10) for _ in range(size)))
+        vals = array("d", (rng.choice([0.0, 1.0, -1.0, rng.uniform(-1, 1)]) for _ in range(size)))
+        if size > 3:
+            i, j = next((i, j) for i, row in enumerate(L) for j, v in enumerate(row) if v != 0.0)
+            rows.extend([i, i]); cols.extend([j, j]); vals.extend([0.5, -0.5])   # cancels to 0: deleted
+        _insert_many(M, rows, cols, vals, dup)
+        _apply_batch(L, rows, cols, vals, dup)
+        assert dense_of(M) == L, dup
+        if kind == "tree": _check_avl(M._root)
+    nnz = M.nao_nulos() if kind == "dict" else (M.nnz if kind != "dense" else None)
+    if nnz is not None:
+        assert nnz == sum(v != 0.0 for row in L for v in row)
+
+
+@pytest.mark.parametrize("kind", ["dict", "tree", "lil"])
+def test_insert_many_notifies_and_validates(kind):
+    M = backend(kind, 4, 4, [(0, 0, 1.0), (1, 1, 2.0)])
+    seen = []
+    (M.inscrever if kind == "dict" else M.subscribe)(lambda *a: seen.append(a[1:]))
+    _insert_many(M, [0, 0, 2, 1], [0, 0, 3, 1], [1.0, 1.0, 5.0, 2.0])
+    assert sorted(seen) == [(0, 0, 1.0, 2.0), (2, 3, 0.0, 5.0)]   # (1,1) unchanged: no event
+    for args, err in ((([4], [0], [1.0]), IndexError), (([0, 1], [0], [1.0]), ValueError),
+                      (([0], [0], [1.0], "max"), ValueError)):
+        with pytest.raises(err):
+            _insert_many(M, *args)
@@ -0,0 +1,326 @@
+
+from __future__ import annotations
+import json, os, shutil, struct, sys, tempfile, weakref
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Tile = Dict[int, Dict[int, float]]   # local row -> {local col -> value}
+TileKey = Tuple[int,int]
+
+_MAGIC = b"SPT1"
+_HEADER = struct.Struct("<4sI")      # magic, nnz
+_ENTRY_BYTES = 120                   # rough in-memory cost of one entry in a tile dict
+
+def _tile_path(directory:str, key:TileKey) -> str:
+    return os.path.join(directory, f"t_{key[0]}_{key[1]}.bin")
+
+def _read_arrays(path:str) -> Tuple[array,array,array]:
+    # header, then int32 rows, int32 cols, float64 values, all little-endian
+    ri = array("i"); ci = array("i"); vs = array("d")
+    if not os.path.exists(path): return ri, ci, vs
+    with open(path, "rb") as f:
+        magic, nnz = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC: raise ValueError(f"not a tile file: {path}")
+        ri.fromfile(f, nnz); ci.fromfile(f, nnz); vs.fromfile(f, nnz)
+    if sys.byteorder == "big":
+        for a in (ri, ci, vs): a.byteswap()
+    return ri, ci, vs
+
+def _write_arrays(path:str, ri:array, ci:array, vs:array) -> int:
+    if not vs:
+        if os.path.exists(path): os.remove(path)
+        return 0
+    if sys.byteorder == "big":
+        ri, ci, vs = array("i", ri), array("i", ci), array("d", vs)
+        for a in (ri, ci, vs): a.byteswap()
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(vs)))
+        ri.tofile(f); ci.tofile(f); vs.tofile(f)
+    return len(vs)
+
+def read_tile(path:str) -> Tile:
+    """Decode a tile file: header, then int32 rows, int32 cols, float64 values (little-endian)."""
+    tile: Tile = {}
+    for i, j, v in zip(*_read_arrays(path)):
+        row = tile.get(i)
+        if row is None: row = tile[i] = {}
+        row[j] = v
+    return tile
+
+def write_tile(path:str, tile: Tile) -> int:
+    """Encode a tile (zeros dropped); an empty tile removes the file. Returns nnz."""
+    ri = array("i"); ci = array("i"); vs = array("d")
+    for i in sorted(tile):
+        row = tile[i]
+        for j in sorted(row):
+            v = row[j]
+            if v != 0.0:
+                ri.append(i); ci.append(j); vs.append(v)
+    return _write_arrays(path, ri, ci, vs)
+
+def add_into_tile(path:str, tile: Tile) -> int:
+    """Add a tile into the one stored at `path` (missing file = empty tile) without decoding
+       the stored one into dicts: a merge of two sorted entry streams into new arrays.
+       Entries that cancel to 0.0 are dropped. Returns the new nnz."""
+    ri, ci, vs = _read_arrays(path)
+    oi = array("i"); oj = array("i"); ov = array("d")
+    new = ((i, j, tile[i][j]) for i in sorted(tile) for j in sorted(tile[i]))
+    nxt = next(new, None)
+    p, n = 0, len(vs)
+    while p < n or nxt is not None:
+        if nxt is None or (p < n and (ri[p], ci[p]) < nxt[:2]):
+            i, j, v = ri[p], ci[p], vs[p]; p += 1
+        else:
+            i, j, v = nxt
+            if p < n and (ri[p], ci[p]) == (i, j):
+                v += vs[p]; p += 1
+            nxt = next(new, None)
+        if v != 0.0:
+            oi.append(i); oj.append(j); ov.append(v)
+    return _write_arrays(path, oi, oj, ov)
+
+def _tile_nnz(tile: Tile) -> int:
+    return sum(len(r) for r in tile.values())
+
+class TiledMatrix:
+    """Disk-backed sparse matrix split into tile x tile blocks, one binary file per
+       nonempty block. Point access goes through an LRU cache of decoded tiles whose
+       estimated size is kept under `budget` bytes (dirty tiles are written back on
+       eviction). add/scale/matmul bypass the cache and stream tile pairs from disk into
+       a new directory, holding the current pair and the prefetched next pair. matmul's
+       output accumulator is kept under `budget` as well: when it grows past it, it is
+       added into the output tile on disk (a merge of sorted arrays) and started afresh.
+       The input tiles themselves are bounded by `tile` and their density, not by `budget`.
+       Without an explicit `directory` the matrix owns a temporary one, removed by
+       close() (or `with`) or when the matrix is garbage collected.
+    """
+    def __init__(self, rows:int, cols:int, directory:Optional[str]=None, tile:int=1024, budget:int=64<<20):
+        if rows<=0 or cols<=0: raise ValueError("invalid shape")
+        if tile<=0: raise ValueError("invalid tile size")
+        self.rows, self.cols, self.tile, self.budget = rows, cols, tile, budget
+        self.directory = directory if directory is not None else tempfile.mkdtemp(prefix="tiled_")
+        os.makedirs(self.directory, exist_ok=True)
+        # only a directory we created is ours to delete
+        self._cleanup = (weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+                         if directory is None else None)
+        self._cache: "OrderedDict[TileKey, Tile]" = OrderedDict()
+        self._cache_bytes = 0
+        self._dirty: set = set()
+        self._tiles: set = set()    # keys of tiles with a file on disk
+        for name in os.listdir(self.directory):
+            if name.startswith("t_") and name.endswith(".bin"):
+                bi, bj = name[2:-4].split("_")
+                self._tiles.add((int(bi), int(bj)))
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump({"rows": rows, "cols": cols, "tile": tile}, f)
+
+    @classmethod
+    def open(cls, directory:str, budget:int=64<<20) -> "TiledMatrix":
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(meta["rows"], meta["cols"], directory, meta["tile"], budget)
+
+    @classmethod
+    def from_items(cls, rows:int, cols:int, triplets: Iterable[Tuple[int,int,float]], **kw) -> "TiledMatrix":
+        M = cls(rows, cols, **kw)
+        for i,j,v in triplets: M.insert(i,j,v)
+        M.flush()
+        return M
+
+    @property
+    def shape(self): return (self.rows, self.cols)
+
+    @property
+    def grid(self) -> Tuple[int,int]:
+        t = self.tile
+        return ((self.rows + t - 1)//t, (self.cols + t - 1)//t)
+
+    @property
+    def nnz(self) -> int:
+        self.flush()
+        n = 0
+        for key in self._tiles:
+            with open(_tile_path(self.directory, key), "rb") as f:
+                n += _HEADER.unpack(f.read(_HEADER.size))[1]
+        return n
+
+    # --- cache
+    def _locate(self, i:int, j:int) -> Tuple[TileKey,int,int]:
+        if not (0 <= i < self.rows and 0 <= j < self.cols): raise IndexError("index out of bounds")
+        t = self.tile
+        return (i//t, j//t), i%t, j%t
+
+    def _get_tile(self, key:TileKey) -> Tile:
+        tile = self._cache.get(key)
+        if tile is not None:
+            self._cache.move_to_end(key)
+            return tile
+        tile = read_tile(_tile_path(self.directory, key)) if key in self._tiles else {}
+        self._cache[key] = tile
+        self._cache_bytes += _tile_nnz(tile)*_ENTRY_BYTES
+        self._evict(keep=key)
+        return tile
+
+    def _evict(self, keep:TileKey) -> None:
+        while self._cache_bytes > self.budget and len(self._cache) > 1:
+            key, tile = next(iter(self._cache.items()))
+            if key == keep: self._cache.move_to_end(key); continue
+            del self._cache[key]
+            self._cache_bytes -= _tile_nnz(tile)*_ENTRY_BYTES
+            if key in self._dirty: self._write(key, tile)
+
+    def _write(self, key:TileKey, tile:Tile) -> int:
+        self._dirty.discard(key)
+        n = write_tile(_tile_path(self.directory, key), tile)
+        if n: self._tiles.add(key)
+        else: self._tiles.discard(key)
+        return n
+
+    def flush(self) -> None:
+        """Write every dirty cached tile back to disk."""
+        for key in list(self._dirty):
+            self._write(key, self._cache[key])
+
+    def clear_cache(self) -> None:
+        self.flush()
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    def close(self) -> None:
+        """Remove an owned temporary directory; a caller's directory is flushed and kept."""
+        if self._cleanup is not None:
+            self._cache.clear(); self._dirty.clear(); self._tiles.clear()
+            self._cache_bytes = 0
+            self._cleanup()
+        else:
+            self.clear_cache()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    # --- element access
+    def access(self, i:int, j:int) -> float:
+        key, li, lj = self._locate(i,j)
+        return self._get_tile(key).get(li, {}).get(lj, 0.0)
+
+    def insert(self, i:int, j:int, v:float) -> None:
+        key, li, lj = self._locate(i,j)
+        tile = self._get_tile(key)
+        row = tile.get(li)
+        if v == 0.0:
+            if row is None or lj not in row: return
+            del row[lj]
+            if not row: del tile[li]
+            self._cache_bytes -= _ENTRY_BYTES
+        else:
+            if row is None: row = tile[li] = {}
+            if lj not in row:
+                self._cache_bytes += _ENTRY_BYTES
+            row[lj] = v
+        self._dirty.add(key)
+        self._evict(keep=key)
+
+    def items(self) -> Iterable[Tuple[int,int,float]]:
+        """Stream nonzeros tile by tile (row-major over the tile grid)."""
+        self.flush()
+        t = self.tile
+        for key in sorted(self._tiles):
+            tile = self._cache.get(key)
+            if tile is None: tile = read_tile(_tile_path(self.directory, key))
+            oi, oj = key[0]*t, key[1]*t
+            for li in sorted(tile):
+                row = tile[li]
+                for lj in sorted(row):
+                    yield (oi+li, oj+lj, row[lj])
+
+    # --- streaming algebra
+    def _like(self, rows:int, cols:int, directory:Optional[str]) -> "TiledMatrix":
+        return TiledMatrix(rows, cols, directory, self.tile, self.budget)
+
+    def _load_pair(self, a_key:Optional[TileKey], other:"TiledMatrix", b_key:Optional[TileKey]) -> Tuple[Tile,Tile]:
+        a = read_tile(_tile_path(self.directory, a_key)) if a_key is not None else {}
+        b = read_tile(_tile_path(other.directory, b_key)) if b_key is not None else {}
+        return a, b
+
+    def _stream(self, other:"TiledMatrix", work: List[Tuple[TileKey,Optional[TileKey],Optional[TileKey]]]):
+        """Yield (out_key, a_tile, b_tile) for each work item, loading item n+1 in a
+           background thread while the caller computes item n."""
+        self.flush(); other.flush()
+        if not work: return
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            fut = pool.submit(self._load_pair, work[0][1], other, work[0][2])
+            for n, (out_key, _, _) in enumerate(work):
+                a, b = fut.result()
+                if n+1 < len(work):
+                    fut = pool.submit(self._load_pair, work[n+1][1], other, work[n+1][2])
+                yield out_key, a, b
+
+    def add(self, other:"TiledMatrix", directory:Optional[str]=None) -> "TiledMatrix":
+        if other.shape != self.shape: raise ValueError("shape mismatch on add")
+        if other.tile != self.tile: raise ValueError("tile size mismatch")
+        self.flush(); other.flush()
+        R = self._like(self.rows, self.cols, directory)
+        keys = sorted(self._tiles | other._tiles)
+        work = [(k, k if k in self._tiles else None, k if k in other._tiles else None) for k in keys]
+        for key, a, b in self._stream(other, work):
+            for li, row in b.items():
+                out = a.get(li)
+                if out is None: a[li] = dict(row); continue
+                for lj, v in row.items():
+                    out[lj] = out.get(lj, 0.0) + v
+            R._write(key, a)
+        return R
+
+    def scale(self, alpha:float, directory:Optional[str]=None) -> "TiledMatrix":
+        self.flush()
+        R = self._like(self.rows, self.cols, directory)
+        if alpha == 0.0: return R
+        work = [(k, k, None) for k in sorted(self._tiles)]
+        for key, a, _ in self._stream(self, work):
+            R._write(key, {li: {lj: alpha*v for lj, v in row.items()} for li, row in a.items()})
+        return R
+
+    def matmul(self, other:"TiledMatrix", directory:Optional[str]=None) -> "TiledMatrix":
+        if self.cols != other.rows: raise ValueError("shape mismatch on matmul")
+        if other.tile != self.tile: raise ValueError("tile size mismatch")
+        self.flush(); other.flush()
+        R = self._like(self.rows, other.cols, directory)
+        # B tiles grouped by tile-row, so (bi,bk) only meets the (bk,bj) that exist
+        b_by_row: Dict[int, List[int]] = {}
+        for bk, bj in other._tiles: b_by_row.setdefault(bk, []).append(bj)
+        work = []
+        for bi, bk in sorted(self._tiles):
+            for bj in b_by_row.get(bk, ()):
+                work.append(((bi,bj), (bi,bk), (bk,bj)))
+        work.sort()
+        acc: Tile = {}
+        acc_bytes = 0
+        cur: Optional[TileKey] = None
+        spilled = False   # part of cur's tile is already on disk
+        def spill():
+            if spilled: n = add_into_tile(_tile_path(R.directory, cur), acc)
+            else: n = R._write(cur, acc)
+            if n: R._tiles.add(cur)
+            else: R._tiles.discard(cur)
+        for key, a, b in self._stream(other, work):
+            if key != cur:
+                if cur is not None: spill()
+                acc, acc_bytes, cur, spilled = {}, 0, key, False
+            for li, a_row in a.items():
+                out = acc.get(li)
+                if out is None: out = acc[li] = {}
+                for lk, av in a_row.items():
+                    b_row = b.get(lk)
+                    if b_row:
+                        for lj, bv in b_row.items():
+                            if lj in out: out[lj] += av*bv
+                            else:
+                                out[lj] = av*bv
+                                acc_bytes += _ENTRY_BYTES
+            if acc_bytes > self.budget:
+                spill()
+                acc, acc_bytes, spilled = {}, 0, True
+        if cur is not None: spill()
+        return R
@@ -0,0 +1,100 @@
+
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Sequence, Tuple
+
+Compressed = Tuple[array, array, array]   # (ptr, idx, vals): CSR over rows or CSC over columns
+PARALLEL_MIN = 1_000_000   # below this many nonzeros the process pool costs more than it saves
+
+def counting_transpose(n_minor:int, ptr: Sequence[int], idx: Sequence[int], vals: Sequence[float],
+                       workers:int=1) -> Compressed:
+    """Regroup a compressed layout by its minor index in O(nnz + n): CSR -> CSC or CSC -> CSR.
+       One pass counts entries per minor index, a prefix sum gives each group's start, and a
+       second pass scatters the entries. The scatter visits majors in order, so major indices
+       come out ascending inside every group whatever the input order within a major.
+       With workers > 1 both passes run over contiguous chunks of majors in a process pool,
+       the scatter writing straight into shared memory.
+    """
+    nnz = len(idx)
+    if workers > 1 and nnz >= PARALLEL_MIN:
+        return _parallel(n_minor, ptr, idx, vals, workers)
+    out_ptr = array("q", bytes(8*(n_minor+1)))
+    for c in idx: out_ptr[c+1] += 1
+    for c in range(n_minor): out_ptr[c+1] += out_ptr[c]
+    nxt = out_ptr[:-1]
+    out_idx = array("i", bytes(4*nnz))
+    out_val = array("d", bytes(8*nnz))
+    for r in range(len(ptr)-1):
+        for p in range(ptr[r], ptr[r+1]):
+            c = idx[p]
+            q = nxt[c]
+            out_idx[q] = r; out_val[q] = vals[p]
+            nxt[c] = q+1
+    return out_ptr, out_idx, out_val
+
+def _count(n_minor:int, idx: array) -> array:
+    counts = array("q", bytes(8*n_minor))
+    for c in idx: counts[c] += 1
+    return counts
+
+def _scatter(names: Tuple[str,str], r0:int, ptr: array, idx: array, vals: array, nxt: array) -> None:
+    si = shared_memory.SharedMemory(names[0])
+    sv = shared_memory.SharedMemory(names[1])
+    try:
+        out_idx = si.buf.cast("i")
+        out_val = sv.buf.cast("d")
+        base = ptr[0]
+        for r in range(len(ptr)-1):
+            for p in range(ptr[r]-base, ptr[r+1]-base):
+                c = idx[p]
+                q = nxt[c]
+                out_idx[q] = r0+r; out_val[q] = vals[p]
+                nxt[c] = q+1
+        out_idx.release(); out_val.release()
+    finally:
+        si.close(); sv.close()
+
+def _chunks(ptr: Sequence[int], parts:int) -> List[Tuple[int,int]]:
+    # contiguous major ranges holding about nnz/parts entries each
+    n, nnz = len(ptr)-1, ptr[-1]
+    bounds = [0]
+    for k in range(1, parts):
+        r = bisect_left(ptr, nnz*k//parts, bounds[-1], n)
+        if r > bounds[-1]: bounds.append(r)
+    bounds.append(n)
+    return [(bounds[k], bounds[k+1]) for k in range(len(bounds)-1)]
+
+def _parallel(n_minor:int, ptr, idx, vals, workers:int) -> Compressed:
+    nnz = len(idx)
+    ptr = array("q", ptr)
+    idx = idx if isinstance(idx, array) else array("i", idx)
+    vals = vals if isinstance(vals, array) else array("d", vals)
+    chunks = _chunks(ptr, workers)
+    si = shared_memory.SharedMemory(create=True, size=max(4*nnz, 1))
+    sv = shared_memory.SharedMemory(create=True, size=max(8*nnz, 1))
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            counts = list(pool.map(_count, [n_minor]*len(chunks),
+                                   [idx[ptr[a]:ptr[b]] for a, b in chunks]))
+            out_ptr = array("q", bytes(8*(n_minor+1)))
+            for cnt in counts:
+                for c in range(n_minor): out_ptr[c+1] += cnt[c]
+            for c in range(n_minor): out_ptr[c+1] += out_ptr[c]
+            # chunk k starts each group after the entries of chunks 0..k-1
+            starts, nxt = [], out_ptr[:-1]
+            for cnt in counts:
+                starts.append(array("q", nxt))
+                nxt = array("q", (s+n for s, n in zip(nxt, cnt)))
+            jobs = [pool.submit(_scatter, (si.name, sv.name), a, ptr[a:b+1],
+                                idx[ptr[a]:ptr[b]], vals[ptr[a]:ptr[b]], start)
+                    for (a, b), start in zip(chunks, starts)]
+            for job in jobs: job.result()
+        out_idx = array("i"); out_idx.frombytes(bytes(si.buf[:4*nnz]))
+        out_val = array("d"); out_val.frombytes(bytes(sv.buf[:8*nnz]))
+    finally:
+        si.close(); si.unlink()
+        sv.close(); sv.unlink()
+    return out_ptr, out_idx, out_val
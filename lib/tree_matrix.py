@@ -1,7 +1,17 @@
 
 from __future__ import annotations
+import pickle
+from array import array
 from dataclasses import dataclass
-from typing import Optional, Tuple, Iterable, List
+from typing import Optional, Tuple, Iterable, List, Dict, Callable
+from .semiring import Semiring, PLUS_TIMES, matmul_rows, matvec_rows
+from .views import SubmatrixView, parse_key, is_point
+from .transpose import Compressed, counting_transpose
+from .reductions import reduce, norm
+from .elementwise import combine, hadamard_fn, mask_fn
+from .approx import approx_matmul_rows
+from .dense_matrix import DenseMatrix
+from .mixed import sparse_dense_matmul, sparse_dense_add
 
 Key = Tuple[int,int]
 
@@ -12,12 +22,18 @@ class _Node:
     lh: Optional["_Node"]=None
     rh: Optional["_Node"]=None
     h: int=1
+    size: int=1   # nodes in this subtree (order statistics)
 
 def _h(x: Optional[_Node]) -> int:
     return x.h if x is not None else 0
 
+def _sz(x: Optional[_Node]) -> int:
+    return x.size if x is not None else 0
+
 def _upd(x: _Node) -> None:
+    # called bottom-up by insert/delete/rotations/build, so sizes stay exact everywhere
     x.h = 1 + max(_h(x.lh), _h(x.rh))
+    x.size = 1 + _sz(x.lh) + _sz(x.rh)
 
 def _bf(x: _Node) -> int:
     return _h(x.lh) - _h(x.rh)
@@ -108,6 +124,72 @@ def _delete(x: Optional[_Node], key: Key) -> Optional[_Node]:
     if bf < -1 and _bf(x.rh) > 0:  x.rh = _rotR(x.rh); return _rotL(x)
     return x
 
+# persistent (path-copying) variants: nodes reachable from another version are never
+# modified; only the O(log k) nodes on the search path, plus those a rotation touches, are copied
+def _copy(x: _Node) -> _Node:
+    return _Node(x.key, x.val, x.lh, x.rh, x.h, x.size)
+
+def _pbalance(x: _Node) -> _Node:
+    # x is already a private copy; children are copied before a rotation rewires them
+    _upd(x)
+    bf = _bf(x)
+    if bf > 1:
+        x.lh = _copy(x.lh)
+        if _bf(x.lh) < 0:                  # LR
+            x.lh.rh = _copy(x.lh.rh)
+            x.lh = _rotL(x.lh)
+        return _rotR(x)
+    if bf < -1:
+        x.rh = _copy(x.rh)
+        if _bf(x.rh) > 0:                  # RL
+            x.rh.lh = _copy(x.rh.lh)
+            x.rh = _rotR(x.rh)
+        return _rotL(x)
+    return x
+
+def _pinsert(x: Optional[_Node], key: Key, val: float) -> _Node:
+    if x is None:
+        return _Node(key, val)
+    x = _copy(x)
+    c = _cmp(key, x.key)
+    if c == 0:
+        x.val = val
+        return x
+    if c < 0:
+        x.lh = _pinsert(x.lh, key, val)
+    else:
+        x.rh = _pinsert(x.rh, key, val)
+    return _pbalance(x)
+
+def _pdelete(x: Optional[_Node], key: Key) -> Optional[_Node]:
+    # key must be present (callers check with _find first)
+    if x is None: return None
+    c = _cmp(key, x.key)
+    if c < 0:
+        lh = _pdelete(x.lh, key)
+        x = _copy(x); x.lh = lh
+    elif c > 0:
+        rh = _pdelete(x.rh, key)
+        x = _copy(x); x.rh = rh
+    else:
+        if x.lh is None or x.rh is None:
+            return x.lh if x.lh is not None else x.rh
+        succ = _min_node(x.rh)
+        rh = _pdelete(x.rh, succ.key)
+        x = _copy(x)
+        x.key, x.val, x.rh = succ.key, succ.val, rh
+    return _pbalance(x)
+
+def _build(keys: List[Key], vals: List[float], lo:int, hi:int) -> Optional[_Node]:
+    # height-balanced tree from sorted keys[lo:hi] in O(hi-lo)
+    if lo >= hi: return None
+    mid = (lo+hi)//2
+    x = _Node(keys[mid], vals[mid])
+    x.lh = _build(keys, vals, lo, mid)
+    x.rh = _build(keys, vals, mid+1, hi)
+    _upd(x)
+    return x
+
 def _find(x: Optional[_Node], key: Key) -> Optional[_Node]:
     while x is not None:
         c = _cmp(key, x.key)
@@ -127,6 +209,30 @@ def _lower_bound(x: Optional[_Node], key: Key) -> Optional[_Node]:
             x = x.rh
     return res
 
+def _rank(x: Optional[_Node], key: Key) -> int:
+    # number of keys < key
+    r = 0
+    while x is not None:
+        c = _cmp(key, x.key)
+        if c <= 0:
+            x = x.lh
+        else:
+            r += _sz(x.lh) + 1
+            x = x.rh
+    return r
+
+def _select(x: Optional[_Node], k: int) -> _Node:
+    # k-th smallest node, 0-based; caller checks 0 <= k < size
+    while True:
+        left = _sz(x.lh)
+        if k < left:
+            x = x.lh
+        elif k == left:
+            return x
+        else:
+            k -= left + 1
+            x = x.rh
+
 def _inorder(x: Optional[_Node]) -> Iterable[_Node]:
     if x is None: return
     stack: List[_Node] = []
@@ -160,10 +266,33 @@ def _iter_range(x: Optional[_Node], lo: Key, hi: Key) -> Iterable[_Node]:
         else:
             cur = None
 
+def _sorted_dot(xs: List[Tuple[int,float]], ys: List[Tuple[int,float]]) -> float:
+    # dot product of two index-sorted (idx,val) lists via merge intersection
+    s = 0.0
+    p = q = 0
+    nx, ny = len(xs), len(ys)
+    while p < nx and q < ny:
+        a, b = xs[p][0], ys[q][0]
+        if a == b:
+            s += xs[p][1]*ys[q][1]
+            p += 1; q += 1
+        elif a < b:
+            p += 1
+        else:
+            q += 1
+    return s
+
 class TreeMatrix:
     """AVL-based sparse matrix with guaranteed O(log k) get/set.
-       Keys are (i,j) in base orientation. Transpose is logical (flag).
+       Keys are (i,j) in base orientation. Transpose is logical (flag), and so is
+       scaling: stored values are multiplied by `_scale` on the way out. `scale()`
+       returns a matrix sharing the same nodes; the first write copies (copy-on-write).
+       `snapshot()` shares the nodes too, and writes on a shared tree path-copy
+       (O(log k) new nodes) so every other version keeps seeing its own contents.
     """
+    # value read at missing keys: a semiring product sets its semiring's zero (inf for
+    # min-plus), so a stored 0.0 there still differs from "no path"
+    _implicit = 0.0
     def __init__(self, rows:int, cols:int):
         if rows<=0 or cols<=0: raise ValueError("invalid shape")
         self.rows = rows
@@ -171,15 +300,19 @@ class TreeMatrix:
         self._root: Optional[_Node] = None
         self._nnz = 0
         self._transposed = False
+        self._observers: List[Callable] = []
+        self._scale = 1.0
+        self._shared = False
 
+    # rows/cols are the logical dims (swapped by transpose); keys use base orientation
     @property
-    def shape(self): return (self.cols, self.rows) if self._transposed else (self.rows, self.cols)
+    def shape(self): return (self.rows, self.cols)
     @property
     def nnz(self): return self._nnz
 
     def _norm(self, i:int, j:int) -> Key:
-        if self._transposed: i,j = j,i
         r,c = self.rows, self.cols
+        if self._transposed: i,j,r,c = j,i,c,r
         if not (0 <= i < r and 0 <= j < c):
             raise IndexError("index out of bounds")
         return (i,j)
@@ -187,33 +320,250 @@ class TreeMatrix:
     def access(self, i:int, j:int) -> float:
         key = self._norm(i,j)
         node = _find(self._root, key)
-        return 0.0 if node is None else node.val
+        return self._implicit if node is None else node.val * self._scale
+
+    def _materialize(self) -> None:
+        # before a write: fold the lazy scale into the values and stop sharing nodes
+        if self._scale == 1.0 and not self._shared: return
+        s = self._scale
+        keys: List[Key] = []
+        vals: List[float] = []
+        for nd in _inorder(self._root):
+            v = nd.val * s
+            if v != 0.0:
+                keys.append(nd.key); vals.append(v)
+        self._root = _build(keys, vals, 0, len(keys))
+        self._nnz = len(keys)
+        self._scale, self._shared = 1.0, False
+
+    def snapshot(self) -> "TreeMatrix":
+        """O(1) immutable-in-practice copy: both versions share every node and from now
+           on write by path copying, so readers of either never see the other's updates."""
+        S = TreeMatrix(self.rows, self.cols)
+        S._root, S._nnz, S._transposed, S._scale = self._root, self._nnz, self._transposed, self._scale
+        S._shared = self._shared = True
+        return S
+
+    def _put(self, key: Key, val: float) -> None:
+        self._root = _pinsert(self._root, key, val) if self._shared else _insert(self._root, key, val)
+
+    def _remove(self, key: Key) -> None:
+        self._root = _pdelete(self._root, key) if self._shared else _delete(self._root, key)
 
     def insert(self, i:int, j:int, val: float) -> None:
         key = self._norm(i,j)
+        if self._scale != 1.0: self._materialize()
         node = _find(self._root, key)
         existed = node is not None
+        old = node.val if existed else 0.0
         if val == 0.0:
             if existed:
-                self._root = _delete(self._root, key)
+                self._remove(key)
                 self._nnz -= 1
+        else:
+            self._put(key, val)
+            if not existed: self._nnz += 1
+        if self._observers and old != val: self._notify(i, j, old, val)
+
+    def insert_many(self, rows, cols, vals, dup: str="sum") -> None:
+        """Bulk COO insert. Duplicates within the batch are summed (dup='sum') or the
+           last one wins (dup='last'); the combined value overwrites any stored one.
+           Large batches are merged with the in-order contents and the tree is rebuilt
+           balanced in one linear pass instead of descending once per triplet.
+        """
+        if dup not in ("sum", "last"): raise ValueError("dup must be 'sum' or 'last'")
+        if not (len(rows) == len(cols) == len(vals)): raise ValueError("rows, cols and vals differ in length")
+        if len(rows) == 0: return
+        r,c = self.shape
+        if min(rows) < 0 or max(rows) >= r or min(cols) < 0 or max(cols) >= c:
+            raise IndexError("index out of bounds")
+        if self._scale != 1.0: self._materialize()
+        if self._transposed: rows, cols = cols, rows
+        if dup == "last":
+            batch: Dict[Key,float] = dict(zip(zip(rows, cols), vals))
+        else:
+            batch = {}
+            for key, v in zip(zip(rows, cols), vals):
+                batch[key] = batch.get(key, 0.0) + v
+        if self._observers or len(batch) * 8 < self._nnz:
+            # small batch into a big tree (or observers to notify): per-key updates
+            for (i,j), v in batch.items():
+                if self._transposed: i,j = j,i
+                self.insert(i, j, v)
             return
-        self._root = _insert(self._root, key, val)
-        if not existed: self._nnz += 1
+        keys: List[Key] = []
+        out: List[float] = []
+        new = sorted(batch.items())
+        old = [(nd.key, nd.val) for nd in _inorder(self._root)]
+        p = q = 0
+        while p < len(old) or q < len(new):
+            if q == len(new) or (p < len(old) and old[p][0] < new[q][0]):
+                key, v = old[p]; p += 1
+            else:
+                if p < len(old) and old[p][0] == new[q][0]: p += 1
+                key, v = new[q]; q += 1
+            if v != 0.0:
+                keys.append(key); out.append(v)
+        self._root = _build(keys, out, 0, len(keys))
+        self._nnz = len(keys)
+        self._shared = False  # every node is new
+
+    @classmethod
+    def from_coo(cls, rows:int, cols:int, r, c, v, dup: str="sum") -> "TreeMatrix":
+        M = cls(rows, cols)
+        M.insert_many(r, c, v, dup)
+        return M
+
+    @classmethod
+    def from_csr(cls, rows:int, cols:int, ptr, idx, vals) -> "TreeMatrix":
+        """O(k + n) build from CSR with nonzero values and columns ascending in every row:
+           the keys are already in tree order, so the tree is built balanced bottom-up."""
+        keys = [(i, idx[p]) for i in range(rows) for p in range(ptr[i], ptr[i+1])]
+        M = cls(rows, cols)
+        M._root = _build(keys, vals, 0, len(keys))
+        M._nnz = len(keys)
+        return M
+
+    # order statistics over the stored key order, i.e. base orientation (i,j):
+    # on a transposed matrix a key (i,j) is logical entry (j,i). All O(log k).
+    def rank(self, key: Key) -> int:
+        """Number of stored nonzeros whose key is < key."""
+        return _rank(self._root, key)
+
+    def select(self, k: int) -> Tuple[Key, float]:
+        """(key, value) of the k-th stored nonzero (0-based, negative counts from the end)."""
+        n = _sz(self._root)
+        if k < 0: k += n
+        if not (0 <= k < n): raise IndexError("select index out of range")
+        nd = _select(self._root, k)
+        return nd.key, nd.val * self._scale
+
+    def nnz_in_range(self, lo: Key, hi: Key) -> int:
+        """Nonzeros with lo <= key <= hi (inclusive, like _iter_range).
+           nnz_in_range((i,0), (i,cols-1)) is the nnz of stored row i."""
+        if _cmp(lo, hi) > 0: return 0
+        return _rank(self._root, (hi[0], hi[1]+1)) - _rank(self._root, lo)
+
+    def subscribe(self, callback: Callable) -> None:
+        """callback(matrix, i, j, old, new) after every insert (logical coords);
+           after transpose it is called with i, j, old, new = None."""
+        self._observers.append(callback)
+
+    def unsubscribe(self, callback: Callable) -> None:
+        self._observers.remove(callback)
+
+    def _notify(self, i, j, old, new) -> None:
+        for cb in list(self._observers):
+            cb(self, i, j, old, new)
+
+    def __getitem__(self, key):
+        """A[i,j] -> value; A[r0:r1, c0:c1] -> zero-copy TreeView."""
+        r0,r1,c0,c1 = parse_key(key, self.shape)
+        if is_point(key):
+            return self.access(r0,c0)
+        return TreeView(self, r0,r1,c0,c1)
 
     def transpose(self) -> None:
         self._transposed = not self._transposed
         self.rows, self.cols = self.cols, self.rows
+        if self._observers: self._notify(None, None, None, None)
+
+    def _base_csr(self) -> Compressed:
+        # stored rows as (ptr, cols, vals) from one in-order pass; cols ascending, scale applied
+        n = self.cols if self._transposed else self.rows
+        ptr, idx, vals = array("q", bytes(8*(n+1))), array("i"), array("d")
+        s = self._scale
+        for nd in _inorder(self._root):
+            i,j = nd.key
+            ptr[i+1] += 1
+            idx.append(j); vals.append(nd.val*s)
+        for r in range(n): ptr[r+1] += ptr[r]
+        return ptr, idx, vals
+
+    def _stored_rows(self) -> Iterable[Tuple[int, List[int], List[float]]]:
+        # (stored row, cols, vals) groups from one in-order pass, scale applied
+        s = self._scale
+        r, cols, vals = -1, [], []
+        for nd in _inorder(self._root):
+            i,j = nd.key
+            if i != r:
+                if cols: yield r, cols, vals
+                r, cols, vals = i, [], []
+            cols.append(j); vals.append(nd.val*s)
+        if cols: yield r, cols, vals
+
+    # reductions: each stored nonzero is visited once, the transpose flag only picks the axis
+    def sum(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._transposed, "sum", axis)
+
+    def count_nonzero(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._transposed, "count", axis)
+
+    def max(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._transposed, "max", axis)
+
+    def min(self, axis: Optional[int]=None):
+        return reduce(self._stored_rows(), self.shape, self._transposed, "min", axis)
+
+    def norm(self, ord="fro") -> float:
+        return norm(self._stored_rows(), self.shape, self._transposed, ord)
+
+    def _from_stored_rows(self, rows: Dict[int, Tuple[List[int], List[float]]]) -> "TreeMatrix":
+        # same shape and orientation as self; rows ascending, so keys are sorted for _build
+        keys: List[Key] = []
+        vals: List[float] = []
+        for r, (cs, vs) in rows.items():
+            keys.extend((r, c) for c in cs); vals.extend(vs)
+        R = TreeMatrix(self.rows, self.cols)
+        R._transposed = self._transposed
+        R._root = _build(keys, vals, 0, len(keys))
+        R._nnz = len(keys)
+        return R
+
+    # element-wise ops (they commute with transpose: computed on stored rows, result keeps the flag)
+    def hadamard(self, other: "TreeMatrix") -> "TreeMatrix":
+        """self * other element-wise; per row pair the shorter row gallops through the longer."""
+        return self._from_stored_rows(combine(self, other, hadamard_fn, False))
+
+    def where(self, mask) -> "TreeMatrix":
+        """Entries of self where `mask` is nonzero."""
+        return self._from_stored_rows(combine(self, mask, mask_fn, False))
+
+    def maximum(self, other: "TreeMatrix") -> "TreeMatrix":
+        """max(self, other) element-wise, implicit zeros included (sorted-merge union)."""
+        return self._from_stored_rows(combine(self, other, max, True))
+
+    def minimum(self, other: "TreeMatrix") -> "TreeMatrix":
+        return self._from_stored_rows(combine(self, other, min, True))
+
+    def to_csc(self, workers:int=1) -> Compressed:
+        """(colptr, rowidx, vals) of the logical matrix in O(k + n), row indices ascending
+           per column. Untransposed, the stored rows are regrouped by a counting sort over
+           column indices; transposed, logical columns are already the stored rows."""
+        ptr, idx, vals = self._base_csr()
+        if self._transposed: return ptr, idx, vals
+        return counting_transpose(self.cols, ptr, idx, vals, workers)
+
+    def transposed_copy(self, workers:int=1) -> "TreeMatrix":
+        """Physical transpose in O(k + n): an untransposed tree holding self^T,
+           built balanced straight from the column-major order."""
+        ptr, idx, vals = self.to_csc(workers)
+        keys = [(j, idx[p]) for j in range(self.cols) for p in range(ptr[j], ptr[j+1])]
+        R = TreeMatrix(self.cols, self.rows)
+        R._root = _build(keys, vals, 0, len(keys))
+        R._nnz = len(keys)
+        return R
 
     def items(self) -> Iterable[Tuple[int,int,float]]:
+        s = self._scale
         if not self._transposed:
             for nd in _inorder(self._root):
                 i,j = nd.key
-                yield (i,j,nd.val)
+                yield (i,j,nd.val*s)
         else:
             for nd in _inorder(self._root):
                 i,j = nd.key
-                yield (j,i,nd.val)
+                yield (j,i,nd.val*s)
 
     def iter_row(self, i:int) -> Iterable[Tuple[int,float]]:
         """Iterate (j,val) for a logical row i efficiently via range search."""
@@ -230,11 +580,12 @@ class TreeMatrix:
         for nd in _iter_range(self._root, lo, hi):
             # ensure row match
             if nd.key[0] == i:
-                yield (nd.key[1], nd.val)
+                yield (nd.key[1], nd.val*self._scale)
 
     # algebra
     def add(self, other: "TreeMatrix") -> "TreeMatrix":
         r,c = self.shape
+        if isinstance(other, DenseMatrix): return sparse_dense_add(self, other)
         if other.shape != (r,c): raise ValueError("shape mismatch on add")
         R = TreeMatrix(r,c)
         for i,j,v in self.items(): R.insert(i,j,v)
@@ -245,18 +596,95 @@ class TreeMatrix:
         return R
 
     def scale(self, a: float) -> "TreeMatrix":
+        """O(1): the result shares this tree's nodes and only records the factor."""
         r,c = self.shape
         R = TreeMatrix(r,c)
         if a == 0.0: return R
-        for i,j,v in self.items():
-            R.insert(i,j, a*v)
+        R._root, R._nnz, R._transposed = self._root, self._nnz, self._transposed
+        R._scale = self._scale * a
+        R._shared = self._shared = True
         return R
 
-    def matmul(self, other: "TreeMatrix") -> "TreeMatrix":
+    # in-place algebra: the receiver is updated, nothing is reallocated
+    def axpy(self, alpha: float, X: "TreeMatrix") -> "TreeMatrix":
+        """self += alpha*X in place. Each entry of X is merged into the existing tree:
+           present keys are updated in their node, new keys are inserted and keys that
+           cancel to exactly 0.0 are deleted, so the cost is O(nnz(X) log k) with no rebuild.
+        """
+        if X.shape != self.shape: raise ValueError("shape mismatch on axpy")
+        if X is self: return self.__imul__(1.0 + alpha)
+        if alpha == 0.0: return self
+        if self._scale != 1.0: self._materialize()
+        for i,j,v in X.items():
+            key = self._norm(i,j)
+            node = _find(self._root, key)
+            old = 0.0 if node is None else node.val
+            new = old + alpha*v
+            if new == 0.0:
+                if node is None: continue
+                self._remove(key)
+                self._nnz -= 1
+            elif node is not None and not self._shared:
+                node.val = new
+            else:
+                self._put(key, new)
+                if node is None: self._nnz += 1
+            if self._observers and old != new: self._notify(i, j, old, new)
+        return self
+
+    def __iadd__(self, other: "TreeMatrix") -> "TreeMatrix":
+        return self.axpy(1.0, other)
+
+    def __isub__(self, other: "TreeMatrix") -> "TreeMatrix":
+        return self.axpy(-1.0, other)
+
+    def __imul__(self, a: float) -> "TreeMatrix":
+        """Scale in place: values are rewritten in their nodes; only entries that
+           underflow to 0.0 are deleted."""
+        if not isinstance(a, (int, float)): return NotImplemented
+        if not self._observers:
+            # O(1): only the lazy factor changes
+            if a == 0.0: self._root, self._nnz, self._scale, self._shared = None, 0, 1.0, False
+            else: self._scale *= a
+            return self
+        self._materialize()
+        changes: List[Tuple[Key,float,float]] = []
+        dead: List[Key] = []
+        for nd in _inorder(self._root):
+            old = nd.val
+            nd.val = old * a
+            if nd.val == 0.0: dead.append(nd.key)
+            if nd.val != old: changes.append((nd.key, old, nd.val))
+        if len(dead) == self._nnz:
+            self._root = None
+        else:
+            for key in dead: self._root = _delete(self._root, key)
+        self._nnz -= len(dead)
+        for (i,j), old, new in changes:
+            if self._transposed: i,j = j,i
+            self._notify(i, j, old, new)
+        return self
+
+    def matmul(self, other: "TreeMatrix", semiring: Optional[Semiring]=None) -> "TreeMatrix":
+        if semiring is None and isinstance(other, DenseMatrix):
+            return sparse_dense_matmul(self, other)
         nA,mA = self.shape
         nB,mB = other.shape
         if mA != nB: raise ValueError("shape mismatch on matmul")
         R = TreeMatrix(nA, mB)
+        if semiring is not None:
+            b_rows = {t: dict(row) for t,row in other._logical_rows().items()}
+            a_rows = {i: dict(row) for i,row in self._logical_rows().items()}
+            out = matmul_rows(a_rows, b_rows, semiring, mB)
+            # insert directly: a stored 0.0 is meaningful when the semiring zero is not 0.0 (min-plus).
+            # Missing keys read as semiring.zero; matrices derived from R are plus-times again.
+            for i in sorted(out):
+                row = out[i]
+                for j in sorted(row):
+                    R._root = _insert(R._root, (i,j), row[j])
+                    R._nnz += 1
+            R._implicit = semiring.zero
+            return R
         # For each nonzero (i,t) in A, multiply by row t of B
         for (i,t,a_it) in self.items():
             for (j, b_tj) in other.iter_row(t):
@@ -265,10 +693,167 @@ class TreeMatrix:
                 R.insert(i,j,nv)
         return R
 
+    def approx_matmul(self, other: "TreeMatrix", atol: float=0.0, rtol: float=0.0,
+                      top_k: Optional[int]=None) -> "TreeMatrix":
+        """Pruned self @ other: each output row keeps only |v| > max(atol, rtol * max|row|),
+           and at most its top_k largest magnitudes. Rows come out sorted, so the result
+           tree is built bottom-up in one pass instead of by per-product inserts.
+        """
+        nA,mA = self.shape
+        nB,mB = other.shape
+        if mA != nB: raise ValueError("shape mismatch on matmul")
+        a_rows = {i: dict(row) for i,row in self._logical_rows().items()}
+        b_rows = {t: dict(row) for t,row in other._logical_rows().items()}
+        out = approx_matmul_rows(a_rows, b_rows, atol, rtol, top_k)
+        keys: List[Key] = []
+        vals: List[float] = []
+        for i in sorted(out):
+            row = out[i]
+            for j in sorted(row):
+                keys.append((i, j)); vals.append(row[j])
+        R = TreeMatrix(nA, mB)
+        R._root = _build(keys, vals, 0, len(keys))
+        R._nnz = len(keys)
+        return R
+
+    def matvec(self, x: List[float], semiring: Semiring=PLUS_TIMES) -> List[float]:
+        """y = self @ x for a dense vector x; rows without contributions are semiring.zero."""
+        r,c = self.shape
+        if len(x) != c: raise ValueError("shape mismatch on matvec")
+        a_rows = {i: dict(row) for i,row in self._logical_rows().items()}
+        return matvec_rows(a_rows, x, semiring, r)
+
+    def masked_matmul(self, other: "TreeMatrix", mask: "TreeMatrix", complement: bool=False) -> "TreeMatrix":
+        """(self @ other) restricted to the nonzero pattern of `mask`
+           (or to its zero pattern when complement=True).
+           Each masked entry is a dot product of row i of A with column j of B, so the
+           work is driven by the mask, never by all of B. Columns of a transposed B are
+           base rows (one range query per masked column, then a sorted intersection);
+           otherwise each (i,j) looks up B[t,j] for the t in row i of A, O(|A_i| log k_B).
+           complement=True is a Gustavson product over B's logical rows, grouped once.
+        """
+        nA,mA = self.shape
+        nB,mB = other.shape
+        if mA != nB: raise ValueError("shape mismatch on matmul")
+        if mask.shape != (nA,mB): raise ValueError("shape mismatch on mask")
+        R = TreeMatrix(nA, mB)
+        pattern: Dict[int, List[int]] = {}
+        for i,j,_ in mask.items():
+            pattern.setdefault(i, []).append(j)
+        if complement:
+            b_rows = other._logical_rows()
+            for i, a_row in self._logical_rows().items():
+                skip = set(pattern.get(i, ()))
+                acc: Dict[int, float] = {}
+                for t, a_it in a_row:
+                    for j, b_tj in b_rows.get(t, ()):
+                        if j not in skip:
+                            acc[j] = acc.get(j, 0.0) + a_it*b_tj
+                for j in sorted(acc):
+                    if acc[j] != 0.0: R.insert(i, j, acc[j])
+            return R
+        # rows of A: range queries per masked row, or one grouping pass if transposed
+        a_rows = self._logical_rows() if self._transposed else None
+        b_cols: Dict[int, List[Tuple[int,float]]] = {}
+        root, s = other._root, other._scale
+        for i, cols in pattern.items():
+            a_row = a_rows.get(i, []) if a_rows is not None else list(self.iter_row(i))
+            if not a_row: continue
+            for j in cols:
+                if other._transposed:
+                    # logical column j of B is base row j: sorted by t
+                    b_col = b_cols.get(j)
+                    if b_col is None: b_col = b_cols[j] = other._base_row(j)
+                    v = _sorted_dot(a_row, b_col)
+                else:
+                    v = 0.0
+                    for t, a_it in a_row:
+                        nd = _find(root, (t, j))
+                        if nd is not None: v += a_it*nd.val
+                    v *= s
+                if v != 0.0: R.insert(i, j, v)
+        return R
+
+    def _base_row(self, r:int) -> List[Tuple[int,float]]:
+        # (col,val) pairs of base-orientation row r, sorted by col
+        s = self._scale
+        return [(nd.key[1], nd.val*s) for nd in _iter_range(self._root, (r, -10**18), (r, 10**18)) if nd.key[0] == r]
+
+    def __reduce_ex__(self, protocol):
+        """Pickle as flat key/value arrays from one in-order walk (no per-node pickling,
+           so no recursion limit). Under protocol 5 they go as PickleBuffers, out of band
+           when the pickler has a buffer_callback. Observers are not pickled."""
+        ki, kj, vs = array("i"), array("i"), array("d")
+        for nd in _inorder(self._root):
+            i,j = nd.key
+            ki.append(i); kj.append(j); vs.append(nd.val)
+        bufs = (ki, kj, vs)
+        if protocol >= 5: bufs = tuple(pickle.PickleBuffer(b) for b in bufs)
+        return (_rebuild, (self.rows, self.cols, self._transposed, self._scale) + bufs)
+
+    def _logical_rows(self) -> Dict[int, List[Tuple[int,float]]]:
+        # group all nonzeros by logical row in one in-order pass; each row comes out sorted
+        rows: Dict[int, List[Tuple[int,float]]] = {}
+        for i,j,v in self.items():
+            rows.setdefault(i, []).append((j,v))
+        return rows
+
     # convenience
     @staticmethod
     def from_coords(rows:int, cols:int, triplets: Iterable[Tuple[int,int,float]]) -> "TreeMatrix":
-        M = TreeMatrix(rows, cols)
+        rs, cs, vs = array("i"), array("i"), array("d")
         for i,j,v in triplets:
-            M.insert(i,j,v)
-        return M
+            rs.append(i); cs.append(j); vs.append(v)
+        return TreeMatrix.from_coo(rows, cols, rs, cs, vs, dup="last")
+
+def _rebuild(rows:int, cols:int, transposed:bool, scale:float, ki, kj, vs) -> TreeMatrix:
+    # inverse of __reduce_ex__: buffers arrive as array, bytes or bytearray (native order);
+    # the keys are already sorted, so the tree is rebuilt bottom-up in O(k)
+    ki, kj, vs = (memoryview(b).cast("B").cast(t) for b, t in ((ki, "i"), (kj, "i"), (vs, "d")))
+    M = TreeMatrix(rows, cols)
+    M._transposed, M._scale = transposed, scale
+    M._root = _build(list(zip(ki, kj)), vs.tolist(), 0, len(vs))
+    M._nnz = len(vs)
+    return M
+
+class TreeView(SubmatrixView):
+    """Window over a TreeMatrix. Rows of the block are found with _lower_bound and
+       scanned with _iter_range, so reading a block costs O(log k + block_nnz)
+       (plus O(log k) per nonempty row when the column window is narrower than the matrix).
+    """
+    def _base_get(self, i:int, j:int) -> float:
+        return self.base.access(i,j)
+
+    def _base_items(self) -> Iterable[Tuple[int,int,float]]:
+        T = self.base
+        r0,r1,c0,c1 = self.r0, self.r1, self.c0, self.c1
+        ncols = T.cols
+        if T._transposed:
+            # logical rows are base columns
+            r0,r1,c0,c1 = c0,c1,r0,r1
+            ncols = T.rows
+        if r0 >= r1 or c0 >= c1: return
+        if c0 == 0 and c1 == ncols:
+            nodes: Iterable[_Node] = _iter_range(T._root, (r0,0), (r1-1,c1-1))
+        else:
+            nodes = self._row_windows(T._root, r0, r1, c0, c1)
+        s = T._scale
+        for nd in nodes:
+            i,j = nd.key
+            if T._transposed: yield (j,i,nd.val*s)
+            else: yield (i,j,nd.val*s)
+
+    @staticmethod
+    def _row_windows(root: Optional[_Node], r0:int, r1:int, c0:int, c1:int) -> Iterable[_Node]:
+        # jump from one nonempty row to the next with _lower_bound, scan [c0,c1) of each
+        key = (r0,c0)
+        while True:
+            nd = _lower_bound(root, key)
+            if nd is None or nd.key[0] >= r1: return
+            r = nd.key[0]
+            if nd.key[1] < c1:
+                yield from _iter_range(root, (r,c0), (r,c1-1))
+            key = (r+1,c0)
+
+    def _empty(self, r:int, c:int) -> TreeMatrix:
+        return TreeMatrix(r,c)
@@ -0,0 +1,88 @@
+
+from __future__ import annotations
+from typing import Iterable, Optional, Tuple
+
+def _bounds(s, n:int, axis:str) -> Tuple[int,int]:
+    if isinstance(s, int):
+        if s < 0: s += n
+        if not (0 <= s < n): raise IndexError(f"{axis} index out of bounds")
+        return s, s+1
+    if not isinstance(s, slice): raise TypeError("indices must be ints or slices")
+    lo, hi, step = s.indices(n)
+    if step != 1: raise ValueError("only contiguous slices (step 1) are supported")
+    return lo, max(lo, hi)
+
+def parse_key(key, shape: Tuple[int,int]) -> Tuple[int,int,int,int]:
+    """Turn A[r, c] / A[r0:r1, c0:c1] into half-open bounds (r0, r1, c0, c1)."""
+    if not (isinstance(key, tuple) and len(key) == 2):
+        raise TypeError("use A[rows, cols]")
+    r0, r1 = _bounds(key[0], shape[0], "row")
+    c0, c1 = _bounds(key[1], shape[1], "col")
+    return r0, r1, c0, c1
+
+def is_point(key) -> bool:
+    return isinstance(key, tuple) and len(key) == 2 and isinstance(key[0], int) and isinstance(key[1], int)
+
+class SubmatrixView:
+    """Zero-copy window [r0:r1, c0:c1] over a matrix (logical orientation).
+       Reads translate indices into the base matrix; the first write detaches
+       the view into its own copy (copy-on-write), leaving the base untouched.
+       Subclasses supply the backend-specific `_base_get`, `_base_items` and `_empty`.
+    """
+    def __init__(self, base, r0:int, r1:int, c0:int, c1:int):
+        self.base = base
+        self.r0, self.r1, self.c0, self.c1 = r0, r1, c0, c1
+        self._own = None  # detached copy after the first write
+
+    @property
+    def shape(self): return (self.r1-self.r0, self.c1-self.c0)
+
+    @property
+    def nnz(self) -> int: return sum(1 for _ in self.items())
+
+    def _check(self, i:int, j:int) -> None:
+        r,c = self.shape
+        if not (0 <= i < r and 0 <= j < c): raise IndexError("index out of bounds")
+
+    def access(self, i:int, j:int) -> float:
+        self._check(i,j)
+        if self._own is not None: return self._get_own(i,j)
+        return self._base_get(self.r0+i, self.c0+j)
+
+    def insert(self, i:int, j:int, v:float) -> None:
+        self._check(i,j)
+        if self._own is None: self._own = self.copy()
+        self._set_own(i,j,v)
+
+    def items(self) -> Iterable[Tuple[int,int,float]]:
+        if self._own is not None:
+            yield from self._own_items()
+            return
+        r0, c0 = self.r0, self.c0
+        for i,j,v in self._base_items():
+            yield (i-r0, j-c0, v)
+
+    def copy(self):
+        """Materialize the window as a standalone matrix of the base's type."""
+        r,c = self.shape
+        M = self._empty(r,c)
+        for i,j,v in self.items(): self._put(M,i,j,v)
+        return M
+
+    def __getitem__(self, key):
+        r0,r1,c0,c1 = parse_key(key, self.shape)
+        if is_point(key): return self.access(r0,c0)
+        if self._own is not None:
+            return self._own[r0:r1, c0:c1]
+        return type(self)(self.base, self.r0+r0, self.r0+r1, self.c0+c0, self.c0+c1)
+
+    # helpers over the detached copy (same backend API as the base)
+    def _get_own(self, i:int, j:int) -> float: return self._own.access(i,j)
+    def _set_own(self, i:int, j:int, v:float) -> None: self._own.insert(i,j,v)
+    def _own_items(self): return self._own.items()
+    def _put(self, M, i:int, j:int, v:float) -> None: M.insert(i,j,v)
+
+    # backend hooks
+    def _base_get(self, i:int, j:int) -> float: raise NotImplementedError
+    def _base_items(self) -> Iterable[Tuple[int,int,float]]: raise NotImplementedError
+    def _empty(self, r:int, c:int): raise NotImplementedError
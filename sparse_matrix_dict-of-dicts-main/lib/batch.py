@@ -0,0 +1,248 @@
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional, TextIO, Tuple
+
+from .cli import CLI
+from .sparse_matrix import SparseMatrix
+
+FORMATS = {"coo": "txt", "mtx": "mtx", "bin": "bin"}
+_BIN_HEADER = struct.Struct("<4sIIQ")  # magic, rows, cols, nnz
+PURE_OPS = ("sum", "smult", "mmult")
+
+
+class Command(NamedTuple):
+    lineno: int
+    op: str
+    args: Tuple[str, ...]
+    target: Optional[str]
+    reads: frozenset
+    writes: frozenset
+
+
+def parse_command(line: str, lineno: int) -> Optional[Command]:
+    """Parse one script line using the interactive CLI vocabulary ('#' starts a comment)."""
+    tokens = line.split("#", 1)[0].split()
+    if not tokens:
+        return None
+
+    op = tokens[0].lower()
+    target = None
+    if op in PURE_OPS and len(tokens) == 5 and tokens[3].lower() == "as":
+        target = tokens[4]
+        tokens = tokens[:3]
+    args = tuple(tokens[1:])
+
+    arity = {"load": 2, "access": 3, "insert": 4, "transpose": 1,
+             "sum": 2, "smult": 2, "mmult": 2, "print": 1}
+    if arity.get(op) != len(args):
+        raise ValueError(f"line {lineno}: invalid command or incorrect number of arguments: {line.strip()}")
+
+    if op == "load":
+        reads, writes = (), (args[1],)
+    elif op in ("insert", "transpose"):
+        reads, writes = (args[0],), (args[0],)
+    elif op in ("sum", "mmult"):
+        reads, writes = args, ((target,) if target else ())
+    elif op == "smult":
+        reads, writes = (args[0],), ((target,) if target else ())
+    else:  # access, print
+        reads, writes = (args[0],), ()
+    return Command(lineno, op, args, target, frozenset(reads), frozenset(writes))
+
+
+def parse_script(lines: Iterable[str]) -> List[Command]:
+    commands = []
+    for lineno, line in enumerate(lines, 1):
+        command = parse_command(line, lineno)
+        if command is not None:
+            commands.append(command)
+    return commands
+
+
+def stages(commands: List[Command]) -> List[List[Command]]:
+    """Split the script into consecutive groups of mutually independent commands
+    (no command in a group reads or writes a name another one writes)."""
+    groups: List[List[Command]] = []
+    current: List[Command] = []
+    reads, writes = set(), set()
+    for command in commands:
+        if command.reads & writes or command.writes & (reads | writes):
+            groups.append(current)
+            current, reads, writes = [], set(), set()
+        current.append(command)
+        reads |= command.reads
+        writes |= command.writes
+    if current:
+        groups.append(current)
+    return groups
+
+
+def compute(op: str, left: SparseMatrix, right, scalar: Optional[float] = None) -> SparseMatrix:
+    """The pure operations; module level so worker processes can run them."""
+    if op == "sum":
+        return left + right
+    if op == "smult":
+        return scalar * left
+    return left * right
+
+
+def write_matrix(matrix: SparseMatrix, path: str, fmt: str) -> None:
+    """Write all non-zeros at once: 'coo' text (i j value), Matrix Market ('mtx', 1-based)
+    or 'bin' (header, int32 rows, int32 cols, float64 values; all little-endian)."""
+    rows, cols = matrix.shape
+    triplets = sorted(matrix.triplets())
+    if fmt == "bin":
+        ri, ci, values = array("i"), array("i"), array("d")
+        for i, j, value in triplets:
+            ri.append(i)
+            ci.append(j)
+            values.append(value)
+        if sys.byteorder == "big":  # arrays are written in native order; the format is little-endian
+            for data in (ri, ci, values):
+                data.byteswap()
+        with open(path, "wb") as f:
+            f.write(_BIN_HEADER.pack(b"SPM1", rows, cols, len(values)))
+            ri.tofile(f)
+            ci.tofile(f)
+            values.tofile(f)
+        return
+
+    if fmt == "mtx":
+        lines = ["%%MatrixMarket matrix coordinate real general", f"{rows} {cols} {len(triplets)}"]
+        lines += [f"{i + 1} {j + 1} {value!r}" for i, j, value in triplets]
+    else:
+        lines = [f"{i} {j} {value!r}" for i, j, value in triplets]
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+class BatchRunner:
+    """Run a command script against a CLI session. Results of sum/smult/mmult without
+    'as <name>' and every 'print' are written to files in out_dir; the console only gets
+    one summary line per command. With jobs > 1 the pure operations of each stage of
+    independent commands run in a process pool."""
+
+    def __init__(self, out_dir: str = "results", fmt: str = "coo", jobs: int = 1,
+                 cli: Optional[CLI] = None, out: TextIO = sys.stdout):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format '{fmt}'")
+        self.cli = cli if cli is not None else CLI()
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.jobs = jobs
+        self.out = out
+
+    def run(self, lines: Iterable[str]) -> int:
+        """Run the script; returns the number of commands that failed."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        commands = parse_script(lines)
+        failures = 0
+        pool = ProcessPoolExecutor(self.jobs) if self.jobs > 1 else None
+        try:
+            for stage in stages(commands):
+                summaries, failed = self._run_stage(stage, pool)
+                failures += failed
+                self.out.write("\n".join(summaries) + "\n")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return failures
+
+    def _run_stage(self, stage: List[Command], pool) -> Tuple[List[str], int]:
+        matrices = self.cli.matrices
+        pending = {}
+        for command in stage:
+            if command.op in PURE_OPS and pool is not None and command.reads <= matrices.keys():
+                try:
+                    names, scalar = self._operands(command)
+                except ValueError:
+                    continue  # reported when the command is executed
+                if self.cli.cache_lookup(command.op, names, scalar) is None:
+                    left, right = self._operand_values(command)
+                    pending[command.lineno] = (pool.submit(compute, command.op, left, right, scalar), time.perf_counter())
+
+        summaries, failed = [], 0
+        for command in stage:
+            start = time.perf_counter()
+            try:
+                detail = self._execute(command, pending)
+            except (KeyError, ValueError, IndexError, OSError) as e:
+                failed += 1
+                detail = f"error: {e}"
+            if command.lineno in pending:
+                start = pending[command.lineno][1]
+            elapsed = (time.perf_counter() - start) * 1000.0
+            summaries.append(f"[{command.lineno}] {command.op} {' '.join(command.args)}  {detail}  {elapsed:.3f} ms")
+        return summaries, failed
+
+    def _operands(self, command: Command) -> Tuple[Tuple[str, ...], Optional[float]]:
+        if command.op == "smult":
+            return (command.args[0],), float(command.args[1])
+        return command.args, None
+
+    def _operand_values(self, command: Command):
+        matrices = self.cli.matrices
+        if command.op == "smult":
+            return matrices[command.args[0]], None
+        return matrices[command.args[0]], matrices[command.args[1]]
+
+    def _matrix(self, name: str) -> SparseMatrix:
+        if name not in self.cli.matrices:
+            raise KeyError(f"matrix '{name}' not found")
+        return self.cli.matrices[name]
+
+    def _execute(self, command: Command, pending) -> str:
+        op, args = command.op, command.args
+        if op == "load":
+            matrix = SparseMatrix.load_from_file(args[0])
+            self.cli._bind(args[1], matrix)
+            return self._describe(matrix)
+        if op == "access":
+            return f"value={self._matrix(args[0]).access(int(args[1]), int(args[2]))}"
+        if op == "insert":
+            self._matrix(args[0]).insert(int(args[1]), int(args[2]), float(args[3]))
+            return "ok"
+        if op == "transpose":
+            matrix = self._matrix(args[0])
+            matrix.transpose()
+            return self._describe(matrix)
+        if op == "print":
+            matrix = self._matrix(args[0])
+            return self._write(matrix, f"{command.lineno:04d}_{args[0]}")
+
+        for name in command.reads:
+            self._matrix(name)
+        names, scalar = self._operands(command)
+        if command.lineno in pending:
+            result = pending[command.lineno][0].result()
+            self.cli.cache_store(op, names, scalar, result)
+        else:
+            left, right = self._operand_values(command)
+            result = self.cli._cached(op, names, lambda: compute(op, left, right, scalar), scalar)
+        if command.target is not None:
+            self.cli.store(command.target, result)
+            return f"-> {command.target} {self._describe(result)}"
+        return self._write(result, f"{command.lineno:04d}_{op}")
+
+    def _write(self, matrix: SparseMatrix, stem: str) -> str:
+        path = os.path.join(self.out_dir, f"{stem}.{FORMATS[self.fmt]}")
+        write_matrix(matrix, path, self.fmt)
+        return f"-> {path} {self._describe(matrix)}"
+
+    @staticmethod
+    def _describe(matrix: SparseMatrix) -> str:
+        return f"shape={matrix.shape} nnz={matrix.nnz()}"
+
+
+def run_batch(script: str, out_dir: str = "results", fmt: str = "coo", jobs: int = 1) -> int:
+    """Run a script file ('-' reads stdin) and return the number of failed commands."""
+    runner = BatchRunner(out_dir, fmt, jobs)
+    if script == "-":
+        return runner.run(sys.stdin)
+    with open(script) as f:
+        return runner.run(f.readlines())
@@ -1,15 +1,19 @@
-from typing import Dict
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
 from .sparse_matrix import SparseMatrix
 
 class CLI:
-    def __init__(self):
+    def __init__(self, cache_size: int = 32):
         self.matrices: Dict[str, SparseMatrix] = {}
+        # (op, operand names, operand versions, scalar) -> (result, result version)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, Tuple[SparseMatrix, int]]" = OrderedDict()
 
     def load_from_file(self, file_path: str, name: str) -> None:
         """Load a matrix from a file and store it in CSR format."""
         matrix = SparseMatrix.load_from_file(file_path)
         if matrix is not None:
-            self.matrices[name] = matrix
+            self._bind(name, matrix)
             return matrix
         
         return None
@@ -25,6 +29,7 @@ class CLI:
             "  sum <matrix1> <matrix2>          - Sum two matrices\n"
             "  smult <matrix> <scalar>          - Multiply matrix by scalar\n"
             "  mmult <matrix1> <matrix2>        - Multiply two matrices\n"
+            "    (append 'as <name>' to sum/smult/mmult to store the result instead of printing it)\n"
             "  print <matrix>                   - Print matrix information\n"
             "  help                             - Show this help message\n"
             "  exit                             - Exit the program\n\n"
@@ -38,6 +43,11 @@ class CLI:
 
         cmd = tokens[0].lower()
 
+        target = None
+        if cmd in ("sum", "smult", "mmult") and len(tokens) == 5 and tokens[3].lower() == "as":
+            target = tokens[4]
+            tokens = tokens[:3]
+
         if cmd == "load" and len(tokens) == 3:
             file_path = tokens[1]
             matrix_name = tokens[2]
@@ -85,9 +95,8 @@ class CLI:
                 return
             matrix2 = self.matrices[matrix2_key]
 
-            result = matrix1 + matrix2
-            print(f'result:')
-            result.show()
+            result = self._cached("sum", (matrix1_key, matrix2_key), lambda: matrix1 + matrix2)
+            self._emit(result, target)
             
         elif cmd == "smult" and len(tokens) == 3:
             matrix_key = tokens[1]
@@ -95,9 +104,9 @@ class CLI:
                 return
 
             scalar = float(tokens[2])
-            result = scalar * self.matrices[matrix_key]
-            print(f'result:')
-            result.show()
+            matrix = self.matrices[matrix_key]
+            result = self._cached("smult", (matrix_key,), lambda: scalar * matrix, scalar)
+            self._emit(result, target)
 
         elif cmd == "mmult" and len(tokens) == 3:
             matrix1_key = tokens[1]
@@ -107,10 +116,10 @@ class CLI:
 
             if not self._check_matrix_exists(matrix2_key):
                 return
-            result = self.matrices[matrix1_key] * self.matrices[matrix2_key]
-
-            print(f'result:')
-            result.show()
+            matrix1 = self.matrices[matrix1_key]
+            matrix2 = self.matrices[matrix2_key]
+            result = self._cached("mmult", (matrix1_key, matrix2_key), lambda: matrix1 * matrix2)
+            self._emit(result, target)
 
         elif cmd == "print" and len(tokens) == 2:
             matrix_key = tokens[1]
@@ -127,3 +136,55 @@ class CLI:
             print(f"Error: Matrix '{key}' not found.")
             return False
         return True
+
+    def _cached(self, op: str, names: Tuple[str, ...], compute: Callable[[], SparseMatrix],
+                scalar: Optional[float] = None) -> SparseMatrix:
+        """Return the result of op on the named matrices, reusing a cached result
+        while none of the operands (nor the result itself) has been mutated."""
+        result = self.cache_lookup(op, names, scalar)
+        if result is None:
+            result = compute()
+            self.cache_store(op, names, scalar, result)
+        return result
+
+    def cache_lookup(self, op: str, names: Tuple[str, ...], scalar: Optional[float] = None) -> Optional[SparseMatrix]:
+        key = self._cache_key(op, names, scalar)
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        result, version = hit
+        if result.version != version:
+            del self._cache[key]  # the result was stored under a name and then changed
+            return None
+        self._cache.move_to_end(key)
+        return result
+
+    def cache_store(self, op: str, names: Tuple[str, ...], scalar: Optional[float], result: SparseMatrix) -> None:
+        self._cache[self._cache_key(op, names, scalar)] = (result, result.version)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _cache_key(self, op: str, names: Tuple[str, ...], scalar: Optional[float]) -> tuple:
+        return (op, names, tuple(self.matrices[name].version for name in names), scalar)
+
+    def _emit(self, result: SparseMatrix, target: Optional[str]) -> None:
+        if target is None:
+            print(f'result:')
+            result.show()
+            return
+
+        self.store(target, result)
+        print(f"Result stored as '{target}'.")
+
+    def store(self, name: str, result: SparseMatrix) -> None:
+        """Bind an operation result to a name."""
+        # A cached result may already be bound to another name; never alias two names
+        if any(matrix is result for matrix in self.matrices.values()):
+            result = result.copy()
+        self._bind(name, result)
+
+    def _bind(self, name: str, matrix: SparseMatrix) -> None:
+        # Rebinding a name invalidates cached results that used the old matrix
+        self.matrices[name] = matrix
+        for key in [key for key in self._cache if name in key[1]]:
+            del self._cache[key]
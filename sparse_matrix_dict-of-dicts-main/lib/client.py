@@ -0,0 +1,62 @@
+import asyncio
+import json
+from collections import deque
+from typing import Any, Deque, Optional
+
+
+class ServerError(Exception):
+    pass
+
+
+class MatrixClient:
+    """Pipelining client for MatrixServer: send() does not wait for earlier replies;
+    responses arrive in request order and resolve the matching futures."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._waiting: Deque[asyncio.Future] = deque()
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 8765, unix: Optional[str] = None) -> "MatrixClient":
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def send(self, command: str) -> asyncio.Future:
+        """Queue a command; the returned future resolves to its result (or raises ServerError)."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(future)
+        self._writer.write(command.strip().encode() + b"\n")
+        return future
+
+    async def request(self, command: str) -> Any:
+        future = self.send(command)
+        await self._writer.drain()
+        return await future
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._receiver.cancel()
+
+    async def _receive(self) -> None:
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._waiting.popleft()
+            if future.done():
+                continue
+            if response["ok"]:
+                future.set_result(response["result"])
+            else:
+                future.set_exception(ServerError(response["error"]))
+        while self._waiting:
+            future = self._waiting.popleft()
+            if not future.done():
+                future.set_exception(ConnectionError("server closed the connection"))
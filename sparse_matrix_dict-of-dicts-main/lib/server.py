@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from .batch import PURE_OPS, Command, compute, parse_command
+from .cli import CLI
+from .sparse_matrix import SparseMatrix
+
+
+def describe(matrix: SparseMatrix, entries: bool = True) -> dict:
+    info = {"shape": list(matrix.shape), "nnz": matrix.nnz()}
+    if entries:
+        info["entries"] = sorted(matrix.triplets())
+    return info
+
+
+def _discard(future: asyncio.Future) -> None:
+    # retrieve the outcome of a response nobody will read, so it is not logged
+    if not future.cancelled():
+        future.exception()
+
+
+class MatrixServer:
+    """Keeps named matrices resident and answers the CLI command vocabulary over a socket.
+
+    Protocol: one command per line in, one JSON object per line out
+    ({"id": n, "ok": true, "result": ...} or {"id": n, "ok": false, "error": "..."}), in
+    request order per connection. Clients may pipeline: up to `pipeline` requests per
+    connection are in flight before the server stops reading from it, and at most
+    `max_inflight` heavy operations (sum/smult/mmult) run in the process pool at once.
+    Cheap commands (load/access/insert/transpose/print) are answered inline.
+    """
+
+    def __init__(self, workers: int = os.cpu_count() or 1, pipeline: int = 64, max_inflight: Optional[int] = None):
+        self.cli = CLI()
+        self.pool = ProcessPoolExecutor(workers)
+        self.pipeline = pipeline
+        self._inflight = asyncio.Semaphore(max_inflight or 2 * workers)
+        # name -> future of a pending 'as <name>' result, so later commands see it
+        self._pending: Dict[str, asyncio.Future] = {}
+        # id(matrix) -> number of heavy operations still reading it (see _writable)
+        self._lent: Dict[int, int] = {}
+
+    async def serve_tcp(self, host: str, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+        return await asyncio.start_unix_server(self._handle, path)
+
+    def close(self) -> None:
+        self.pool.shutdown()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        queue: asyncio.Queue = asyncio.Queue(self.pipeline)
+        sender = asyncio.create_task(self._send(queue, writer))
+        receiver = asyncio.create_task(self._receive(reader, queue))
+        try:
+            # a failing writer (client gone) must also stop the reader, which may be
+            # blocked on a full queue that nobody drains any more
+            await asyncio.wait((receiver, sender), return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in (receiver, sender):
+                task.cancel()
+            await asyncio.gather(receiver, sender, return_exceptions=True)
+            # unsent responses: heavy operations still finish (and store 'as' targets)
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not None and asyncio.isfuture(item[1]):
+                    item[1].add_done_callback(_discard)
+            writer.close()
+
+    async def _receive(self, reader: asyncio.StreamReader, queue: asyncio.Queue) -> None:
+        request_id = 0
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            request_id += 1
+            # put() blocks while `pipeline` responses are outstanding: backpressure
+            await queue.put((request_id, await self._dispatch(line.decode(), request_id)))
+        await queue.put(None)
+
+    async def _send(self, queue: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            request_id, outcome = item
+            try:
+                # shielded: cancelling this connection must not cancel a shared computation
+                result = await asyncio.shield(outcome) if asyncio.isfuture(outcome) else outcome
+                response = {"id": request_id, "ok": True, "result": result}
+            except Exception as e:
+                response = {"id": request_id, "ok": False, "error": str(e)}
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def _dispatch(self, line: str, lineno: int):
+        """Run cheap commands now; return a future for heavy ones. Exceptions are
+        returned (not raised) so the response keeps its place in the stream."""
+        try:
+            command = parse_command(line, lineno)
+            if command is None:
+                raise ValueError("empty command")
+            # keep per-name ordering with results that are still being computed
+            for name in command.reads | command.writes:
+                if name in self._pending:
+                    try:
+                        await asyncio.shield(self._pending[name])
+                    except Exception:
+                        pass
+            if command.op in PURE_OPS:
+                return self._heavy(command)
+            return self._cheap(command)
+        except Exception as e:
+            failed = asyncio.get_running_loop().create_future()
+            failed.set_exception(e)
+            return failed
+
+    def _matrix(self, name: str) -> SparseMatrix:
+        if name not in self.cli.matrices:
+            raise KeyError(f"matrix '{name}' not found")
+        return self.cli.matrices[name]
+
+    def _writable(self, name: str) -> SparseMatrix:
+        # copy-on-write: a matrix still being read by a heavy operation is left as it
+        # is for that operation, and the name is rebound to a copy that takes the change
+        matrix = self._matrix(name)
+        if id(matrix) in self._lent:
+            clone = matrix.copy()
+            self.cli._bind(name, clone)
+            matrix = clone
+        return matrix
+
+    def _cheap(self, command: Command):
+        op, args = command.op, command.args
+        if op == "load":
+            matrix = SparseMatrix.load_from_file(args[0])
+            self.cli._bind(args[1], matrix)
+            return describe(matrix, entries=False)
+        if op == "access":
+            return self._matrix(args[0]).access(int(args[1]), int(args[2]))
+        if op == "insert":
+            self._writable(args[0]).insert(int(args[1]), int(args[2]), float(args[3]))
+            return None
+        if op == "transpose":
+            matrix = self._writable(args[0])
+            matrix.transpose()
+            return describe(matrix, entries=False)
+        return describe(self._matrix(args[0]))  # print
+
+    def _heavy(self, command: Command) -> asyncio.Future:
+        op, args = command.op, command.args
+        names = (args[0],) if op == "smult" else args
+        scalar = float(args[1]) if op == "smult" else None
+        for name in names:
+            self._matrix(name)
+        result = self.cli.cache_lookup(op, names, scalar)
+        operands = versions = None
+        if result is None:
+            # the live matrices go to the pool, where pickling them is the snapshot; until
+            # the operation ends, later pipelined inserts/transposes write to a copy instead
+            operands = [self.cli.matrices[name] for name in names]
+            versions = tuple(matrix.version for matrix in operands)
+            for matrix in operands:
+                self._lent[id(matrix)] = self._lent.get(id(matrix), 0) + 1
+            if op == "smult":
+                operands.append(None)
+        future = asyncio.ensure_future(self._run_heavy(command, names, scalar, result, operands, versions))
+        if command.target is not None:
+            self._pending[command.target] = future
+        return future
+
+    async def _run_heavy(self, command: Command, names, scalar, result, operands, versions):
+        op = command.op
+        try:
+            if result is None:
+                async with self._inflight:
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        self.pool, compute, op, operands[0], operands[1], scalar)
+                # only cache if the names are still bound to what we computed from
+                if all(self.cli.matrices.get(name) is matrix and matrix.version == version
+                       for name, matrix, version in zip(names, operands, versions)):
+                    self.cli.cache_store(op, names, scalar, result)
+            if command.target is not None:
+                self.cli.store(command.target, result)
+                return {"stored": command.target, **describe(result, entries=False)}
+            return describe(result)
+        finally:
+            for matrix in operands[:len(names)] if operands else ():
+                if self._lent[id(matrix)] == 1:
+                    del self._lent[id(matrix)]
+                else:
+                    self._lent[id(matrix)] -= 1
+            if command.target is not None and self._pending.get(command.target) is asyncio.current_task():
+                del self._pending[command.target]
+
+
+async def serve(args) -> None:
+    server = MatrixServer(args.workers, args.pipeline, args.max_inflight)
+    if args.unix:
+        listener = await server.serve_unix(args.unix)
+        print(f"listening on {args.unix}")
+    else:
+        host, port = args.tcp.rsplit(":", 1)
+        listener = await server.serve_tcp(host, int(port))
+        print(f"listening on {args.tcp}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sparse matrix service.")
+    parser.add_argument("--tcp", default="127.0.0.1:8765", help="host:port to listen on")
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pipeline", type=int, default=64, help="max outstanding requests per connection")
+    parser.add_argument("--max-inflight", type=int, default=None, help="max heavy operations running at once")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
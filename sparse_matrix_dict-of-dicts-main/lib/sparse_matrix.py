@@ -5,6 +5,7 @@ class SparseMatrix:
         self.data: dict[int, dict[int, float]] = {}  # row -> {col -> value}
         self.is_transposed = False
         self.shape = (rows, cols)
+        self.version = 0  # bumped on every change (transpose, insert of a new value)
 
     @classmethod
     def load_from_file(cls, file_path):
@@ -41,16 +42,20 @@ class SparseMatrix:
     
     # display matrix in a human-readable format
     def show(self, dense=False):
+        # build the whole listing first and print it once
         if dense:
+            lines = []
             for i in range(self.rows):
                 row_values = []
                 for j in range(self.cols):
                     row_values.append(str(self.access(i, j)))
-                print(" ".join(row_values))
+                lines.append(" ".join(row_values))
         else:
-            for row, cols_dict in self.data.items():
-                for col, value in cols_dict.items():
-                    print(f"({row}, {col}): {value}")
+            lines = [f"({row}, {col}): {value}"
+                     for row, cols_dict in self.data.items()
+                     for col, value in cols_dict.items()]
+        if lines:
+            print("\n".join(lines))
 
     # MATRIX OPERATIONS
     def access(self, i, j):
@@ -59,6 +64,9 @@ class SparseMatrix:
 
     def insert(self, i, j, value):
         r, c = self._get_coords(i, j)
+        if self.data.get(r, {}).get(c, 0) == value:
+            return
+        self.version += 1
         if value == 0:
             # Remove zero elements to maintain sparsity
             if r in self.data and c in self.data[r]:
@@ -71,9 +79,27 @@ class SparseMatrix:
             self.data[r][c] = value
 
     def transpose(self):
+        self.version += 1
         self.is_transposed = not self.is_transposed
         self.shape = (self.shape[1], self.shape[0])
 
+    def copy(self):
+        result = SparseMatrix(self.rows, self.cols)
+        result.data = {row: cols_dict.copy() for row, cols_dict in self.data.items()}
+        result.is_transposed = self.is_transposed
+        result.shape = self.shape
+        result.version = self.version
+        return result
+
+    def nnz(self):
+        return sum(len(cols_dict) for cols_dict in self.data.values())
+
+    def triplets(self):
+        """Yield (i, j, value) for every non-zero, in logical (possibly transposed) coordinates."""
+        for row, cols_dict in self.data.items():
+            for col, value in cols_dict.items():
+                yield self._get_coords(row, col) + (value,)
+
     # handle transparent transposition
     def _get_coords(self, row, col):
         if self.is_transposed:
@@ -0,0 +1,141 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import struct
+import subprocess
+import sys
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _load_package(name="dod_lib"):
+    # the enclosing repository's package is also called `lib`; load this project's
+    # under its own name so both test suites can be collected in one pytest run
+    if name not in sys.modules:
+        init = os.path.join(ROOT, "lib", "__init__.py")
+        spec = importlib.util.spec_from_file_location(name, init, submodule_search_locations=[os.path.dirname(init)])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module   # registered first: pickled results name their module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+_load_package()
+from dod_lib.batch import write_matrix  # noqa: E402
+from dod_lib.sparse_matrix import SparseMatrix  # noqa: E402
+
+
+def test_batch_parse_error_is_reported_per_line(tmp_path):
+    script = tmp_path / "bad.txt"
+    script.write_text("# comment\nbogus line here\n")
+    proc = subprocess.run([sys.executable, "main.py", "--batch", str(script), "--out-dir", str(tmp_path)],
+                          cwd=ROOT, capture_output=True, text=True)
+    assert proc.returncode != 0
+    assert proc.stderr.startswith("line 2: ")
+    assert "Traceback" not in proc.stderr
+
+
+def test_bin_format_is_little_endian(tmp_path):
+    matrix = SparseMatrix(2, 3)
+    matrix.insert(0, 2, 1.5)
+    matrix.insert(1, 0, -2.0)
+    path = tmp_path / "m.bin"
+    write_matrix(matrix, str(path), "bin")
+    data = path.read_bytes()
+    magic, rows, cols, nnz = struct.unpack_from("<4sIIQ", data)
+    assert (magic, rows, cols, nnz) == (b"SPM1", 2, 3, 2)
+    body = data[struct.calcsize("<4sIIQ"):]
+    assert struct.unpack(f"<{nnz}i{nnz}i{nnz}d", body) == (0, 1, 2, 0, 1.5, -2.0)
+
+
+
+def test_version_counts_real_changes_only():
+    matrix = SparseMatrix(2, 2)
+    matrix.insert(0, 1, 4.0)
+    matrix.insert(0, 1, 4.0)
+    matrix.insert(1, 0, 0.0)
+    assert matrix.version == 1
+    assert matrix.copy().version == 1
+    matrix.transpose()
+    assert matrix.version == 2
+
+
+def test_cli_cache_hits_until_an_operand_changes(tmp_path):
+    from dod_lib.cli import CLI
+    files = {"a": "1 0\n0 2\n", "b": "0 3\n4 0\n", "a2": "5 0\n0 6\n"}
+    for name, text in files.items():
+        (tmp_path / f"{name}.txt").write_text(text)
+    cli = CLI()
+    cli.process_command(f"load {tmp_path / 'a.txt'} A")
+    cli.process_command(f"load {tmp_path / 'b.txt'} B")
+    cli.process_command("sum A B as C")
+    cached = cli.cache_lookup("sum", ("A", "B"))
+    assert cached is cli.matrices["C"]
+    cli.process_command("sum A B as C")             # hit: C gets a copy of the cached result
+    assert cli.cache_lookup("sum", ("A", "B")) is cached
+    assert cli.matrices["C"] is not cached and cli.matrices["C"].version == cached.version
+    cli.process_command("insert A 0 0 1")           # the value already stored: no change
+    assert cli.cache_lookup("sum", ("A", "B")) is cached
+    version = cli.matrices["A"].version
+    cli.process_command(f"load {tmp_path / 'a2.txt'} A")
+    assert cli.matrices["A"].version == version    # same version, new matrix: still a miss
+    assert cli.cache_lookup("sum", ("A", "B")) is None
+    cli.process_command("sum A B as C")
+    assert cli.matrices["C"].access(0, 0) == 5.0
+    cli.process_command("insert A 0 0 7")
+    assert cli.cache_lookup("sum", ("A", "B")) is None
+    cli.process_command("sum A B as C")
+    assert cli.matrices["C"].access(0, 0) == 7.0 and cli.matrices["C"].access(1, 0) == 4.0
+
+def _with_server(body, **kw):
+    from dod_lib.server import MatrixServer
+
+    async def run():
+        server = MatrixServer(workers=1, **kw)
+        listener = await server.serve_tcp("127.0.0.1", 0)
+        try:
+            return await body(server, listener.sockets[0].getsockname()[1])
+        finally:
+            listener.close()
+            server.close()
+    return asyncio.run(run())
+
+
+def test_server_snapshots_operands_against_pipelined_writes(tmp_path):
+    from dod_lib.client import MatrixClient
+    path = tmp_path / "a.txt"
+    path.write_text("1 2\n0 3\n")
+
+    async def body(server, port):
+        client = await MatrixClient.connect(port=port)
+        await client.request(f"load {path} A")
+        product = client.send("mmult A A as C")
+        client.send("insert A 0 0 5")       # pipelined behind the product
+        client.send("transpose A")
+        await product
+        entries = (await client.request("print C"))["entries"]
+        after = (await client.request("print A"))["entries"]
+        await client.close()
+        return entries, after
+    entries, after = _with_server(body)
+    assert entries == [[0, 0, 1.0], [0, 1, 8.0], [1, 1, 9.0]]
+    assert after == [[0, 0, 5.0], [1, 0, 2.0], [1, 1, 3.0]]
+
+
+def test_server_connection_task_ends_when_client_vanishes(tmp_path):
+    async def body(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"print missing\n" * 2000)   # far more than the pipeline allows
+        await writer.drain()
+        # reset instead of a clean close, without reading a single response
+        writer.transport.get_extra_info("socket").setsockopt(
+            socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        writer.transport.abort()
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if asyncio.all_tasks() == {asyncio.current_task()}:
+                return True
+        return False
+    assert _with_server(body, pipeline=2)
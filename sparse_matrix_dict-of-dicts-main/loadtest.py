@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from lib.client import MatrixClient
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(p / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def one_client(args, client_id, latencies):
+    client = await MatrixClient.connect(args.host, args.port, args.unix)
+    rng = random.Random(client_id)
+    name = f"M{client_id}"
+    await client.request(f"load {args.matrix} {name}")
+    n = (await client.request(f"print {name}"))["shape"][0]
+
+    in_flight = []
+    for k in range(args.requests):
+        roll = rng.random()
+        if roll < args.heavy:
+            command = rng.choice([f"mmult {name} {name}", f"sum {name} {name}", f"smult {name} 2"])
+        elif roll < args.heavy + args.writes:
+            command = f"insert {name} {rng.randrange(n)} {rng.randrange(n)} {rng.randint(1, 9)}"
+        else:
+            command = f"access {name} {rng.randrange(n)} {rng.randrange(n)}"
+        start = time.perf_counter()
+        future = client.send(command)
+        future.add_done_callback(lambda f, start=start: latencies.append((time.perf_counter() - start) * 1000.0))
+        in_flight.append(future)
+        if len(in_flight) >= args.depth:
+            await asyncio.gather(*in_flight)
+            in_flight = []
+    await asyncio.gather(*in_flight)
+    await client.close()
+
+
+async def main(args):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(one_client(args, c, latencies) for c in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    print(f"clients={args.clients} requests={len(latencies)} depth={args.depth} "
+          f"throughput={len(latencies) / elapsed:.1f} req/s")
+    print(f"latency ms: mean={statistics.mean(latencies):.3f} p50={percentile(latencies, 50):.3f} "
+          f"p90={percentile(latencies, 90):.3f} p99={percentile(latencies, 99):.3f} max={max(latencies):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for lib.server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--matrix", default="A.txt", help="matrix file each client loads (path as seen by the server)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--depth", type=int, default=16, help="pipelined requests per client")
+    parser.add_argument("--heavy", type=float, default=0.2, help="fraction of sum/smult/mmult requests")
+    parser.add_argument("--writes", type=float, default=0.1, help="fraction of insert requests")
+    asyncio.run(main(parser.parse_args()))
@@ -1,10 +1,34 @@
+import argparse
+import sys
+
 from lib.cli import CLI
+from lib.batch import FORMATS, run_batch
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sparse matrix command line.")
+    parser.add_argument("--batch", metavar="SCRIPT",
+                        help="run the commands in SCRIPT ('-' for stdin) instead of the interactive prompt")
+    parser.add_argument("--out-dir", default="results", help="where batch mode writes result matrices")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="coo", help="file format for batch results")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for independent batch operations")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.batch:
+        try:
+            failures = run_batch(args.batch, args.out_dir, args.format, args.jobs)
+        except ValueError as e:  # script that does not parse: "line N: ..."
+            print(e, file=sys.stderr)
+            sys.exit(2)
+        sys.exit(1 if failures else 0)
+
     cli = CLI()
     cli.show_help()
     while True:
         command = input("Enter command or 'help' for options. Type 'exit' to quit.\n> ")
         if command.lower() in ["exit", "quit"]:
             break
-        cli.process_command(command)
\ No newline at end of file
+        cli.process_command(command)
@@ -1,26 +1,27 @@
 
 import argparse, sys
-from lib.sparse_matrix import SparseMatrix
+from array import array
+from lib.sparse_matrix import MatrizEsparsa
 from lib.tree_matrix import TreeMatrix
 from lib.dense_matrix import DenseMatrix
 
-def load_sparse_from_file(path:str)->SparseMatrix:
-    return SparseMatrix.load_from_file(path)
+def load_sparse_from_file(path:str)->MatrizEsparsa:
+    return MatrizEsparsa.carrega_do_arquivo(path)
 
-def to_dense_from_sparse(S: SparseMatrix)->DenseMatrix:
-    r,c = S.rows, S.cols
-    D = DenseMatrix(r,c)
-    for i, row in S.data.items():
+def coo_of(S: MatrizEsparsa):
+    ri, ci, vs = array("i"), array("i"), array("d")
+    for i, row in S._linhas_logicas().items():
         for j, v in row.items():
-            D.insert(i,j,v)
-    return D
+            ri.append(i); ci.append(j); vs.append(v)
+    return ri, ci, vs
 
-def to_tree_from_sparse(S: SparseMatrix)->TreeMatrix:
-    T = TreeMatrix(S.rows, S.cols)
-    for i, row in S.data.items():
-        for j, v in row.items():
-            T.insert(i,j,v)
-    return T
+def to_dense_from_sparse(S: MatrizEsparsa)->DenseMatrix:
+    r,c = S.corpo
+    return DenseMatrix.from_coo(r, c, *coo_of(S))
+
+def to_tree_from_sparse(S: MatrizEsparsa)->TreeMatrix:
+    r,c = S.corpo
+    return TreeMatrix.from_coo(r, c, *coo_of(S))
 
 def max_abs_diff(A,B)->float:
     rA,cA = A.shape; rB,cB = B.shape
@@ -53,7 +54,7 @@ def main():
     if args.op=="add":
         Sd = D_A.add(D_B)
         St = T_A.add(T_B)
-        Ss = S + Q
+        Ss = S.soma(Q)
     else:
         Sd = D_A.matmul(D_B)
         St = T_A.matmul(T_B)